@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+# Error dicts from list serializers are keyed by int index
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z if orjson is not None else 0
+# Raw JSON fragments (orjson 3.9+) let Decimals keep their exact digits
+ORJSON_FRAGMENT = getattr(orjson, 'Fragment', None)
+
+_fallback_encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def encode_default(obj):
+    """
+    Types orjson does not handle itself. Decimals are written as JSON
+    numbers with their exact digits where orjson supports raw fragments,
+    as floats otherwise; everything else (lazy strings, timedeltas,
+    querysets, ...) goes through DRF's encoder.
+    """
+    if isinstance(obj, Decimal):
+        if ORJSON_FRAGMENT is not None and obj.is_finite():
+            return ORJSON_FRAGMENT(format(obj, 'f'))
+        return float(obj)
+    return _fallback_encoder.default(obj)
+
+
+def dumps(data):
+    """Encode `data` as compact UTF-8 JSON bytes, with orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS)
+    return _fallback_encoder.encode(data).encode('utf-8')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson, which encodes dicts, lists, dates and
+    datetimes in C, so report views can hand over Decimal and date values
+    as they come from the database. Without orjson (or for indented output
+    from the browsable API) it falls back to DRF's pure-Python renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        content = dumps(data)
+        # Same as DRF: keep the output a strict JavaScript subset
+        if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+            content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return content
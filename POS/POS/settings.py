@@ -36,8 +36,10 @@ INSTALLED_APPS = [
 
     # Your Apps
     "apps.accounts",
+    "apps.sync",
     "apps.pricing",
     "apps.sales",
+    "apps.ops",
 ]
 
 # =========================================================
@@ -45,6 +47,7 @@ INSTALLED_APPS = [
 # =========================================================
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "apps.ops.middleware.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -80,14 +83,101 @@ WSGI_APPLICATION = "POS.wsgi.application"
 # =========================================================
 # DATABASE SETTINGS
 # =========================================================
-# For POS, SQLite is fine. If using MySQL later, I can generate config.
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# POS_DB_ENGINE=postgresql selects PostgreSQL (recommended when running
+# several gunicorn workers). Anything else uses SQLite.
+DB_ENGINE = os.environ.get("POS_DB_ENGINE", "sqlite").lower()
+
+if DB_ENGINE in ("postgres", "postgresql"):
+    DB_POOL = os.environ.get("POS_DB_POOL", "").lower() in ("1", "true", "yes")
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("POS_DB_NAME", "pos"),
+            "USER": os.environ.get("POS_DB_USER", "pos"),
+            "PASSWORD": os.environ.get("POS_DB_PASSWORD", ""),
+            "HOST": os.environ.get("POS_DB_HOST", "localhost"),
+            "PORT": os.environ.get("POS_DB_PORT", "5432"),
+            # Keep connections open between requests and check them before reuse.
+            # psycopg's pool (POS_DB_POOL=1, needs psycopg[pool]) replaces
+            # persistent connections, so CONN_MAX_AGE must be 0 with it.
+            "CONN_MAX_AGE": 0 if DB_POOL else int(os.environ.get("POS_DB_CONN_MAX_AGE", "60")),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {"pool": True} if DB_POOL else {},
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("POS_SQLITE_PATH", BASE_DIR / "db.sqlite3"),
+            "OPTIONS": {
+                # Take the write lock when a transaction starts, so concurrent
+                # checkouts wait (up to `timeout` seconds) instead of failing
+                # with "database is locked" when upgrading a read lock
+                "transaction_mode": "IMMEDIATE",
+                "timeout": int(os.environ.get("POS_SQLITE_TIMEOUT", "20")),
+                # WAL lets readers run while a checkout is writing
+                "init_command": (
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA synchronous=NORMAL;"
+                    "PRAGMA foreign_keys=ON;"
+                ),
+            },
+            # Tests use an in-memory database unless a file is given, e.g. to
+            # run the multi-threaded checkout tests
+            "TEST": {"NAME": os.environ.get("POS_SQLITE_TEST_PATH")},
+        }
     }
+
+
+# =========================================================
+# CACHE
+# =========================================================
+# File based so every worker process shares the same entries
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("POS_CACHE_DIR", os.path.join(BASE_DIR, "cache")),
+    },
+    # Rendered receipts, kept apart so their culling never evicts the
+    # catalog or balance snapshots; re-rendered on demand once expired
+    "receipts": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(os.environ.get("POS_CACHE_DIR", os.path.join(BASE_DIR, "cache")), "receipts"),
+        "TIMEOUT": 7 * 24 * 3600,
+        "OPTIONS": {"MAX_ENTRIES": int(os.environ.get("POS_RECEIPT_CACHE_MAX_ENTRIES", "5000"))},
+    },
 }
 
+# Seconds to keep the customer balances snapshot (0 disables the cache)
+CUSTOMER_BALANCES_CACHE_TIMEOUT = 300
+
+# Write a ReceiptReprintLog row for every reprint (one extra INSERT each)
+RECEIPT_REPRINT_LOG = os.environ.get("POS_RECEIPT_REPRINT_LOG", "0") == "1"
+
+# Where checkout writes the receipt snapshot: "async" (the default, also
+# when unset) moves it out of the checkout transaction into the receipt
+# outbox (drained by a worker thread or `manage.py drain_receipt_outbox`);
+# "inline" writes it during checkout. In async mode GET
+# /api/sales/receipts/by-order/<id>/ answers 202 with the reserved receipt
+# number until the worker has written the receipt (usually right after a
+# checkout); POST .../by-order/<id>/issue/ writes it at once. Set
+# POS_RECEIPT_MODE=inline for clients that expect 200 straight away
+RECEIPT_MODE = os.environ.get("POS_RECEIPT_MODE", "async")
+RECEIPT_OUTBOX_POLL_SECONDS = 5
+RECEIPT_OUTBOX_MAX_ATTEMPTS = 8
+
+# Background report exports (/api/sales/exports/), written to MEDIA_ROOT/exports/
+# by a worker thread or `manage.py run_export_jobs`. Rows are fetched and
+# written this many at a time, which bounds the worker's memory
+REPORT_EXPORT_CHUNK_SIZE = int(os.environ.get("POS_REPORT_EXPORT_CHUNK_SIZE", "2000"))
+REPORT_EXPORT_POLL_SECONDS = 30
+
+# Per-request query/latency profiling (Server-Timing header, /api/ops/stats/)
+OPS_PROFILING = os.environ.get("POS_OPS_PROFILING", "1") == "1"
+# Requests kept per URL name for the percentiles
+OPS_STATS_WINDOW = int(os.environ.get("POS_OPS_STATS_WINDOW", "1000"))
+
 
 # =========================================================
 # AUTHENTICATION (JWT)
@@ -96,6 +186,14 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # Keyset (cursor) pagination, used when a request passes page_size or cursor
+    'DEFAULT_PAGINATION_CLASS': 'apps.sales.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    # orjson based (pure-Python fallback); encodes Decimal, date and datetime
+    'DEFAULT_RENDERER_CLASSES': (
+        'POS.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 # JWT Configuration
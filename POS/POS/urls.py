@@ -19,4 +19,5 @@ urlpatterns = [
     path('api/', include(router.urls)),  # Customers endpoint
     path('api/pricing/', include('apps.pricing.urls')),
     path('api/sales/', include('apps.sales.urls')),
+    path('api/ops/', include('apps.ops.urls')),
 ]
\ No newline at end of file
@@ -0,0 +1,129 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from . import stats
+
+UNRESOLVED = '<unresolved>'
+
+
+class QueryTimer:
+    """execute_wrapper that counts the queries of a request and times them"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class RenderTimer:
+    """Start and end of the deferred render (DRF serializes there)"""
+
+    def __init__(self):
+        self.started = None
+        self.duration = None
+
+    def finished(self, response):
+        self.duration = time.perf_counter() - self.started
+
+
+class ProfilingMiddleware:
+    """
+    Measures every request: query count, time spent in the database,
+    time spent rendering the response and response size. The figures go
+    out in a Server-Timing header (shown by the browser's network panel)
+    and into the rolling stats served at /api/ops/stats/.
+    Set OPS_PROFILING = False to switch it off.
+
+    Works in both modes, so under ASGI the async views are not pushed
+    onto a thread because of it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not getattr(settings, 'OPS_PROFILING', True):
+            return self.get_response(request)
+
+        queries = QueryTimer()
+        request._ops_render = RenderTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        return self.finish(request, response, queries, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'OPS_PROFILING', True):
+            return await self.get_response(request)
+
+        queries = QueryTimer()
+        request._ops_render = RenderTimer()
+        start = time.perf_counter()
+        # The async ORM runs queries in the request's sync thread, so the
+        # wrapper goes on that thread's connection
+        await sync_to_async(add_query_timer)(queries)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(remove_query_timer)(queries)
+        return self.finish(request, response, queries, time.perf_counter() - start)
+
+    def finish(self, request, response, queries, total):
+        render = request._ops_render.duration
+        size = None if response.streaming else len(response.content)
+        response['Server-Timing'] = server_timing(total, queries, render, size)
+
+        match = getattr(request, 'resolver_match', None)
+        stats.record(match.view_name if match else UNRESOLVED, {
+            'total_ms': round(total * 1000, 3),
+            'db_ms': round(queries.duration * 1000, 3),
+            'serialize_ms': None if render is None else round(render * 1000, 3),
+            'queries': queries.count,
+            'size': size,
+        })
+        return response
+
+    def process_template_response(self, request, response):
+        # Called right before render(); DRF responses are rendered lazily
+        timer = getattr(request, '_ops_render', None)
+        if timer is not None:
+            timer.started = time.perf_counter()
+            response.add_post_render_callback(timer.finished)
+        return response
+
+
+def add_query_timer(timer):
+    connection.execute_wrappers.append(timer)
+
+
+def remove_query_timer(timer):
+    connection.execute_wrappers.remove(timer)
+
+
+def server_timing(total, queries, render, size):
+    metrics = [
+        f'total;dur={total * 1000:.1f}',
+        f'db;dur={queries.duration * 1000:.1f};desc="{queries.count} queries"',
+    ]
+    if render is not None:
+        metrics.append(f'serialize;dur={render * 1000:.1f}')
+    if size is not None:
+        metrics.append(f'size;desc="{size} bytes"')
+    return ', '.join(metrics)
@@ -0,0 +1,61 @@
+import math
+import threading
+from collections import deque
+
+from django.conf import settings
+
+METRICS = ('total_ms', 'db_ms', 'serialize_ms', 'queries', 'size')
+
+_lock = threading.Lock()
+_samples = {}
+
+
+def window():
+    return getattr(settings, 'OPS_STATS_WINDOW', 1000)
+
+
+def record(name, sample):
+    """
+    Append one request's measurements (a dict keyed by METRICS) to the
+    rolling window of its URL name. Each worker process keeps its own
+    window, so the stats describe the process that answers.
+    """
+    with _lock:
+        samples = _samples.get(name)
+        if samples is None:
+            samples = _samples[name] = deque(maxlen=window())
+        samples.append(tuple(sample.get(metric) for metric in METRICS))
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summary():
+    """p50/p95/p99 of every metric, per URL name"""
+    with _lock:
+        copies = {name: list(samples) for name, samples in _samples.items()}
+
+    endpoints = {}
+    for name in sorted(copies):
+        rows = copies[name]
+        stats = {'count': len(rows)}
+        for index, metric in enumerate(METRICS):
+            values = sorted(row[index] for row in rows if row[index] is not None)
+            if not values:
+                stats[metric] = None
+                continue
+            stats[metric] = {
+                'p50': percentile(values, 0.50),
+                'p95': percentile(values, 0.95),
+                'p99': percentile(values, 0.99),
+                'max': values[-1],
+            }
+        endpoints[name] = stats
+    return endpoints
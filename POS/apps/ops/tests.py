@@ -0,0 +1,83 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from apps.pricing.models import Item
+from . import stats
+
+
+class PercentileTests(SimpleTestCase):
+    def setUp(self):
+        stats.reset()
+        self.addCleanup(stats.reset)
+
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(stats.percentile(values, 0.50), 50)
+        self.assertEqual(stats.percentile(values, 0.95), 95)
+        self.assertEqual(stats.percentile(values, 0.99), 99)
+        self.assertEqual(stats.percentile([7], 0.99), 7)
+
+    @override_settings(OPS_STATS_WINDOW=3)
+    def test_window_keeps_latest_samples(self):
+        for total in (100, 1, 2, 3):
+            stats.record('order-list', {'total_ms': total, 'queries': 2})
+
+        summary = stats.summary()['order-list']
+
+        self.assertEqual(summary['count'], 3)
+        self.assertEqual(summary['total_ms']['max'], 3)
+        self.assertEqual(summary['queries']['p99'], 2)
+        self.assertIsNone(summary['serialize_ms'])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ProfilingMiddlewareTests(APITestCase):
+    stats_url = '/api/ops/stats/'
+
+    def setUp(self):
+        cache.clear()
+        stats.reset()
+        self.addCleanup(stats.reset)
+        self.user = User.objects.create_user(username='owner', password='secret', is_staff=True)
+        self.client.force_authenticate(self.user)
+        Item.objects.create(name='Broiler', price=Decimal('520.00'))
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/pricing/products/', {'page_size': 10})
+
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertIn('total;dur=', timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn(f'size;desc="{len(response.content)} bytes"', timing)
+
+    def test_stats_per_url_name(self):
+        for _ in range(3):
+            self.client.get('/api/pricing/products/', {'page_size': 10})
+
+        response = self.client.get(self.stats_url)
+
+        self.assertEqual(response.status_code, 200)
+        products = response.data['endpoints']['product-list']
+        self.assertEqual(products['count'], 3)
+        self.assertGreater(products['queries']['p50'], 0)
+        for metric in ('total_ms', 'db_ms', 'serialize_ms', 'size'):
+            self.assertLessEqual(products[metric]['p50'], products[metric]['p99'])
+
+    def test_stats_require_staff(self):
+        self.client.force_authenticate(User.objects.create_user(username='cashier', password='secret'))
+
+        self.assertEqual(self.client.get(self.stats_url).status_code, 403)
+
+    @override_settings(OPS_PROFILING=False)
+    def test_can_be_switched_off(self):
+        response = self.client.get('/api/pricing/products/', {'page_size': 10})
+
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(stats.summary(), {})
@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import request_stats
+
+urlpatterns = [
+    path('stats/', request_stats, name='ops-stats'),
+]
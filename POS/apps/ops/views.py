@@ -0,0 +1,19 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from . import stats
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def request_stats(request):
+    """
+    Latency, query and size percentiles per URL name over the last
+    OPS_STATS_WINDOW requests of this worker process.
+    Times are in milliseconds, sizes in bytes.
+    """
+    return Response({
+        'window': stats.window(),
+        'endpoints': stats.summary(),
+    })
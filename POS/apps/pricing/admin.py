@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Item
+from .models import Item, ItemPriceHistory
 
 
 @admin.register(Item)
@@ -21,4 +21,12 @@ class ItemAdmin(admin.ModelAdmin):
     )
     
     # OR use a simpler fields configuration
-    # fields = ('name', 'price')
\ No newline at end of file
+    # fields = ('name', 'price')
+
+
+@admin.register(ItemPriceHistory)
+class ItemPriceHistoryAdmin(admin.ModelAdmin):
+    list_display = ('item', 'price', 'effective_from')
+    list_filter = ('item',)
+    date_hierarchy = 'effective_from'
+    ordering = ('-effective_from',)
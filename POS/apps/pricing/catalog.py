@@ -0,0 +1,122 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Item
+
+CATALOG_VERSION_KEY = 'pricing:catalog:version'
+CATALOG_TIMEOUT = 24 * 60 * 60
+
+_process_lock = threading.Lock()
+_process_catalog = {'version': None, 'catalog': None}
+
+
+class Catalog:
+    """Snapshot of every product at one catalog version"""
+
+    def __init__(self, version, rows, stamps):
+        self.version = version
+        self.rows = rows  # ItemSerializer data, in catalog (name) order
+        self.stamps = stamps  # sync_version of every row, read with it
+        self.prices = {row['id']: (row['name'], Decimal(row['price'])) for row in rows}
+
+    @property
+    def etag(self):
+        return f'"catalog-{self.version}"'
+
+    def items(self, ids):
+        """Unsaved Item instances for the ids in this snapshot (others are left out)"""
+        found = {}
+        for pk in ids:
+            if pk in self.prices:
+                name, price = self.prices[pk]
+                found[pk] = Item(id=pk, name=name, price=price)
+        return found
+
+
+def catalog_cache_key(version):
+    return f'pricing:catalog:snapshot:{version}'
+
+
+def current_version():
+    """
+    The catalog version shared by every worker. Versions are nanosecond
+    timestamps, so they only grow.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def new_version():
+    return max(time.time_ns(), (cache.get(CATALOG_VERSION_KEY) or 0) + 1)
+
+
+def bump_version(version=None):
+    """Publish `version`, or a fresh one if it is missing or already superseded"""
+    if not version or version <= (cache.get(CATALOG_VERSION_KEY) or 0):
+        version = new_version()
+    cache.set(CATALOG_VERSION_KEY, version, None)
+    return version
+
+
+def get_catalog():
+    """
+    Return the catalog for the current version: from this process when it
+    already holds that version, else from the shared cache, else from the
+    database (and then stored in both).
+    """
+    from .serializers import ItemSerializer
+
+    version = current_version()
+    with _process_lock:
+        if _process_catalog['version'] == version:
+            return _process_catalog['catalog']
+
+    snapshot = cache.get(catalog_cache_key(version))
+    if snapshot is None:
+        items = list(Item.objects.all().order_by('name'))
+        snapshot = {
+            'rows': [dict(row) for row in ItemSerializer(items, many=True).data],
+            'stamps': {item.id: item.sync_version for item in items},
+        }
+        cache.set(catalog_cache_key(version), snapshot, CATALOG_TIMEOUT)
+
+    catalog = Catalog(version, snapshot['rows'], snapshot['stamps'])
+    with _process_lock:
+        _process_catalog['version'] = version
+        _process_catalog['catalog'] = catalog
+    return catalog
+
+
+def get_items(ids):
+    """
+    Items for a checkout, keyed by id. The carted ids' sync stamps are read
+    from the database and prices are taken from the catalog only where its
+    stamp matches, so a price committed before the new catalog version is
+    published (or after the version key is lost from the cache) is never
+    missed. Ids that are new or changed since the snapshot are re-read with
+    one query; deleted ids are left out.
+    """
+    catalog = get_catalog()
+    stamps = dict(Item.objects.filter(pk__in=set(ids)).values_list('pk', 'sync_version'))
+    items = catalog.items(pk for pk, stamp in stamps.items() if catalog.stamps.get(pk) == stamp)
+    changed = set(stamps) - set(items)
+    if changed:
+        items.update(Item.objects.in_bulk(changed))
+    return items
+
+
+def invalidate_catalog():
+    """
+    Publish a new catalog version once the current transaction commits and
+    return it, so callers can hand the version to terminals straight away.
+    """
+    version = new_version()
+    transaction.on_commit(lambda: bump_version(version))
+    return version
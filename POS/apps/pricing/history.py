@@ -0,0 +1,61 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import Item, ItemPriceHistory
+
+
+def price_at(item_id, moment):
+    """
+    Price of an item at `moment`: a single seek on the (item, effective_from)
+    index for the last change at or before it. None before the first
+    recorded price.
+    """
+    return ItemPriceHistory.objects.filter(
+        item_id=item_id,
+        effective_from__lte=moment
+    ).order_by('-effective_from', '-id').values_list('price', flat=True).first()
+
+
+def rate_curve(day):
+    """
+    Every item's rates over `day` in one query: the price in effect when
+    the day opened plus each change during the day, as
+    [{'product', 'name', 'opening_price', 'closing_price', 'changes'}].
+    """
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = start + timedelta(days=1)
+
+    # Id of the last change before the day opened, one index seek per item
+    opening_ids = Item.objects.annotate(
+        opening_id=Subquery(
+            ItemPriceHistory.objects.filter(
+                item_id=OuterRef('pk'),
+                effective_from__lt=start
+            ).order_by('-effective_from', '-id').values('id')[:1]
+        )
+    ).filter(opening_id__isnull=False).values('opening_id')
+
+    rows = ItemPriceHistory.objects.filter(
+        Q(pk__in=opening_ids) | Q(effective_from__gte=start, effective_from__lt=end)
+    ).select_related('item').order_by('item__name', 'item_id', 'effective_from', 'id')
+
+    curve = []
+    current = None
+    for row in rows:
+        if current is None or current['product'] != row.item_id:
+            current = {
+                'product': row.item_id,
+                'name': row.item.name,
+                'opening_price': None,
+                'closing_price': None,
+                'changes': []
+            }
+            curve.append(current)
+        if row.effective_from < start:
+            current['opening_price'] = row.price
+        else:
+            current['changes'].append({'effective_from': row.effective_from, 'price': row.price})
+        current['closing_price'] = row.price
+    return curve
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='sync_version',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def record_current_prices(apps, schema_editor):
+    """Start every existing item's history at its current price"""
+    Item = apps.get_model('pricing', 'Item')
+    ItemPriceHistory = apps.get_model('pricing', 'ItemPriceHistory')
+
+    ItemPriceHistory.objects.bulk_create([
+        ItemPriceHistory(item_id=item.id, price=item.price)
+        for item in Item.objects.only('id', 'price').iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0002_item_sync_version_item_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemPriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('effective_from', models.DateTimeField(default=django.utils.timezone.now)),
+                ('item', models.ForeignKey(db_column='item_id', on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='pricing.item')),
+            ],
+            options={
+                'db_table': 'item_price_history',
+                'ordering': ['effective_from', 'id'],
+                'indexes': [models.Index(fields=['item', 'effective_from', 'id'], name='price_history_item_time_idx'), models.Index(fields=['effective_from'], name='price_history_time_idx')],
+            },
+        ),
+        migrations.RunPython(record_current_prices, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
+from apps.sync.models import SyncedModel
 
-class Item(models.Model):
+
+class Item(SyncedModel):
     """Item model to store product information"""
     id = models.AutoField(primary_key=True)
     name = models.TextField()
@@ -11,4 +14,45 @@ class Item(models.Model):
         db_table = 'items'
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored price so save() can tell when it changes
+        instance._saved_price = instance.__dict__.get('price')
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._saved_price = self.__dict__.get('price')
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if getattr(self, '_saved_price', None) != self.price:
+                ItemPriceHistory.objects.create(item=self, price=self.price)
+                self._saved_price = self.price
+
+
+class ItemPriceHistory(models.Model):
+    """Every price an item has had, from the moment it took effect"""
+    item = models.ForeignKey(
+        Item,
+        on_delete=models.CASCADE,
+        db_column='item_id',
+        related_name='price_history'
+    )
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    effective_from = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'item_price_history'
+        indexes = [
+            models.Index(fields=['item', 'effective_from', 'id'], name='price_history_item_time_idx'),
+            models.Index(fields=['effective_from'], name='price_history_time_idx'),
+        ]
+        ordering = ['effective_from', 'id']
+
+    def __str__(self):
+        return f"{self.item_id} {self.price} from {self.effective_from}"
@@ -1,5 +1,12 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Item
+
+from apps.sync.versions import next_versions
+from .catalog import invalidate_catalog
+from .models import Item, ItemPriceHistory
 
 
 class ItemSerializer(serializers.ModelSerializer):
@@ -20,4 +27,59 @@ class ItemPriceUpdateSerializer(serializers.Serializer):
     def update(self, instance, validated_data):
         instance.price = validated_data['price']
         instance.save()
-        return instance
\ No newline at end of file
+        return instance
+
+
+class ItemPriceSerializer(serializers.Serializer):
+    """One {id, price} pair of a bulk price update"""
+    id = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'))
+
+
+class ItemBulkPriceUpdateSerializer(serializers.Serializer):
+    """
+    Serializer for the morning rate change: every pair is validated first,
+    then all prices are written in one transaction with a single
+    bulk_update and the catalog is invalidated once.
+    """
+    prices = ItemPriceSerializer(many=True, allow_empty=False, max_length=500)
+
+    def validate_prices(self, prices):
+        errors = {}
+        seen = set()
+        for index, pair in enumerate(prices):
+            if pair['id'] in seen:
+                errors[index] = {'id': [f"Product {pair['id']} is listed more than once"]}
+            seen.add(pair['id'])
+
+        self.items = Item.objects.in_bulk(seen)
+        for index, pair in enumerate(prices):
+            if pair['id'] not in self.items:
+                errors.setdefault(index, {})['id'] = [f"Product {pair['id']} not found"]
+
+        if errors:
+            raise serializers.ValidationError(errors)
+        return prices
+
+    def create(self, validated_data):
+        now = timezone.now()
+        items = []
+        history = []
+        for pair in validated_data['prices']:
+            item = self.items[pair['id']]
+            if item.price != pair['price']:
+                history.append(ItemPriceHistory(item=item, price=pair['price'], effective_from=now))
+            item.price = pair['price']
+            item.updated_at = now
+            items.append(item)
+
+        with transaction.atomic():
+            # Stamp the rows for delta sync; bulk_update skips Item.save()
+            versions = next_versions(Item._meta.label_lower, len(items))
+            for item, version in zip(items, versions):
+                item.sync_version = version
+            Item.objects.bulk_update(items, fields=['price', 'updated_at', 'sync_version'])
+            ItemPriceHistory.objects.bulk_create(history)
+            catalog_version = invalidate_catalog()
+
+        return {'items': items, 'changed': len(history), 'catalog_version': catalog_version}
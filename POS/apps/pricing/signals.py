@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .catalog import invalidate_catalog
+from .models import Item
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def drop_cached_catalog(sender, **kwargs):
+    """Any product write (including price updates) publishes a new catalog version"""
+    invalidate_catalog()
@@ -1,3 +1,261 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from apps.sales.models import Client, OrderItem
+from .catalog import get_catalog, get_items
+from .history import price_at, rate_curve
+from .models import Item, ItemPriceHistory
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    RECEIPT_MODE='inline'
+)
+class PricingAPITestCase(APITestCase):
+    """Shared fixtures for the pricing API tests"""
+    url = '/api/pricing/products/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cashier', password='secret')
+        self.client.force_authenticate(self.user)
+        self.broiler = Item.objects.create(name='Broiler', price=Decimal('520.00'))
+        self.eggs = Item.objects.create(name='Eggs', price=Decimal('30.00'))
+
+    def update_price(self, item, price):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'{self.url}{item.id}/update-price/', {'price': price}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+
+class CatalogTests(PricingAPITestCase):
+
+    def test_checkout_sees_a_price_before_its_version_is_published(self):
+        get_catalog()
+        customer = Client.objects.create(name='Hotel Shalimar', balance=Decimal('0'))
+
+        # The price commits but the new catalog version (an on_commit
+        # callback) has not been published yet
+        with self.captureOnCommitCallbacks(execute=False):
+            self.eggs.price = Decimal('35.00')
+            self.eggs.save()
+        self.assertEqual(get_catalog().prices[self.eggs.id][1], Decimal('30.00'))
+
+        response = self.client.post('/api/sales/orders/create/', {
+            'customer': str(customer.id),
+            'items': [{'product': str(self.eggs.id), 'quantity': '10', 'factor': '1'}],
+            'payment_amount': '0',
+            'payment_method': 'credit',
+            'payment_status': 'unpaid',
+            'total_amount': '350.00',
+            'balance_due': '350.00',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(OrderItem.objects.get(order_id=response.data['id']).price, Decimal('35.00'))
+
+        # A product deleted since the snapshot can no longer be sold
+        broiler_id = self.broiler.id
+        self.broiler.delete()
+        self.assertEqual(list(get_items([broiler_id, self.eggs.id])), [self.eggs.id])
+
+    def test_list_is_served_from_the_cache(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([row['name'] for row in first.data], ['Broiler', 'Eggs'])
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_unchanged_catalog_returns_not_modified(self):
+        response = self.client.get(self.url)
+
+        by_etag = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(by_etag.status_code, 304)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_same_second_price_change_is_not_hidden_by_a_date(self):
+        response = self.client.get(self.url)
+        self.update_price(self.broiler, '545.00')
+
+        refetch = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE='Fri, 31 Dec 9999 23:59:59 GMT')
+
+        self.assertEqual(refetch.status_code, 200)
+        self.assertNotEqual(refetch['ETag'], response['ETag'])
+
+    def test_price_change_publishes_a_new_version(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.update_price(self.broiler, '540.00')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data[0]['price'], '540.00')
+
+    def test_checkout_prices_come_from_the_catalog(self):
+        get_catalog()
+        # Only the carted ids' stamps are read to check the snapshot
+        with self.assertNumQueries(1):
+            items = get_items([self.broiler.id, self.eggs.id])
+        self.assertEqual(items[self.broiler.id].price, Decimal('520.00'))
+
+        # Products the catalog has not seen yet are read from the database
+        fresh = Item.objects.create(name='Mutton', price=Decimal('1800.00'))
+        self.assertEqual(get_items([fresh.id])[fresh.id].name, 'Mutton')
+
+        self.update_price(self.eggs, '32.00')
+        customer = Client.objects.create(name='Hotel Shalimar', balance=Decimal('0'))
+        response = self.client.post('/api/sales/orders/create/', {
+            'customer': str(customer.id),
+            'items': [{'product': str(self.eggs.id), 'quantity': '10', 'factor': '1'}],
+            'payment_amount': '0',
+            'payment_method': 'credit',
+            'payment_status': 'unpaid',
+            'total_amount': '320.00',
+            'balance_due': '320.00',
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(OrderItem.objects.get(item=self.eggs).price, Decimal('32.00'))
+
+    def test_paginated_list_reads_the_database(self):
+        response = self.client.get(self.url, {'page_size': 1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+
+class PriceHistoryTests(PricingAPITestCase):
+    day = date(2025, 3, 1)
+
+    def at(self, hour, minute=0, day=None):
+        return timezone.make_aware(datetime.combine(day or self.day, datetime.min.time()).replace(hour=hour, minute=minute))
+
+    def set_rates(self, item, *rates):
+        """Replace an item's history with (moment, price) pairs"""
+        ItemPriceHistory.objects.filter(item=item).delete()
+        ItemPriceHistory.objects.bulk_create([
+            ItemPriceHistory(item=item, price=Decimal(price), effective_from=moment)
+            for moment, price in rates
+        ])
+
+    def test_every_price_change_is_recorded(self):
+        self.update_price(self.broiler, '540.00')
+        self.broiler.refresh_from_db()
+        self.broiler.name = 'Broiler (live)'
+        self.broiler.save()
+
+        prices = list(self.broiler.price_history.values_list('price', flat=True))
+        self.assertEqual(prices, [Decimal('520.00'), Decimal('540.00')])
+
+    def test_price_at_a_point_in_time(self):
+        self.set_rates(
+            self.broiler,
+            (self.at(8), '500.00'),
+            (self.at(10), '520.00'),
+            (self.at(15, 30), '510.00'),
+        )
+
+        with self.assertNumQueries(1):
+            self.assertEqual(price_at(self.broiler.id, self.at(10)), Decimal('520.00'))
+        self.assertEqual(price_at(self.broiler.id, self.at(9, 59)), Decimal('500.00'))
+        self.assertEqual(price_at(self.broiler.id, self.at(23)), Decimal('510.00'))
+        self.assertIsNone(price_at(self.broiler.id, self.at(7)))
+
+        response = self.client.get(f'{self.url}{self.broiler.id}/price-at/', {'at': '2025-03-01T10:00'})
+        self.assertEqual(response.data['price'], 520.0)
+
+    def test_rate_curve_for_a_day_in_one_query(self):
+        previous_day = self.day - timedelta(days=1)
+        self.set_rates(
+            self.broiler,
+            (self.at(9, day=previous_day), '480.00'),
+            (self.at(18, day=previous_day), '500.00'),
+            (self.at(10), '520.00'),
+            (self.at(15), '510.00'),
+            (self.at(9, day=self.day + timedelta(days=1)), '530.00'),
+        )
+        self.set_rates(self.eggs, (self.at(9, day=previous_day), '30.00'))
+
+        with self.assertNumQueries(1):
+            curve = rate_curve(self.day)
+
+        broiler, eggs = curve
+        self.assertEqual((broiler['opening_price'], broiler['closing_price']), (Decimal('500.00'), Decimal('510.00')))
+        self.assertEqual([change['price'] for change in broiler['changes']], [Decimal('520.00'), Decimal('510.00')])
+        self.assertEqual((eggs['opening_price'], eggs['closing_price'], eggs['changes']), (Decimal('30.00'), Decimal('30.00'), []))
+
+        response = self.client.get(f'{self.url}rate-curve/', {'date': '2025-03-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['products'][0]['closing_price'], 510.0)
+
+
+class BulkPriceUpdateTests(PricingAPITestCase):
+    bulk_url = '/api/pricing/products/update-prices/'
+
+    def test_prices_are_updated_together(self):
+        etag = self.client.get(self.url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.bulk_url, [
+                {'id': self.broiler.id, 'price': '540.00'},
+                {'id': self.eggs.id, 'price': '30.00'},
+            ], format='json')
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((response.data['updated'], response.data['changed']), (2, 1))
+        self.broiler.refresh_from_db()
+        self.assertEqual(self.broiler.price, Decimal('540.00'))
+        self.assertEqual(price_at(self.broiler.id, timezone.now()), Decimal('540.00'))
+        self.assertEqual(self.eggs.price_history.count(), 1)
+
+        listing = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(listing.status_code, 200)
+        self.assertEqual(listing['ETag'], f'"catalog-{response.data["catalog_version"]}"')
+        self.assertEqual(listing.data[0]['price'], '540.00')
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        products = [Item.objects.create(name=f'Cut {index}', price=Decimal('600.00')) for index in range(30)]
+
+        def update(items, price):
+            payload = {'prices': [{'id': item.id, 'price': price} for item in items]}
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.bulk_url, payload, format='json')
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        self.assertEqual(update(products[:2], '610.00'), update(products, '620.00'))
+
+    def test_one_bad_pair_rejects_the_batch(self):
+        response = self.client.post(self.bulk_url, {'prices': [
+            {'id': self.broiler.id, 'price': '540.00'},
+            {'id': 999999, 'price': '10.00'},
+            {'id': self.broiler.id, 'price': '545.00'},
+        ]}, format='json')
+        negative = self.client.post(self.bulk_url, [{'id': self.eggs.id, 'price': '-1'}], format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['prices']), {1, 2})
+        self.assertEqual(negative.status_code, 400)
+        self.broiler.refresh_from_db()
+        self.assertEqual(self.broiler.price, Decimal('520.00'))
+
+    def test_bulk_changes_reach_the_delta_sync(self):
+        version = self.client.get(f'{self.url}delta/').data['version']
+
+        self.client.post(self.bulk_url, [{'id': self.eggs.id, 'price': '31.00'}], format='json')
+        data = self.client.get(f'{self.url}delta/', {'since': version}).data
+
+        self.assertEqual([row['id'] for row in data['changed']], [self.eggs.id])
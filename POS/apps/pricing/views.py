@@ -1,9 +1,16 @@
+from datetime import datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from apps.sync.versions import changes_since
+from .catalog import get_catalog
+from .history import price_at, rate_curve
 from .models import Item
-from .serializers import ItemSerializer, ItemPriceUpdateSerializer
+from .serializers import ItemSerializer, ItemPriceUpdateSerializer, ItemBulkPriceUpdateSerializer
 
 
 class ItemViewSet(viewsets.ModelViewSet):
@@ -11,6 +18,97 @@ class ItemViewSet(viewsets.ModelViewSet):
     queryset = Item.objects.all().order_by('name')
     serializer_class = ItemSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('name', 'id')
+    
+    def list(self, request, *args, **kwargs):
+        """
+        Full product list served from the catalog cache.
+        Carries an ETag of the catalog version so terminals that already
+        have it get 304 Not Modified. There is deliberately no
+        Last-Modified: its one-second precision would answer 304 to a
+        terminal that fetched in the same second as a price change.
+        """
+        if 'cursor' in request.query_params or 'page_size' in request.query_params:
+            return super().list(request, *args, **kwargs)
+        
+        catalog = get_catalog()
+        if self.not_modified(request, catalog):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(catalog.rows)
+        response['ETag'] = catalog.etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    
+    def not_modified(self, request, catalog):
+        if_none_match = request.headers.get('If-None-Match')
+        if not if_none_match:
+            return False
+        return catalog.etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+    
+    @action(detail=False, methods=['get'], url_path='delta')
+    def delta(self, request):
+        """
+        Products created, changed or deleted after a sync version
+        Query params:
+        - since: version from the previous delta response (omit for a full sync)
+        """
+        since = request.query_params.get('since')
+        try:
+            since = int(since) if since else None
+        except ValueError:
+            return Response(
+                {'error': 'since must be a version number'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        changes = changes_since(Item.objects.all().order_by('name'), since)
+        changes['changed'] = ItemSerializer(changes['changed'], many=True).data
+        return Response(changes)
+    
+    @action(detail=True, methods=['get'], url_path='price-at')
+    def item_price_at(self, request, pk=None):
+        """
+        Price of a product at a point in time
+        Query params:
+        - at: ISO date-time, e.g. 2025-03-01T10:00 (default: now)
+        """
+        item = self.get_object()
+        at = request.query_params.get('at')
+        moment = parse_datetime(at) if at else timezone.now()
+        if moment is None:
+            return Response(
+                {'error': 'Invalid at. Use an ISO date-time, e.g. 2025-03-01T10:00'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        
+        price = price_at(item.id, moment)
+        return Response({
+            'product': item.id,
+            'name': item.name,
+            'at': moment,
+            'price': price
+        })
+    
+    @action(detail=False, methods=['get'], url_path='rate-curve')
+    def daily_rate_curve(self, request):
+        """
+        Every product's rates over one day: opening price, each change and closing price
+        Query params:
+        - date: YYYY-MM-DD (default: today)
+        """
+        date_str = request.query_params.get('date')
+        try:
+            day = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else timezone.localdate()
+        except ValueError:
+            return Response(
+                {'error': 'Invalid date format. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({'date': day, 'products': rate_curve(day)})
     
     @action(detail=True, methods=['patch'], url_path='update-price')
     def update_price(self, request, pk=None):
@@ -24,4 +122,25 @@ class ItemViewSet(viewsets.ModelViewSet):
                 ItemSerializer(item).data,
                 status=status.HTTP_200_OK
             )
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['post'], url_path='update-prices')
+    def update_prices(self, request):
+        """
+        Update many prices in one request (morning rate change).
+        Body: a list of {"id": ..., "price": ...} pairs, or {"prices": [...]}.
+        Nothing is written unless every pair is valid.
+        """
+        pairs = request.data if isinstance(request.data, list) else request.data.get('prices')
+        serializer = ItemBulkPriceUpdateSerializer(data={'prices': pairs})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        result = serializer.save()
+        return Response({
+            'updated': len(result['items']),
+            'changed': result['changed'],
+            # Versions are nanosecond stamps, too large for a JS number
+            'catalog_version': str(result['catalog_version']),
+            'products': ItemSerializer(result['items'], many=True).data
+        }, status=status.HTTP_200_OK)
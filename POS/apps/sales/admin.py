@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Client, Order, OrderItem, ReceiptItem, Receipt
+from .models import Client, Order, OrderItem, ReceiptItem, Receipt, DailySalesSummary, LedgerEntry, ReceiptReprintLog, ReceiptOutbox, ReportExportJob
+from .rollups import order_key, refresh_summaries
 
 @admin.register(Client)
 class ClientAdmin(admin.ModelAdmin):
@@ -7,6 +8,8 @@ class ClientAdmin(admin.ModelAdmin):
     list_filter = ['name']
     search_fields = ['name']
     ordering = ['name']
+    # Balance changes are posted through the ledger, not edited here
+    readonly_fields = ['balance']
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -45,6 +48,25 @@ class OrderAdmin(admin.ModelAdmin):
             'fields': ('payment_amount', 'payment_status', 'balance_due'),
         }),
     )
+    
+    # Edits are recounted in the daily rollup once the lines are saved too
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        order = form.instance
+        keys = [order_key(order)]
+        if change:
+            keys.append((form.initial['date'], form.initial['client'], order.payment_method))
+        refresh_summaries(keys)
+    
+    def delete_model(self, request, obj):
+        key = order_key(obj)
+        super().delete_model(request, obj)
+        refresh_summaries([key])
+    
+    def delete_queryset(self, request, queryset):
+        keys = [order_key(order) for order in queryset]
+        super().delete_queryset(request, queryset)
+        refresh_summaries(keys)
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
@@ -55,11 +77,71 @@ class OrderItemAdmin(admin.ModelAdmin):
     def total_price(self, obj):
         return obj.quantity * obj.price
     total_price.short_description = 'Total'
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        orders = {obj.order_id, form.initial.get('order', obj.order_id)}
+        refresh_summaries(order_key(order) for order in Order.objects.filter(pk__in=orders))
+    
+    def delete_model(self, request, obj):
+        order = obj.order
+        super().delete_model(request, obj)
+        refresh_summaries([order_key(order)])
+    
+    def delete_queryset(self, request, queryset):
+        keys = [order_key(order) for order in Order.objects.filter(items__in=queryset).distinct()]
+        super().delete_queryset(request, queryset)
+        refresh_summaries(keys)
 
 admin.site.register(ReceiptItem)
 admin.site.register(Receipt)
 
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_select_related = ['client']
+    list_display = ['id', 'client', 'timestamp', 'entry_type', 'debit', 'credit', 'balance', 'order']
+    list_filter = ['entry_type']
+    search_fields = ['client__name', 'description']
+    raw_id_fields = ['client', 'order']
+    ordering = ['-timestamp', '-id']
+
+
+@admin.register(DailySalesSummary)
+class DailySalesSummaryAdmin(admin.ModelAdmin):
+    list_select_related = ['client']
+    list_display = ['date', 'client', 'payment_method', 'total_sales', 'total_paid', 'total_due', 'order_count', 'item_quantity']
+    list_filter = ['date', 'payment_method']
+    date_hierarchy = 'date'
+    ordering = ['-date']
+
 # Optional: If you want to customize the admin site header
 admin.site.site_header = "Bilal Poultry Traders Admin"
 admin.site.site_title = "Sales Administration"
-admin.site.index_title = "Welcome to Sales Admin"
\ No newline at end of file
+admin.site.index_title = "Welcome to Sales Admin"
+
+
+@admin.register(ReceiptReprintLog)
+class ReceiptReprintLogAdmin(admin.ModelAdmin):
+    list_select_related = ['receipt', 'reprinted_by']
+    list_display = ['receipt', 'reprint_number', 'reprinted_at', 'reprinted_by']
+    search_fields = ['receipt__receipt_number']
+    raw_id_fields = ['receipt']
+    ordering = ['-reprinted_at', '-id']
+
+
+@admin.register(ReceiptOutbox)
+class ReceiptOutboxAdmin(admin.ModelAdmin):
+    list_display = ['receipt_number', 'order', 'created_at', 'attempts', 'available_at', 'last_error']
+    search_fields = ['receipt_number']
+    raw_id_fields = ['order']
+    ordering = ['id']
+
+
+@admin.register(ReportExportJob)
+class ReportExportJobAdmin(admin.ModelAdmin):
+    list_select_related = ['requested_by', 'customer']
+    list_display = ['id', 'file_format', 'start_date', 'end_date', 'customer', 'status', 'rows_written', 'rows_total', 'requested_by', 'created_at']
+    list_filter = ['status', 'file_format']
+    raw_id_fields = ['customer', 'requested_by']
+    ordering = ['-created_at', '-id']
@@ -0,0 +1,226 @@
+import logging
+from datetime import date, datetime
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from POS.renderers import dumps
+from .balances import acustomer_balances_snapshot
+from .models import Client, Order, Receipt
+from .outbox import pending_receipt
+from .reports import (
+    aserialize_orders,
+    aorder_totals,
+    abuild_daily_breakdown,
+    asummary_totals,
+    asummary_daily_breakdown,
+    summary_queryset
+)
+from .serializers import ReceiptSerializer
+from .views import wants_detail
+
+logger = logging.getLogger(__name__)
+
+
+def json_response(data, status=200):
+    return HttpResponse(dumps(data), content_type='application/json', status=status)
+
+
+def jwt_required(view):
+    """Same JWT (Bearer token) authentication as the DRF views"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            result = await sync_to_async(JWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            result, detail = None, e.detail
+        else:
+            detail = 'Authentication credentials were not provided.'
+        if result is None:
+            response = json_response(detail if isinstance(detail, dict) else {'detail': detail}, status=401)
+            response['WWW-Authenticate'] = 'Bearer realm="api"'
+            return response
+        request.user = result[0]
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+async def customer_filter_for(customer_id):
+    """(customer_filter, customer_balance) for a report's ?customer="""
+    if not customer_id:
+        return None, None
+    customer = await Client.objects.filter(id=customer_id).afirst()
+    if customer is None:
+        return f"Customer ID: {customer_id}", None
+    return customer.name, customer.balance
+
+
+@require_GET
+@jwt_required
+async def daily_report(request):
+    """
+    Async orders/reports/daily
+    Query params:
+    - date: YYYY-MM-DD (default: today)
+    - customer: customer ID (optional)
+    - detail: 'false' to return totals only, read from the daily rollup (default: true)
+    """
+    try:
+        report_date = parse_date(request.GET['date']) if request.GET.get('date') else date.today()
+    except ValueError:
+        return json_response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
+
+    customer_id = request.GET.get('customer')
+    if customer_id and not customer_id.isdigit():
+        return json_response({'error': 'Invalid customer ID'}, status=400)
+
+    try:
+        customer_filter, customer_balance = await customer_filter_for(customer_id)
+
+        if not wants_detail(request):
+            totals = await asummary_totals(summary_queryset(report_date, report_date, customer_id))
+            return json_response({
+                'date': report_date.strftime('%Y-%m-%d'),
+                'total_sales': totals['total_sales'],
+                'total_paid': totals['total_paid'],
+                'total_due': totals['total_due'],
+                'order_count': totals['order_count'],
+                'item_quantity': totals['item_quantity'],
+                'customer_filter': customer_filter,
+                'customer_balance': customer_balance
+            })
+
+        orders = Order.objects.filter(date=report_date)
+        if customer_id:
+            orders = orders.filter(client_id=customer_id)
+        totals = await aorder_totals(orders)
+
+        return json_response({
+            'date': report_date.strftime('%Y-%m-%d'),
+            'total_sales': totals['total_sales'],
+            'total_paid': totals['total_paid'],
+            'total_due': totals['total_due'],
+            'order_count': totals['order_count'],
+            'customer_filter': customer_filter,
+            'customer_balance': customer_balance,
+            'orders': await aserialize_orders(orders)
+        })
+
+    except Exception as e:
+        logger.exception("Error in async daily_report")
+        return json_response({'error': f'Internal server error: {str(e)}'}, status=500)
+
+
+@require_GET
+@jwt_required
+async def date_range_report(request):
+    """
+    Async orders/reports/date-range
+    Query params:
+    - start_date: YYYY-MM-DD (required)
+    - end_date: YYYY-MM-DD (required)
+    - customer: customer ID (optional)
+    - detail: 'false' to return totals and the daily breakdown only,
+      read from the daily rollup (default: true)
+    """
+    if not request.GET.get('start_date') or not request.GET.get('end_date'):
+        return json_response({'error': 'Both start_date and end_date are required'}, status=400)
+    try:
+        start = parse_date(request.GET['start_date'])
+        end = parse_date(request.GET['end_date'])
+    except ValueError:
+        return json_response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
+
+    customer_id = request.GET.get('customer')
+    if customer_id and not customer_id.isdigit():
+        return json_response({'error': 'Invalid customer ID'}, status=400)
+
+    try:
+        customer_filter, customer_balance = await customer_filter_for(customer_id)
+
+        if not wants_detail(request):
+            summaries = summary_queryset(start, end, customer_id)
+            totals = await asummary_totals(summaries)
+            return json_response({
+                'start_date': start.strftime('%Y-%m-%d'),
+                'end_date': end.strftime('%Y-%m-%d'),
+                'total_sales': totals['total_sales'],
+                'total_paid': totals['total_paid'],
+                'total_due': totals['total_due'],
+                'order_count': totals['order_count'],
+                'item_quantity': totals['item_quantity'],
+                'daily_breakdown': await asummary_daily_breakdown(summaries),
+                'customer_filter': customer_filter,
+                'customer_balance': customer_balance
+            })
+
+        orders = Order.objects.filter(date__gte=start, date__lte=end)
+        if customer_id:
+            orders = orders.filter(client_id=customer_id)
+        totals = await aorder_totals(orders)
+        all_order_details = await aserialize_orders(orders)
+
+        return json_response({
+            'start_date': start.strftime('%Y-%m-%d'),
+            'end_date': end.strftime('%Y-%m-%d'),
+            'total_sales': totals['total_sales'],
+            'total_paid': totals['total_paid'],
+            'total_due': totals['total_due'],
+            'order_count': totals['order_count'],
+            'orders': all_order_details,
+            'daily_breakdown': await abuild_daily_breakdown(orders, all_order_details),
+            'customer_filter': customer_filter,
+            'customer_balance': customer_balance
+        })
+
+    except Exception as e:
+        logger.exception("Error in async date_range_report")
+        return json_response({'error': f'Internal server error: {str(e)}'}, status=500)
+
+
+@require_GET
+@jwt_required
+async def customer_balances(request):
+    """
+    Async customers/balances
+    Query params:
+    - sort: 'balance' or 'name' (default: 'name')
+    - order: 'asc' or 'desc' (default: 'asc')
+    """
+    try:
+        return json_response(await acustomer_balances_snapshot(
+            request.GET.get('sort', 'name'),
+            request.GET.get('order', 'asc')
+        ))
+    except Exception as e:
+        logger.exception("Error in async customer_balances")
+        return json_response({'error': f'Internal server error: {str(e)}'}, status=500)
+
+
+@require_GET
+@jwt_required
+async def receipt_by_order(request, order_id):
+    """
+    Async receipts/by-order/<order_id>. A receipt the outbox has not
+    written yet answers 202 with its reserved number, as in the DRF view.
+    """
+    receipts = Receipt.objects.select_related('order').prefetch_related('items').filter(order_id=order_id)
+    try:
+        receipt = await receipts.afirst()
+        if receipt is None:
+            pending = await sync_to_async(pending_receipt)(order_id)
+            if pending is not None:
+                return json_response(pending, status=202)
+            return json_response({'error': 'Receipt not found for this order'}, status=404)
+        return json_response(ReceiptSerializer(receipt).data)
+    except Exception as e:
+        logger.exception("Error in async by_order")
+        return json_response({'error': str(e)}, status=500)
@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum, Count, Max, Q
+
+from .models import Client
+
+BALANCES_CACHE_PREFIX = 'sales:customer_balances'
+BALANCES_SORT_FIELDS = {
+    'name': 'name',
+    'balance': 'balance',
+}
+
+
+def snapshot_cache_key(sort_by, order):
+    return f"{BALANCES_CACHE_PREFIX}:{sort_by}:{order}"
+
+
+def build_customer_balances(sort_by='name', order='asc'):
+    """
+    Customer ledger data in two queries: one annotated list of clients with
+    their order count and last order date, and one aggregate with the total
+    balance and the positive/negative/zero counts.
+    """
+    return balances_payload(
+        balance_rows(sort_by, order),
+        Client.objects.aggregate(**balance_summary_aggregates())
+    )
+
+
+async def abuild_customer_balances(sort_by='name', order='asc'):
+    """build_customer_balances() through the async ORM"""
+    return balances_payload(
+        [customer async for customer in balance_rows(sort_by, order)],
+        await Client.objects.aaggregate(**balance_summary_aggregates())
+    )
+
+
+def balance_rows(sort_by, order):
+    field = BALANCES_SORT_FIELDS.get(sort_by, 'name')
+    ordering = f"-{field}" if order == 'desc' else field
+
+    return Client.objects.annotate(
+        order_count=Count('orders'),
+        last_order_date=Max('orders__date')
+    ).order_by(ordering, 'id').values('id', 'name', 'balance', 'order_count', 'last_order_date')
+
+
+def balance_summary_aggregates():
+    return {
+        'total_balance': Sum('balance'),
+        'count': Count('id'),
+        'positive_balance_count': Count('id', filter=Q(balance__gt=0)),
+        'negative_balance_count': Count('id', filter=Q(balance__lt=0)),
+        'zero_balance_count': Count('id', filter=Q(balance=0)),
+    }
+
+
+def balances_payload(customers, summary):
+    return {
+        'customers': [
+            {
+                'id': customer['id'],
+                'name': customer['name'],
+                'balance': customer['balance'],
+                'order_count': customer['order_count'],
+                'last_order_date': customer['last_order_date']
+            }
+            for customer in customers
+        ],
+        'total_balance': summary['total_balance'] or 0,
+        'count': summary['count'],
+        'positive_balance_count': summary['positive_balance_count'],
+        'negative_balance_count': summary['negative_balance_count'],
+        'zero_balance_count': summary['zero_balance_count']
+    }
+
+
+def customer_balances_snapshot(sort_by='name', order='asc'):
+    """
+    Return the customer balances data, served from the cache when
+    CUSTOMER_BALANCES_CACHE_TIMEOUT is set. The snapshot is dropped by
+    invalidate_customer_balances whenever a client or order changes.
+    """
+    timeout = getattr(settings, 'CUSTOMER_BALANCES_CACHE_TIMEOUT', None)
+    if not timeout:
+        return build_customer_balances(sort_by, order)
+
+    sort_by, order = snapshot_sort(sort_by, order)
+    key = snapshot_cache_key(sort_by, order)
+    data = cache.get(key)
+    if data is None:
+        data = build_customer_balances(sort_by, order)
+        cache.set(key, data, timeout)
+    return data
+
+
+async def acustomer_balances_snapshot(sort_by='name', order='asc'):
+    """customer_balances_snapshot() for async views"""
+    timeout = getattr(settings, 'CUSTOMER_BALANCES_CACHE_TIMEOUT', None)
+    if not timeout:
+        return await abuild_customer_balances(sort_by, order)
+
+    sort_by, order = snapshot_sort(sort_by, order)
+    key = snapshot_cache_key(sort_by, order)
+    data = await cache.aget(key)
+    if data is None:
+        data = await abuild_customer_balances(sort_by, order)
+        await cache.aset(key, data, timeout)
+    return data
+
+
+def snapshot_sort(sort_by, order):
+    """One cache entry per valid sort, unknown values fall back to the default"""
+    return (
+        sort_by if sort_by in BALANCES_SORT_FIELDS else 'name',
+        'desc' if order == 'desc' else 'asc'
+    )
+
+
+def invalidate_customer_balances():
+    """Drop every cached customer balances snapshot"""
+    cache.delete_many([
+        snapshot_cache_key(sort_by, order)
+        for sort_by in BALANCES_SORT_FIELDS
+        for order in ('asc', 'desc')
+    ])
@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+from apps.pricing.models import Item
+from .models import Client
+from .seeding import TWO_PLACES
+
+
+class Rollback(Exception):
+    """Raised inside a benchmark's transaction to discard its data"""
+
+
+def benchmark_catalog(count):
+    """A throwaway customer and `count` products to check out against"""
+    customer = Client.objects.create(name='Benchmark customer')
+    products = Item.objects.bulk_create([
+        Item(name=f'Benchmark item {index}', price=Decimal('100.00') + index)
+        for index in range(count)
+    ])
+    return customer, products
+
+
+def checkout_payload(customer, products, quantities=None, order_date=None):
+    """
+    An unpaid credit OrderCreateSerializer payload with one line per
+    product, of quantity 1 unless `quantities` (strings) are given.
+    """
+    quantities = quantities or ['1'] * len(products)
+    total = sum(
+        (product.price * Decimal(quantity) for product, quantity in zip(products, quantities)),
+        Decimal('0')
+    ).quantize(TWO_PLACES)
+    payload = {
+        'customer': str(customer.id),
+        'items': [
+            {'product': str(product.id), 'quantity': quantity, 'factor': '1'}
+            for product, quantity in zip(products, quantities)
+        ],
+        'payment_amount': '0',
+        'payment_method': 'credit',
+        'payment_status': 'unpaid',
+        'total_amount': str(total),
+        'balance_due': str(total),
+    }
+    if order_date is not None:
+        payload['date'] = order_date.isoformat()
+    return payload
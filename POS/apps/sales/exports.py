@@ -0,0 +1,237 @@
+import csv
+import logging
+import os
+import threading
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+
+from .listings import LINE_TOTAL
+from .models import OrderItem, ReportExportJob
+
+try:
+    import openpyxl
+except ImportError:  # XLSX exports are optional
+    openpyxl = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = 'exports'
+TWO_PLACES = Decimal('0.01')
+LINE_TOTAL_COLUMN = 6
+
+# One row per order line, in date-range report order
+EXPORT_COLUMNS = [
+    ('order_id', 'Order ID'),
+    ('order_date', 'Date'),
+    ('customer_name', 'Customer'),
+    ('product', 'Product'),
+    ('quantity', 'Quantity'),
+    ('price', 'Price'),
+    ('line_total', 'Line Total'),
+    ('order_total', 'Order Total'),
+    ('payment_amount', 'Payment'),
+    ('payment_status', 'Payment Status'),
+    ('balance_due', 'Balance Due'),
+]
+
+
+def chunk_size():
+    return getattr(settings, 'REPORT_EXPORT_CHUNK_SIZE', 2000)
+
+
+def xlsx_available():
+    return openpyxl is not None
+
+
+def export_lines(job):
+    """
+    values() query of the job's order lines with their order and customer
+    columns joined in, so no model instances are built per row.
+    """
+    lines = OrderItem.objects.filter(
+        order__date__gte=job.start_date,
+        order__date__lte=job.end_date
+    )
+    if job.customer_id:
+        lines = lines.filter(order__client_id=job.customer_id)
+    return lines.order_by('order__date', 'order_id', 'id').values_list(
+        'order_id',
+        F('order__date'),
+        F('order__client__name'),
+        F('item__name'),
+        'quantity',
+        'price',
+        LINE_TOTAL,
+        F('order__total'),
+        F('order__payment_amount'),
+        F('order__payment_status'),
+        F('order__balance_due'),
+    )
+
+
+class CSVWriter:
+    def __init__(self, path):
+        self.handle = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.handle)
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+    def flush(self):
+        self.handle.flush()
+
+    def close(self):
+        self.handle.close()
+
+
+class XLSXWriter:
+    """openpyxl write-only workbook: rows are spooled to disk as they are added"""
+
+    def __init__(self, path):
+        self.path = path
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet('Sales')
+
+    def write(self, row):
+        self.sheet.append(row)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+WRITERS = {
+    ReportExportJob.CSV: CSVWriter,
+    ReportExportJob.XLSX: XLSXWriter,
+}
+
+
+def export_filename(job):
+    return f"sales-{job.start_date:%Y%m%d}-{job.end_date:%Y%m%d}-{job.pk}.{job.file_format}"
+
+
+def write_export(job):
+    """
+    Stream the job's rows into its file under MEDIA_ROOT/exports/. Rows are
+    fetched REPORT_EXPORT_CHUNK_SIZE at a time (a server-side cursor on
+    PostgreSQL) and progress is saved after every chunk, so memory does
+    not grow with the date range. The file is written next to its final
+    name and moved into place once complete.
+    """
+    if job.file_format == ReportExportJob.XLSX and not xlsx_available():
+        raise RuntimeError('XLSX export needs openpyxl installed')
+
+    size = chunk_size()
+    name = f"{EXPORT_DIR}/{export_filename(job)}"
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    lines = export_lines(job)
+    job.rows_total = lines.count()
+    job.save(update_fields=['rows_total'])
+
+    partial = f"{path}.part"
+    writer = WRITERS[job.file_format](partial)
+    try:
+        writer.write([label for _, label in EXPORT_COLUMNS])
+        written = 0
+        for row in lines.iterator(chunk_size=size):
+            # Quantity x price comes back with four places; money has two
+            row = list(row)
+            row[LINE_TOTAL_COLUMN] = row[LINE_TOTAL_COLUMN].quantize(TWO_PLACES)
+            writer.write(row)
+            written += 1
+            if written % size == 0:
+                writer.flush()
+                ReportExportJob.objects.filter(pk=job.pk).update(rows_written=written)
+        writer.close()
+    except BaseException:
+        writer.close()
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    os.replace(partial, path)
+
+    job.rows_written = written
+    job.file.name = name
+    return job
+
+
+def claim_job(job_id):
+    """Mark a pending job running; False if another worker took it first"""
+    return bool(ReportExportJob.objects.filter(pk=job_id, status=ReportExportJob.PENDING).update(
+        status=ReportExportJob.RUNNING,
+        started_at=timezone.now()
+    ))
+
+
+def run_export_job(job_id):
+    """Claim and write one pending job. Returns the job, or None if it was not pending."""
+    if not claim_job(job_id):
+        return None
+
+    job = ReportExportJob.objects.get(pk=job_id)
+    try:
+        write_export(job)
+    except Exception as e:
+        logger.exception("Report export %s failed", job_id)
+        job.status = ReportExportJob.FAILED
+        job.error = f"{type(e).__name__}: {e}"[:2000]
+    else:
+        job.status = ReportExportJob.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'rows_written', 'file', 'finished_at'])
+    return job
+
+
+def run_pending_exports():
+    """Write every pending job, oldest first. Returns how many were run."""
+    pending = list(
+        ReportExportJob.objects.filter(status=ReportExportJob.PENDING).order_by('id').values_list('id', flat=True)
+    )
+    return sum(1 for job_id in pending if run_export_job(job_id) is not None)
+
+
+class ExportWorker(threading.Thread):
+    """
+    Background thread that writes export jobs. It is started by the first
+    job of the process, woken after every new job and also polls every
+    REPORT_EXPORT_POLL_SECONDS.
+    """
+
+    def __init__(self):
+        super().__init__(name='report-exports', daemon=True)
+        self.wake = threading.Event()
+
+    def run(self):
+        poll = getattr(settings, 'REPORT_EXPORT_POLL_SECONDS', 30)
+        while True:
+            self.wake.wait(poll)
+            self.wake.clear()
+            close_old_connections()
+            try:
+                while run_pending_exports():
+                    pass
+            except Exception:
+                logger.exception("Report export worker failed")
+            finally:
+                connection.close()
+
+
+_worker_lock = threading.Lock()
+_worker = None
+
+
+def wake_export_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = ExportWorker()
+            _worker.start()
+    _worker.wake.set()
@@ -0,0 +1,157 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from apps.sync.versions import touch
+from .balances import invalidate_customer_balances
+from .models import Client, LedgerEntry
+
+
+def ledger_entry(entry_type, debit=Decimal('0'), credit=Decimal('0'), order=None, description=''):
+    """Build an unsaved LedgerEntry; post_entries fills in client and balance"""
+    return LedgerEntry(
+        entry_type=entry_type,
+        debit=debit,
+        credit=credit,
+        order=order,
+        description=description
+    )
+
+
+def post_entries(client_id, entries):
+    """
+    Append ledger entries for one client and apply their net amount to
+    Client.balance. Returns the balance before and after the entries.
+
+    The balance is changed with a single UPDATE ... SET balance = balance +
+    amount, which takes the row lock before anything is read, so concurrent
+    checkouts for the same client queue up instead of overwriting each
+    other, and the running balances written to the entries follow the same
+    order. Only the balance column is written under the lock; the sync
+    stamp that sends the new balance to terminals is added after commit,
+    so checkouts for different clients never wait on the shared version
+    counter.
+    """
+    amount = sum((entry.debit - entry.credit for entry in entries), Decimal('0'))
+
+    with transaction.atomic():
+        updated = Client.objects.filter(pk=client_id).update(balance=F('balance') + amount)
+        if not updated:
+            raise Client.DoesNotExist(f"Client {client_id} not found")
+        balance = Client.objects.filter(pk=client_id).values_list('balance', flat=True).get()
+
+        # Stamped only now that the client row is locked, so timestamps
+        # follow the same order as the running balances
+        now = timezone.now()
+        running = previous = balance - amount
+        for entry in entries:
+            running += entry.debit - entry.credit
+            entry.client_id = client_id
+            entry.balance = running
+            entry.timestamp = now
+        LedgerEntry.objects.bulk_create(entries)
+
+    # Queryset updates do not send post_save, so drop the snapshot here
+    transaction.on_commit(invalidate_customer_balances)
+    transaction.on_commit(lambda: touch(Client, [client_id]))
+    return previous, balance
+
+
+def apply_balance_change(client_id, amount, entry_type=LedgerEntry.ADJUSTMENT, order=None, description=''):
+    """Add `amount` to a client's balance as one ledger entry; returns (previous, updated)"""
+    return post_entries(client_id, [ledger_entry(
+        entry_type,
+        debit=max(amount, Decimal('0')),
+        credit=max(-amount, Decimal('0')),
+        order=order,
+        description=description
+    )])
+
+
+def order_entry(order):
+    """Ledger entry for an order: the bill is a debit and the payment a credit"""
+    return ledger_entry(
+        LedgerEntry.ORDER,
+        debit=order.total,
+        credit=order.payment_amount,
+        order=order,
+        description=f"Order {order.id}"
+    )
+
+
+def open_ledger(client):
+    """Record a new client's starting balance"""
+    return LedgerEntry.objects.create(
+        client=client,
+        entry_type=LedgerEntry.OPENING,
+        debit=max(client.balance, Decimal('0')),
+        credit=max(-client.balance, Decimal('0')),
+        balance=client.balance,
+        description='Opening balance'
+    )
+
+
+def balance_before(client_id, moment):
+    """
+    Balance just before `moment`: the last checkpoint older than it plus
+    the debits and credits posted between the two. Both are reads of the
+    (client, timestamp) index, and the range summed is never longer than
+    the time between checkpoints.
+    """
+    entries = LedgerEntry.objects.filter(client_id=client_id, timestamp__lt=moment)
+    checkpoint = entries.filter(
+        entry_type=LedgerEntry.CHECKPOINT
+    ).order_by('-timestamp', '-id').values('id', 'timestamp', 'balance').first()
+
+    opening = Decimal('0')
+    if checkpoint is not None:
+        opening = checkpoint['balance']
+        entries = entries.filter(
+            Q(timestamp__gt=checkpoint['timestamp']) | Q(timestamp=checkpoint['timestamp'], id__gt=checkpoint['id'])
+        )
+    movement = entries.exclude(entry_type=LedgerEntry.CHECKPOINT).aggregate(
+        amount=Sum(F('debit') - F('credit'))
+    )['amount']
+    return opening + (movement or Decimal('0'))
+
+
+def statement_entries(client_id, start, end):
+    """Entries in [start, end) in order, read as one range of the index"""
+    return LedgerEntry.objects.filter(
+        client_id=client_id,
+        timestamp__gte=start,
+        timestamp__lt=end
+    ).exclude(entry_type=LedgerEntry.CHECKPOINT).select_related('order').order_by('timestamp', 'id')
+
+
+def write_checkpoints():
+    """
+    Append a checkpoint entry with the current running balance for every
+    client whose ledger moved since its last checkpoint, and report clients
+    whose Client.balance no longer matches the ledger.
+    Returns (checkpoints_written, drifted_client_ids).
+    """
+    written = 0
+    drifted = []
+
+    for client in Client.objects.only('id', 'balance').iterator():
+        with transaction.atomic():
+            last = LedgerEntry.objects.filter(client_id=client.id).order_by('-timestamp', '-id').first()
+            if last is None or last.entry_type == LedgerEntry.CHECKPOINT:
+                if last is not None and last.balance != client.balance:
+                    drifted.append(client.id)
+                continue
+
+            if last.balance != client.balance:
+                drifted.append(client.id)
+            LedgerEntry.objects.create(
+                client_id=client.id,
+                entry_type=LedgerEntry.CHECKPOINT,
+                balance=last.balance,
+                description='Checkpoint'
+            )
+            written += 1
+
+    return written, drifted
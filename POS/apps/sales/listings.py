@@ -0,0 +1,170 @@
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import OrderItem, ReceiptItem
+
+TWO_PLACES = Decimal('0.01')
+
+# Quantity (2 places) x price (2 places), computed by the database
+LINE_TOTAL = ExpressionWrapper(
+    F('quantity') * F('price'),
+    output_field=DecimalField(max_digits=20, decimal_places=4)
+)
+
+
+def decimal_text(value):
+    """A 2-place decimal the way DRF's DecimalField renders it"""
+    return None if value is None else f"{value.quantize(TWO_PLACES):f}"
+
+
+def datetime_text(value):
+    """A datetime the way DRF's DateTimeField renders it (local time, ISO 8601)"""
+    if value is None:
+        return None
+    value = timezone.localtime(value).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def lines_for(model, rows, key, fields, **expressions):
+    """
+    Lines of every row in `rows` read with one values() query, grouped by
+    their parent id in `key`.
+    """
+    grouped = {row['id']: [] for row in rows}
+    if not grouped:
+        return grouped
+    lines = model.objects.filter(**{f"{key}__in": list(grouped)}).order_by(key, 'id')
+    for line in lines.values(key, *fields, **expressions):
+        grouped[line.pop(key)].append(line)
+    return grouped
+
+
+async def alines_for(model, rows, key, fields, **expressions):
+    """lines_for() through the async ORM"""
+    grouped = {row['id']: [] for row in rows}
+    if not grouped:
+        return grouped
+    lines = model.objects.filter(**{f"{key}__in": list(grouped)}).order_by(key, 'id')
+    async for line in lines.values(key, *fields, **expressions):
+        grouped[line.pop(key)].append(line)
+    return grouped
+
+
+def order_values(orders):
+    """
+    Order list rows straight from the database: the client name and the
+    receipt (a reverse one-to-one) come in through joins instead of a
+    query per order. A receipt still in the outbox shows its reserved
+    number, as in OrderSerializer.
+    """
+    return orders.prefetch_related(None).values(
+        'id', 'client', 'total', 'date', 'payment_amount', 'payment_method',
+        'payment_status', 'balance_due',
+        customer_name=F('client__name'),
+        receipt_number=Coalesce(F('receipt__receipt_number'), F('receipt_outbox__receipt_number')),
+        receipt_id=F('receipt__id')
+    )
+
+
+def order_rows(rows):
+    """
+    Finish order_values() rows into the OrderSerializer representation,
+    with every order's lines read in one more query.
+    """
+    rows = list(rows)
+    lines = lines_for(
+        OrderItem, rows, 'order_id', ('id', 'item', 'quantity', 'price'),
+        item_name=F('item__name'), line_total=LINE_TOTAL
+    )
+
+    results = []
+    for row in rows:
+        items = []
+        for line in lines[row['id']]:
+            items.append({
+                'id': line['id'],
+                'item': line['item'],
+                'item_name': line['item_name'],
+                'quantity': decimal_text(line['quantity']),
+                'price': decimal_text(line['price']),
+                'line_total': decimal_text(line['line_total'])
+            })
+        results.append({
+            'id': row['id'],
+            'client': row['client'],
+            'customer_name': row['customer_name'],
+            'total': decimal_text(row['total']),
+            'date': row['date'].isoformat(),
+            'payment_amount': decimal_text(row['payment_amount']),
+            'payment_method': row['payment_method'],
+            'payment_status': row['payment_status'],
+            'balance_due': decimal_text(row['balance_due']),
+            'items': items,
+            'receipt_number': row['receipt_number'],
+            'receipt_id': row['receipt_id']
+        })
+    return results
+
+
+RECEIPT_DECIMAL_FIELDS = (
+    'previous_balance', 'current_bill_amount', 'payment_made',
+    'this_bill_balance', 'updated_balance'
+)
+
+
+def receipt_values(receipts):
+    """Receipt list rows straight from the database"""
+    return receipts.prefetch_related(None).values(
+        'id', 'order_id', 'receipt_number', 'receipt_date', 'customer', 'customer_name',
+        *RECEIPT_DECIMAL_FIELDS,
+        'payment_method', 'payment_status', 'store_name', 'store_address', 'store_phone',
+        'reprint_count', 'last_reprinted_at', 'created_at'
+    )
+
+
+def receipt_rows(rows):
+    """Finish receipt_values() rows into the ReceiptSerializer representation"""
+    rows = list(rows)
+    lines = lines_for(
+        ReceiptItem, rows, 'receipt_id',
+        ('product_name', 'quantity', 'unit', 'price_per_unit', 'total', 'product_id')
+    )
+
+    results = []
+    for row in rows:
+        items = []
+        for line in lines[row['id']]:
+            items.append({
+                'product_name': line['product_name'],
+                'quantity': decimal_text(line['quantity']),
+                'unit': line['unit'],
+                'price_per_unit': decimal_text(line['price_per_unit']),
+                'total': decimal_text(line['total']),
+                'product_id': line['product_id']
+            })
+        result = {
+            'id': row['id'],
+            'order_id': row['order_id'],
+            'receipt_number': row['receipt_number'],
+            'receipt_date': datetime_text(row['receipt_date']),
+            'customer': row['customer'],
+            'customer_name': row['customer_name'],
+        }
+        for field in RECEIPT_DECIMAL_FIELDS:
+            result[field] = decimal_text(row[field])
+        result.update({
+            'payment_method': row['payment_method'],
+            'payment_status': row['payment_status'],
+            'store_name': row['store_name'],
+            'store_address': row['store_address'],
+            'store_phone': row['store_phone'],
+            'items': items,
+            'reprint_count': row['reprint_count'],
+            'last_reprinted_at': datetime_text(row['last_reprinted_at']),
+            'created_at': datetime_text(row['created_at'])
+        })
+        results.append(result)
+    return results
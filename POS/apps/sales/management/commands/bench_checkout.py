@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.sales.benchmarks import Rollback, benchmark_catalog, checkout_payload
+from apps.sales.serializers import OrderCreateSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure checkout latency (OrderCreateSerializer) against the number of "
+        "cart lines. All data is created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lines', default='1,5,10,30,60',
+            help='Comma separated cart sizes to measure (default: 1,5,10,30,60)'
+        )
+        parser.add_argument('--repeat', type=int, default=20, help='Checkouts per cart size (default: 20)')
+
+    def handle(self, *args, **options):
+        line_counts = [int(value) for value in options['lines'].split(',') if value.strip()]
+        repeat = max(1, options['repeat'])
+
+        self.stdout.write(f"{'lines':>6} {'queries':>8} {'avg ms':>9} {'min ms':>9} {'max ms':>9}")
+        try:
+            with transaction.atomic():
+                customer, products = benchmark_catalog(max(line_counts))
+
+                for line_count in line_counts:
+                    timings = []
+                    queries = 0
+                    for _ in range(repeat):
+                        payload = checkout_payload(customer, products[:line_count])
+                        with CaptureQueriesContext(connection) as captured:
+                            started = time.perf_counter()
+                            serializer = OrderCreateSerializer(data=payload)
+                            serializer.is_valid(raise_exception=True)
+                            serializer.save()
+                            timings.append((time.perf_counter() - started) * 1000)
+                        queries = len(captured)
+
+                    self.stdout.write(
+                        f"{line_count:>6} {queries:>8} {sum(timings) / len(timings):>9.2f} "
+                        f"{min(timings):>9.2f} {max(timings):>9.2f}"
+                    )
+                raise Rollback()
+        except Rollback:
+            pass
+
@@ -0,0 +1,226 @@
+import json
+import platform
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from apps.ops.stats import percentile
+from apps.pricing.models import Item
+from apps.sales.balances import invalidate_customer_balances
+from apps.sales.models import Client, Order
+from apps.sales.benchmarks import Rollback, checkout_payload
+from apps.sales.seeding import seed_dataset
+from .seed_data import add_dataset_arguments, dataset_options
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the hot endpoints through Django's test client against a seeded "
+        "poultry-shop dataset: checkout, the daily, monthly and date-range "
+        "reports, customer balances, receipt lists and the product list. "
+        "Everything is written inside a transaction that is rolled back. "
+        "--save writes the results as a JSON baseline; --compare fails when "
+        "a later run is slower than the baseline by more than --tolerance "
+        "or runs more queries."
+    )
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser)
+        parser.add_argument(
+            '--existing', action='store_true',
+            help='Benchmark the data already in the database instead of seeding'
+        )
+        parser.add_argument('--repeat', type=int, default=10, help='Timed requests per endpoint (default: 10)')
+        parser.add_argument('--save', metavar='PATH', help='Write the results to PATH as a baseline')
+        parser.add_argument('--compare', metavar='PATH', help='Compare the results with the baseline at PATH')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Allowed median slowdown against the baseline, as a fraction (default: 0.25)'
+        )
+        parser.add_argument(
+            '--noise-ms', type=float, default=2.0,
+            help='Slowdowns smaller than this many milliseconds are never a regression (default: 2)'
+        )
+
+    def handle(self, *args, **options):
+        repeat = max(1, options['repeat'])
+        dataset = None if options['existing'] else dataset_options(options)
+        baseline = self.load_baseline(options['compare']) if options['compare'] else None
+
+        # A scratch cache keeps cached catalogs and snapshots of the
+        # rolled back data away from the real one
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir}
+        }):
+            try:
+                with transaction.atomic():
+                    if dataset is not None:
+                        started = time.perf_counter()
+                        summary = seed_dataset(**dataset)
+                        self.stdout.write(
+                            f"Seeded {summary['orders']} orders ({summary['lines']} lines) "
+                            f"in {time.perf_counter() - started:.1f}s"
+                        )
+                    else:
+                        summary = {'existing': True, 'orders': Order.objects.count()}
+                    results = self.run_cases(repeat)
+                    raise Rollback()
+            except Rollback:
+                pass
+
+        report = {
+            'dataset': summary,
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'repeat': repeat,
+            'results': results,
+        }
+
+        if options['save']:
+            with open(options['save'], 'w') as handle:
+                json.dump(report, handle, indent=2, sort_keys=True)
+                handle.write('\n')
+            self.stdout.write(f"Baseline written to {options['save']}")
+
+        if baseline is not None:
+            self.compare(baseline, report, options['tolerance'], options['noise_ms'])
+
+    def load_baseline(self, path):
+        try:
+            with open(path) as handle:
+                return json.load(handle)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read baseline {path}: {e}")
+
+    def cases(self):
+        """(name, method, url, params, before) for every benchmarked request"""
+        last_day = Order.objects.aggregate(last=Max('date'))['last'] or date.today()
+        busiest = (
+            Client.objects.annotate(order_count=Count('orders')).order_by('-order_count', 'id').first()
+            or Client.objects.create(name='Benchmark customer')
+        )
+        products = list(Item.objects.order_by('id')[:10])
+        if not products:
+            products = [Item.objects.create(name='Benchmark item', price=Decimal('500.00'))]
+
+        rng = random.Random(0)
+        checkout = checkout_payload(
+            busiest, products, [str(Decimal(rng.randint(50, 2000)) / 100) for _ in products], last_day
+        )
+
+        return [
+            ('checkout', 'post', '/api/sales/orders/create/', checkout, None),
+            ('report_daily', 'get', '/api/sales/orders/reports/daily/', {'date': last_day.isoformat()}, None),
+            ('report_date_range', 'get', '/api/sales/orders/reports/date-range/', {
+                'start_date': (last_day - timedelta(days=29)).isoformat(),
+                'end_date': last_day.isoformat(),
+            }, None),
+            ('report_monthly', 'get', '/api/sales/orders/reports/monthly/', {
+                'start_date': (last_day - timedelta(days=364)).isoformat(),
+                'end_date': last_day.isoformat(),
+            }, None),
+            # Measured uncached: the snapshot is dropped before every request
+            ('customer_balances', 'get', '/api/customers/balances/', {}, invalidate_customer_balances),
+            ('receipts_page', 'get', '/api/sales/receipts/', {'page_size': 50}, None),
+            ('receipts_by_customer', 'get', f'/api/sales/receipts/by-customer/{busiest.id}/', {}, None),
+            ('products', 'get', '/api/pricing/products/', {}, None),
+        ]
+
+    def run_cases(self, repeat):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='benchmark-runner'))
+
+        def request(method, url, params):
+            if method == 'post':
+                response = client.post(url, params, format='json')
+            else:
+                response = client.get(url, params)
+            # Streamed reports are only done once the last chunk is read
+            size = len(b''.join(response.streaming_content)) if response.streaming else len(response.content)
+            if response.status_code >= 400:
+                raise CommandError(f"{url} answered {response.status_code}")
+            return size
+
+        results = {}
+        self.stdout.write(
+            f"{'endpoint':<22} {'queries':>8} {'median ms':>10} {'p95 ms':>9} {'min ms':>9} {'bytes':>10}"
+        )
+        for name, method, url, params, before in self.cases():
+            # First request warms caches and counts the queries
+            if before:
+                before()
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as captured:
+                size = request(method, url, params)
+            queries = len(captured)
+
+            timings = []
+            for _ in range(repeat):
+                if before:
+                    before()
+                started = time.perf_counter()
+                request(method, url, params)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+
+            results[name] = {
+                'queries': queries,
+                'median_ms': round(percentile(timings, 0.50), 3),
+                'p95_ms': round(percentile(timings, 0.95), 3),
+                'min_ms': round(timings[0], 3),
+                'bytes': size,
+            }
+            self.stdout.write(
+                f"{name:<22} {queries:>8} {results[name]['median_ms']:>10.2f} "
+                f"{results[name]['p95_ms']:>9.2f} {results[name]['min_ms']:>9.2f} {size:>10}"
+            )
+        return results
+
+    def compare(self, baseline, report, tolerance, noise_ms):
+        def shape(dataset):
+            # Seeded dates move with the day the benchmark runs
+            return {key: value for key, value in (dataset or {}).items() if key not in ('start', 'end')}
+
+        if shape(baseline.get('dataset')) != shape(report['dataset']):
+            self.stderr.write("Warning: the baseline was recorded with a different dataset")
+
+        regressions = []
+        self.stdout.write(f"{'endpoint':<22} {'queries':>12} {'median ms':>20} {'change':>8}")
+        for name, result in report['results'].items():
+            before = baseline.get('results', {}).get(name)
+            if before is None:
+                self.stdout.write(f"{name:<22} {'(not in baseline)':>12}")
+                continue
+
+            change = result['median_ms'] / before['median_ms'] - 1 if before['median_ms'] else 0
+            slower = (
+                result['median_ms'] > before['median_ms'] * (1 + tolerance)
+                and result['median_ms'] - before['median_ms'] > noise_ms
+            )
+            more_queries = result['queries'] > before['queries']
+            if slower:
+                regressions.append(f"{name}: median {before['median_ms']:.2f} -> {result['median_ms']:.2f} ms")
+            if more_queries:
+                regressions.append(f"{name}: queries {before['queries']} -> {result['queries']}")
+            self.stdout.write(
+                f"{name:<22} {before['queries']:>5} -> {result['queries']:<4} "
+                f"{before['median_ms']:>9.2f} -> {result['median_ms']:<8.2f} {change:>+8.0%}"
+                f"{'  REGRESSION' if slower or more_queries else ''}"
+            )
+
+        if regressions:
+            raise CommandError("Performance regressions against the baseline:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.sales.benchmarks import Rollback, benchmark_catalog, checkout_payload
+from apps.sales.listings import order_values, order_rows, receipt_values, receipt_rows
+from apps.sales.models import Order, Receipt
+from apps.sales.serializers import OrderCreateSerializer, OrderSerializer, ReceiptSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/second of the order and receipt list representations: "
+        "the DRF serializers against the values() based rows. All data is "
+        "created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=500, help='Orders to create (default: 500)')
+        parser.add_argument('--lines', type=int, default=5, help='Lines per order (default: 5)')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per representation (default: 5)')
+
+    def handle(self, *args, **options):
+        repeat = max(1, options['repeat'])
+
+        try:
+            with transaction.atomic():
+                customer, products = benchmark_catalog(options['lines'])
+                payload = checkout_payload(customer, products)
+                for _ in range(options['orders']):
+                    serializer = OrderCreateSerializer(data=payload)
+                    serializer.is_valid(raise_exception=True)
+                    serializer.save()
+
+                orders = Order.objects.filter(client=customer).select_related('client').prefetch_related('items')
+                receipts = Receipt.objects.filter(customer=customer).select_related('order', 'customer').prefetch_related('items')
+                cases = [
+                    ('orders', 'serializer', lambda: OrderSerializer(orders.all(), many=True).data),
+                    ('orders', 'values', lambda: order_rows(order_values(orders.all()))),
+                    ('receipts', 'serializer', lambda: ReceiptSerializer(receipts.all(), many=True).data),
+                    ('receipts', 'values', lambda: receipt_rows(receipt_values(receipts.all()))),
+                ]
+
+                self.stdout.write(f"{'list':>9} {'path':>11} {'rows':>6} {'queries':>8} {'avg ms':>9} {'rows/s':>10}")
+                for name, path, build in cases:
+                    timings = []
+                    for _ in range(repeat):
+                        # Keep the query log from hitting its cap
+                        connection.queries_log.clear()
+                        with CaptureQueriesContext(connection) as captured:
+                            started = time.perf_counter()
+                            rows = len(build())
+                            timings.append(time.perf_counter() - started)
+                    average = sum(timings) / len(timings)
+                    self.stdout.write(
+                        f"{name:>9} {path:>11} {rows:>6} {len(captured):>8} "
+                        f"{average * 1000:>9.2f} {rows / average if average else 0:>10.0f}"
+                    )
+                raise Rollback()
+        except Rollback:
+            pass
+
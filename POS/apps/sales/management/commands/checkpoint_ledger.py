@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.sales.ledger import write_checkpoints
+
+
+class Command(BaseCommand):
+    help = (
+        "Append a checkpoint row to every customer ledger that changed since its "
+        "last checkpoint and report balances that no longer match the ledger. "
+        "Meant to run periodically (e.g. nightly from cron)."
+    )
+
+    def handle(self, *args, **options):
+        written, drifted = write_checkpoints()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} ledger checkpoints"))
+        for client_id in drifted:
+            self.stdout.write(self.style.WARNING(
+                f"Client {client_id}: balance does not match the ledger running balance"
+            ))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.sales.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the receipts waiting in the receipt outbox. Runs once by "
+        "default; --loop keeps polling, as a dedicated worker process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep draining until interrupted')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls with --loop (default: 2)')
+        parser.add_argument('--batch', type=int, default=100, help='Rows per batch (default: 100)')
+
+    def handle(self, *args, **options):
+        total_written = total_failed = 0
+        while True:
+            written, failed = drain_outbox(options['batch'])
+            total_written += written
+            total_failed += failed
+            if written:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {total_written} receipts, {total_failed} failed"))
@@ -0,0 +1,116 @@
+import json
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from apps.pricing.models import Item
+from apps.sales.benchmarks import checkout_payload
+from apps.sales.models import Client, Receipt
+from apps.sales.outbox import drain_outbox
+from apps.sales.serializers import OrderCreateSerializer
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent checkouts against the configured database and report "
+        "throughput. Run it once per backend (e.g. with and without "
+        "POS_DB_ENGINE=postgresql) to compare them. The data it creates is "
+        "deleted afterwards, apart from the receipt numbers it used."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', default='1,4,8', help='Comma separated thread counts (default: 1,4,8)')
+        parser.add_argument('--orders', type=int, default=50, help='Checkouts per worker (default: 50)')
+        parser.add_argument('--lines', type=int, default=5, help='Cart lines per checkout (default: 5)')
+        parser.add_argument('--shared-customer', action='store_true',
+                            help='Send every checkout to the same customer (worst case for row locks)')
+        parser.add_argument('--output', help='Append the results as JSON lines to this file')
+
+    def handle(self, *args, **options):
+        worker_counts = [int(value) for value in options['workers'].split(',') if value.strip()]
+        backend = f"{connection.vendor} ({connection.settings_dict['NAME']})"
+
+        products = Item.objects.bulk_create([
+            Item(name=f'Load test item {index}', price=Decimal('100.00') + index)
+            for index in range(options['lines'])
+        ])
+        customers = [
+            Client.objects.create(name=f'Load test customer {index}')
+            for index in range(1 if options['shared_customer'] else max(worker_counts))
+        ]
+
+        self.stdout.write(f"Backend: {backend}")
+        self.stdout.write(f"{'workers':>8} {'orders':>7} {'errors':>7} {'orders/s':>9} {'p50 ms':>8} {'p95 ms':>8}")
+        results = []
+        try:
+            for workers in worker_counts:
+                result = self.run(workers, options['orders'], customers, products)
+                result.update({'backend': connection.vendor, 'lines': options['lines']})
+                results.append(result)
+                self.stdout.write(
+                    f"{workers:>8} {result['orders']:>7} {result['errors']:>7} "
+                    f"{result['throughput']:>9.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f}"
+                )
+        finally:
+            # Queued receipts are written first so the worker does not add
+            # any after the cleanup
+            while drain_outbox()[0]:
+                pass
+            Receipt.objects.filter(customer__in=customers).delete()
+            Client.objects.filter(pk__in=[customer.pk for customer in customers]).delete()
+            Item.objects.filter(pk__in=[product.pk for product in products]).delete()
+
+        if options['output']:
+            with open(options['output'], 'a') as output:
+                for result in results:
+                    output.write(json.dumps(result) + '\n')
+
+    def run(self, workers, orders_per_worker, customers, products):
+        timings = []
+        errors = []
+        lock = threading.Lock()
+
+        def worker(index):
+            payload = checkout_payload(customers[index % len(customers)], products)
+            try:
+                for _ in range(orders_per_worker):
+                    started = time.perf_counter()
+                    try:
+                        serializer = OrderCreateSerializer(data=payload)
+                        serializer.is_valid(raise_exception=True)
+                        serializer.save()
+                    except Exception as e:
+                        with lock:
+                            errors.append(str(e))
+                        continue
+                    with lock:
+                        timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            'workers': workers,
+            'orders': len(timings),
+            'errors': len(errors),
+            'throughput': len(timings) / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(timings, 0.50),
+            'p95_ms': percentile(timings, 0.95),
+        }
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.sales.rollups import rebuild_daily_summaries
+
+
+def parse_date(value, name):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Invalid {name} format. Use YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily sales summary rollup from order history"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end-date', help='Last day to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        start = parse_date(options['start_date'], 'start-date') if options['start_date'] else None
+        end = parse_date(options['end_date'], 'end-date') if options['end_date'] else None
+
+        count = rebuild_daily_summaries(start, end)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} daily sales summary rows"))
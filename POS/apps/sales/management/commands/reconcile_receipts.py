@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from apps.sales.models import Order
+from apps.sales.outbox import ensure_receipt, max_attempts
+
+
+class Command(BaseCommand):
+    help = (
+        "Find orders without a receipt: still queued in the receipt outbox, "
+        "given up after RECEIPT_OUTBOX_MAX_ATTEMPTS, or missing from the "
+        "outbox altogether. --fix writes the receipts of the last two now."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Write the missing receipts')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.filter(receipt__isnull=True).order_by('id').values_list(
+            'id', 'receipt_outbox__attempts', 'receipt_outbox__last_error'
+        )
+
+        queued, stuck, missing = [], [], []
+        for order_id, attempts, last_error in orders:
+            if attempts is None:
+                missing.append(order_id)
+            elif attempts >= max_attempts():
+                stuck.append(order_id)
+                self.stdout.write(f"Order {order_id}: gave up after {attempts} attempts: {last_error}")
+            else:
+                queued.append(order_id)
+
+        self.stdout.write(
+            f"{len(queued)} queued, {len(stuck)} failed, {len(missing)} without an outbox row"
+        )
+        if not options['fix']:
+            return
+
+        written = 0
+        for order_id in stuck + missing:
+            try:
+                ensure_receipt(order_id)
+                written += 1
+            except Exception as e:
+                self.stderr.write(f"Order {order_id}: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} receipts"))
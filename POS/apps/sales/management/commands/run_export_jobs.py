@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.sales.exports import run_pending_exports
+from apps.sales.models import ReportExportJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the pending report export jobs. Runs once by default; --loop "
+        "keeps polling, as a dedicated worker process. --requeue first puts "
+        "jobs left running by a stopped worker back in the queue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running jobs until interrupted')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --loop (default: 5)')
+        parser.add_argument(
+            '--requeue', action='store_true',
+            help='Reset running jobs to pending first (only when no other worker is running)'
+        )
+
+    def handle(self, *args, **options):
+        if options['requeue']:
+            requeued = ReportExportJob.objects.filter(status=ReportExportJob.RUNNING).update(
+                status=ReportExportJob.PENDING, rows_written=0, started_at=None
+            )
+            self.stdout.write(f"Requeued {requeued} jobs")
+
+        total = 0
+        while True:
+            ran = run_pending_exports()
+            total += ran
+            if ran:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {total} export jobs"))
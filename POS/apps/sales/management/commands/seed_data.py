@@ -0,0 +1,63 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.sales.seeding import seed_dataset
+
+
+def add_dataset_arguments(parser):
+    parser.add_argument('--clients', type=int, default=50, help='Customers to create (default: 50)')
+    parser.add_argument('--items', type=int, default=12, help='Products to create (default: 12)')
+    parser.add_argument('--days', type=int, default=730, help='Days of trade up to --end-date (default: 730)')
+    parser.add_argument('--orders-per-day', type=int, default=20, help='Average orders per day (default: 20)')
+    parser.add_argument('--max-lines', type=int, default=40, help='Most lines in one order (default: 40)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed; the same seed gives the same data (default: 1)')
+    parser.add_argument('--end-date', help='Last day of trade, YYYY-MM-DD (default: yesterday)')
+
+
+def dataset_options(options):
+    """seed_dataset() keyword arguments from the parsed command options"""
+    for name in ('clients', 'items', 'days', 'orders_per_day', 'max_lines'):
+        if options[name] < 1:
+            raise CommandError(f"--{name.replace('_', '-')} must be at least 1")
+    end = None
+    if options['end_date']:
+        try:
+            end = datetime.strptime(options['end_date'], '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError("Invalid end-date format. Use YYYY-MM-DD")
+    return {
+        'clients': options['clients'],
+        'items': options['items'],
+        'days': options['days'],
+        'orders_per_day': options['orders_per_day'],
+        'max_lines': options['max_lines'],
+        'seed': options['seed'],
+        'end': end,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with a synthetic poultry-shop history: customers, "
+        "products with a rate change every morning and days of orders with "
+        "receipts, ledger entries and the daily rollup. Data is added to "
+        "what is already there, so point POS_SQLITE_PATH (or POS_DB_NAME) "
+        "at a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser)
+
+    def handle(self, *args, **options):
+        dataset = dataset_options(options)
+
+        def progress(day, orders):
+            if day.day == 1:
+                self.stdout.write(f"{day:%b %Y}: {orders} orders so far")
+
+        summary = seed_dataset(progress=progress if options['verbosity'] > 1 else None, **dataset)
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {summary['orders']} orders ({summary['lines']} lines) for {summary['clients']} customers "
+            f"and {summary['items']} products, {summary['start']} to {summary['end']}"
+        ))
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum, Count
+
+
+def populate_daily_summaries(apps, schema_editor):
+    """Build the rollup for orders that already exist"""
+    Order = apps.get_model('sales', 'Order')
+    OrderItem = apps.get_model('sales', 'OrderItem')
+    DailySalesSummary = apps.get_model('sales', 'DailySalesSummary')
+
+    summaries = {}
+    for row in Order.objects.order_by().values('date', 'client_id', 'payment_method').annotate(
+        total_sales=Sum('total'),
+        total_paid=Sum('payment_amount'),
+        total_due=Sum('balance_due'),
+        order_count=Count('id')
+    ):
+        summaries[(row['date'], row['client_id'], row['payment_method'])] = DailySalesSummary(
+            date=row['date'],
+            client_id=row['client_id'],
+            payment_method=row['payment_method'],
+            total_sales=row['total_sales'] or 0,
+            total_paid=row['total_paid'] or 0,
+            total_due=row['total_due'] or 0,
+            order_count=row['order_count'],
+        )
+
+    for row in OrderItem.objects.order_by().values(
+        'order__date', 'order__client_id', 'order__payment_method'
+    ).annotate(quantity=Sum('quantity')):
+        key = (row['order__date'], row['order__client_id'], row['order__payment_method'])
+        if key in summaries:
+            summaries[key].item_quantity = row['quantity'] or 0
+
+    DailySalesSummary.objects.bulk_create(summaries.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0006_alter_order_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('payment_method', models.CharField(default='cash', max_length=20)),
+                ('total_sales', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_due', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('order_count', models.IntegerField(default=0)),
+                ('item_quantity', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('client', models.ForeignKey(db_column='client_id', on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='sales.client')),
+            ],
+            options={
+                'db_table': 'daily_sales_summary',
+                'constraints': [models.UniqueConstraint(fields=('date', 'client', 'payment_method'), name='daily_sales_summary_unique_key')],
+            },
+        ),
+        migrations.RunPython(populate_daily_summaries, migrations.RunPython.noop),
+    ]
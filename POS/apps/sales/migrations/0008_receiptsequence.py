@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0007_dailysalessummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptSequence',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('last_value', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'receipt_sequences',
+            },
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:30
+
+from datetime import datetime, time
+from decimal import Decimal
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def open_client_ledgers(apps, schema_editor):
+    """
+    Start every existing client's ledger from its order history: an opening
+    entry for the balance the orders do not explain (e.g. a starting
+    balance), dated at the start of the first day with any order, then one
+    entry per order at the start of its day. Balances and statements for
+    dates before the ledger was introduced then follow the orders instead
+    of being zero. Balance edits made before the ledger are folded into the
+    opening entry.
+    """
+    Client = apps.get_model('sales', 'Client')
+    Order = apps.get_model('sales', 'Order')
+    LedgerEntry = apps.get_model('sales', 'LedgerEntry')
+
+    def start_of_day(day):
+        return django.utils.timezone.make_aware(datetime.combine(day, time.min))
+
+    first_day = Order.objects.order_by('date').values_list('date', flat=True).first()
+    opened_at = start_of_day(first_day) if first_day else django.utils.timezone.now()
+
+    entries = []
+    for client in Client.objects.only('id', 'balance').iterator():
+        orders = list(Order.objects.filter(client_id=client.id).order_by('date', 'id').only(
+            'id', 'date', 'total', 'payment_amount'
+        ))
+        running = client.balance - sum((order.total - order.payment_amount for order in orders), Decimal('0'))
+        entries.append(LedgerEntry(
+            client_id=client.id,
+            entry_type='opening',
+            timestamp=opened_at,
+            debit=max(running, 0),
+            credit=max(-running, 0),
+            balance=running,
+            description='Balance carried over when the ledger was introduced',
+        ))
+        for order in orders:
+            running += order.total - order.payment_amount
+            entries.append(LedgerEntry(
+                client_id=client.id,
+                order_id=order.id,
+                entry_type='order',
+                timestamp=start_of_day(order.date),
+                debit=order.total,
+                credit=order.payment_amount,
+                balance=running,
+                description=f"Order {order.id}",
+            ))
+        if len(entries) >= 500:
+            LedgerEntry.objects.bulk_create(entries)
+            entries = []
+    LedgerEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0008_receiptsequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('entry_type', models.CharField(choices=[('opening', 'Opening Balance'), ('order', 'Order'), ('payment', 'Payment'), ('adjustment', 'Adjustment'), ('checkpoint', 'Checkpoint')], max_length=20)),
+                ('debit', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('credit', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('description', models.TextField(blank=True, default='')),
+                ('client', models.ForeignKey(db_column='client_id', on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='sales.client')),
+                ('order', models.ForeignKey(blank=True, db_column='order_id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='sales.order')),
+            ],
+            options={
+                'db_table': 'ledger_entries',
+                'ordering': ['timestamp', 'id'],
+                'indexes': [models.Index(fields=['client', 'timestamp', 'id'], name='ledger_client_timestamp_idx')],
+            },
+        ),
+        migrations.RunPython(open_client_ledgers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0001_initial'),
+        ('sales', '0009_ledgerentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['date', 'id'], name='order_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['client', 'date'], name='order_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['payment_status', 'date'], name='order_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['order', 'item'], name='order_items_order_item_idx'),
+        ),
+    ]
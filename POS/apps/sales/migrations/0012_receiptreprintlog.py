@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:46
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0011_client_sync_version_client_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptReprintLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reprint_number', models.IntegerField()),
+                ('reprinted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('receipt', models.ForeignKey(db_column='receipt_id', on_delete=django.db.models.deletion.CASCADE, related_name='reprint_logs', to='sales.receipt')),
+                ('reprinted_by', models.ForeignKey(blank=True, db_column='user_id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='receipt_reprints', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'receipt_reprint_logs',
+                'ordering': ['reprinted_at', 'id'],
+                'indexes': [models.Index(fields=['receipt', 'reprinted_at'], name='reprint_log_receipt_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0012_receiptreprintlog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceiptOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('receipt_number', models.CharField(max_length=50, unique=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('order', models.OneToOneField(db_column='order_id', on_delete=django.db.models.deletion.CASCADE, related_name='receipt_outbox', to='sales.order')),
+            ],
+            options={
+                'db_table': 'receipt_outbox',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['available_at', 'id'], name='receipt_outbox_available_idx')],
+            },
+        ),
+    ]
@@ -1,9 +1,12 @@
+from django.conf import settings
 from django.db import models
 from datetime import date
 from django.utils import timezone  # Added import
 
+from apps.sync.models import SyncedModel
 
-class Client(models.Model):
+
+class Client(SyncedModel):
     """Client model to store customer information"""
     id = models.AutoField(primary_key=True)
     name = models.TextField()
@@ -58,6 +61,14 @@ class Order(models.Model):
 
     class Meta:
         db_table = 'order'
+        indexes = [
+            # Date range reports and keyset pagination on (date, id)
+            models.Index(fields=['date', 'id'], name='order_date_id_idx'),
+            # Customer filter combined with a date range
+            models.Index(fields=['client', 'date'], name='order_client_date_idx'),
+            # Payment status filter, newest first
+            models.Index(fields=['payment_status', 'date'], name='order_status_date_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.id} - {self.client.name}"
@@ -85,6 +96,10 @@ class OrderItem(models.Model):
         db_table = 'order_items'
         # Composite unique constraint if needed
         # unique_together = [['order', 'item']]
+        indexes = [
+            # Lines are always read by order and joined to their item
+            models.Index(fields=['order', 'item'], name='order_items_order_item_idx'),
+        ]
 
     def __str__(self):
         return f"{self.item.name} - Order {self.order.id}"
@@ -92,6 +107,83 @@ class OrderItem(models.Model):
     
     
 
+class LedgerEntry(models.Model):
+    """Append-only record of every change to a client's balance"""
+    OPENING = 'opening'
+    ORDER = 'order'
+    PAYMENT = 'payment'
+    ADJUSTMENT = 'adjustment'
+    CHECKPOINT = 'checkpoint'
+
+    ENTRY_TYPE_CHOICES = [
+        (OPENING, 'Opening Balance'),
+        (ORDER, 'Order'),
+        (PAYMENT, 'Payment'),
+        (ADJUSTMENT, 'Adjustment'),
+        (CHECKPOINT, 'Checkpoint'),
+    ]
+
+    client = models.ForeignKey(
+        Client,
+        on_delete=models.CASCADE,
+        db_column='client_id',
+        related_name='ledger_entries'
+    )
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        db_column='order_id',
+        related_name='ledger_entries',
+        blank=True,
+        null=True
+    )
+    timestamp = models.DateTimeField(default=timezone.now)
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPE_CHOICES)
+    debit = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    credit = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=12, decimal_places=2)  # Running balance after this entry
+    description = models.TextField(blank=True, default='')
+
+    class Meta:
+        db_table = 'ledger_entries'
+        indexes = [
+            models.Index(fields=['client', 'timestamp', 'id'], name='ledger_client_timestamp_idx'),
+        ]
+        ordering = ['timestamp', 'id']
+
+    def __str__(self):
+        return f"{self.client_id} {self.entry_type} {self.debit}/{self.credit} -> {self.balance}"
+
+
+class DailySalesSummary(models.Model):
+    """Pre-aggregated sales per day, client and payment method"""
+    date = models.DateField()
+    client = models.ForeignKey(
+        Client,
+        on_delete=models.CASCADE,
+        db_column='client_id',
+        related_name='daily_summaries'
+    )
+    payment_method = models.CharField(max_length=20, default='cash')
+    total_sales = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_due = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
+    item_quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'daily_sales_summary'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'client', 'payment_method'],
+                name='daily_sales_summary_unique_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.client_id} - {self.payment_method}"
+
+
 class Receipt(models.Model):
     """Receipt model to store immutable receipt data"""
     
@@ -174,13 +266,78 @@ class Receipt(models.Model):
     def save(self, *args, **kwargs):
         # Ensure receipt_number is set if not provided
         if not self.receipt_number:
-            from datetime import datetime
-            # Generate receipt number if not provided
-            count = Receipt.objects.count() + 1
-            self.receipt_number = f"RCPT-{datetime.now().strftime('%Y%m%d')}-{count:06d}"
+            from .sequences import next_receipt_number
+            self.receipt_number = next_receipt_number()
         super().save(*args, **kwargs)
 
 
+class ReceiptReprintLog(models.Model):
+    """Audit trail of receipt reprints (written when RECEIPT_REPRINT_LOG is on)"""
+    receipt = models.ForeignKey(
+        Receipt,
+        on_delete=models.CASCADE,
+        related_name='reprint_logs',
+        db_column='receipt_id'
+    )
+    reprint_number = models.IntegerField()
+    reprinted_at = models.DateTimeField(default=timezone.now)
+    reprinted_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name='receipt_reprints',
+        db_column='user_id',
+        blank=True,
+        null=True
+    )
+
+    class Meta:
+        db_table = 'receipt_reprint_logs'
+        indexes = [
+            models.Index(fields=['receipt', 'reprinted_at'], name='reprint_log_receipt_idx'),
+        ]
+        ordering = ['reprinted_at', 'id']
+
+    def __str__(self):
+        return f"{self.receipt_id} reprint {self.reprint_number}"
+
+
+class ReceiptSequence(models.Model):
+    """Last receipt number issued per day"""
+    day = models.DateField(primary_key=True)
+    last_value = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'receipt_sequences'
+
+    def __str__(self):
+        return f"{self.day} - {self.last_value}"
+
+
+class ReceiptOutbox(models.Model):
+    """Orders whose receipt is still to be written (see outbox.py)"""
+    order = models.OneToOneField(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='receipt_outbox',
+        db_column='order_id'
+    )
+    receipt_number = models.CharField(max_length=50, unique=True)  # Reserved at checkout
+    created_at = models.DateTimeField(default=timezone.now)
+    available_at = models.DateTimeField(default=timezone.now)  # Next attempt, pushed back after a failure
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        db_table = 'receipt_outbox'
+        indexes = [
+            models.Index(fields=['available_at', 'id'], name='receipt_outbox_available_idx'),
+        ]
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.receipt_number} for order {self.order_id}"
+
+
 class ReceiptItem(models.Model):
     """Receipt line items (immutable copy of order items)"""
     receipt = models.ForeignKey(
@@ -206,4 +363,63 @@ class ReceiptItem(models.Model):
         # Auto-calculate total if not provided
         if not self.total and self.quantity and self.price_per_unit:
             self.total = self.quantity * self.price_per_unit
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+class ReportExportJob(models.Model):
+    """A date-range report export, written to MEDIA_ROOT by a background worker"""
+    CSV = 'csv'
+    XLSX = 'xlsx'
+    FORMAT_CHOICES = [
+        (CSV, 'CSV'),
+        (XLSX, 'Excel (XLSX)'),
+    ]
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name='report_exports',
+        db_column='user_id',
+        blank=True,
+        null=True
+    )
+    start_date = models.DateField()
+    end_date = models.DateField()
+    customer = models.ForeignKey(
+        Client,
+        on_delete=models.SET_NULL,
+        related_name='report_exports',
+        db_column='client_id',
+        blank=True,
+        null=True
+    )
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default=CSV)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    rows_total = models.IntegerField(default=0)
+    rows_written = models.IntegerField(default=0)
+    file = models.FileField(upload_to='exports/', blank=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'report_export_jobs'
+        indexes = [
+            models.Index(fields=['status', 'id'], name='report_export_status_idx'),
+        ]
+        ordering = ['-created_at', '-id']
+
+    def __str__(self):
+        return f"{self.file_format} export {self.start_date} to {self.end_date} ({self.status})"
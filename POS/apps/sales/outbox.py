@@ -0,0 +1,254 @@
+import logging
+import threading
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .models import LedgerEntry, Order, Receipt, ReceiptItem, ReceiptOutbox
+from .sequences import next_receipt_number, next_receipt_numbers
+
+logger = logging.getLogger(__name__)
+
+INLINE = 'inline'
+ASYNC = 'async'
+
+
+def receipt_mode():
+    """
+    'async' (the default) writes the receipt through the outbox after
+    checkout commits; 'inline' writes it inside checkout
+    """
+    return getattr(settings, 'RECEIPT_MODE', ASYNC)
+
+
+def max_attempts():
+    return getattr(settings, 'RECEIPT_OUTBOX_MAX_ATTEMPTS', 8)
+
+
+def retry_delay(attempts):
+    """Seconds before the next try: 2, 4, 8, ... capped at five minutes"""
+    return min(2 ** attempts, 300)
+
+
+def build_receipt(order, customer, receipt_number, updated_balance, lines):
+    """
+    Write the immutable receipt snapshot of an order. `updated_balance` is
+    the customer's balance right after the order; `lines` are
+    (product_id, product_name, quantity, price) tuples.
+    """
+    return build_receipts([(order, customer, receipt_number, updated_balance, lines)])[0]
+
+
+def build_receipts(batch):
+    """
+    build_receipt() for a batch of (order, customer, receipt_number,
+    updated_balance, lines) tuples, with one INSERT for the receipts and
+    one for all their lines.
+    """
+    receipts = Receipt.objects.bulk_create([
+        Receipt(
+            order=order,
+            customer=customer,
+            customer_name=customer.name,
+            previous_balance=updated_balance - (order.total - order.payment_amount),
+            current_bill_amount=order.total,
+            payment_made=order.payment_amount,
+            this_bill_balance=max(Decimal('0'), order.total - order.payment_amount),
+            updated_balance=updated_balance,
+            payment_method=order.payment_method,
+            payment_status=order.payment_status,
+            receipt_number=receipt_number,
+        )
+        for order, customer, receipt_number, updated_balance, _ in batch
+    ])
+    ReceiptItem.objects.bulk_create([
+        ReceiptItem(
+            receipt=receipt,
+            product_name=name,
+            quantity=quantity,
+            unit='kg',
+            price_per_unit=price,
+            total=quantity * price,
+            product_id=product_id
+        )
+        for receipt, (*_, lines) in zip(receipts, batch)
+        for product_id, name, quantity, price in lines
+    ])
+    return receipts
+
+
+def issue_receipt(order, customer, updated_balance, lines):
+    """
+    Called by checkout inside its transaction. The receipt number is
+    reserved either way, so numbers follow checkout order. In inline mode
+    the receipt is written right away; in async mode an outbox row is
+    added instead and the worker writes the receipt once the checkout has
+    committed. Returns the reserved receipt number.
+    """
+    return issue_receipts([(order, customer, updated_balance, lines)])[0]
+
+
+def issue_receipts(batch):
+    """
+    issue_receipt() for a batch of (order, customer, updated_balance,
+    lines) tuples, e.g. from bulk order entry. Returns the reserved
+    receipt numbers in batch order.
+    """
+    receipt_numbers = next_receipt_numbers(len(batch))
+    if receipt_mode() != ASYNC:
+        build_receipts([
+            (order, customer, receipt_number, updated_balance, lines)
+            for (order, customer, updated_balance, lines), receipt_number in zip(batch, receipt_numbers)
+        ])
+        return receipt_numbers
+
+    ReceiptOutbox.objects.bulk_create([
+        ReceiptOutbox(order=order, receipt_number=receipt_number)
+        for (order, *_), receipt_number in zip(batch, receipt_numbers)
+    ])
+    transaction.on_commit(wake_worker)
+    return receipt_numbers
+
+
+def materialize(order, receipt_number):
+    """
+    Write an order's receipt from what checkout committed: its lines, and
+    the balance from the order's ledger entry (the customer's current
+    balance for orders from before the ledger).
+    """
+    updated_balance = LedgerEntry.objects.filter(
+        order=order, entry_type=LedgerEntry.ORDER
+    ).order_by('id').values_list('balance', flat=True).first()
+    if updated_balance is None:
+        updated_balance = order.client.balance
+
+    lines = [
+        (line.item_id, line.item.name, line.quantity, line.price)
+        for line in order.items.select_related('item').order_by('id')
+    ]
+    return build_receipt(order, order.client, receipt_number, updated_balance, lines)
+
+
+def ensure_receipt(order_id):
+    """
+    The receipt of an order, written now if it does not exist yet (using
+    the number reserved in its outbox row, if any). Returns None for an
+    unknown order. Safe to call while the worker runs: the outbox row is
+    locked, waiting for a worker that holds it, so the reserved number is
+    always the one used.
+    """
+    with transaction.atomic():
+        entry = ReceiptOutbox.objects.select_for_update().filter(order_id=order_id).first()
+        receipt = Receipt.objects.filter(order_id=order_id).first()
+        if receipt is None:
+            order = Order.objects.select_related('client').filter(pk=order_id).first()
+            if order is None:
+                return None
+            try:
+                with transaction.atomic():
+                    receipt = materialize(order, entry.receipt_number if entry else next_receipt_number())
+            except IntegrityError:
+                # Written by another worker since we looked; any other
+                # conflict (e.g. the receipt number is already taken) is
+                # raised so the outbox row records it
+                receipt = Receipt.objects.filter(order_id=order_id).first()
+                if receipt is None:
+                    raise
+        if entry is not None:
+            entry.delete()
+    return receipt
+
+
+def pending_receipt(order_id):
+    """
+    What is known of a receipt still queued in the outbox, or None. The
+    worker is woken to write it; nothing is written here.
+    """
+    entry = ReceiptOutbox.objects.filter(order_id=order_id).values('receipt_number', 'attempts').first()
+    if entry is None:
+        return None
+    wake_worker()
+    return {
+        'order_id': int(order_id),
+        'receipt_number': entry['receipt_number'],
+        'status': 'pending',
+        'attempts': entry['attempts'],
+    }
+
+
+def record_failure(order_id, error):
+    entry = ReceiptOutbox.objects.filter(order_id=order_id).first()
+    if entry is None:
+        return
+    entry.attempts += 1
+    entry.last_error = f"{type(error).__name__}: {error}"[:2000]
+    entry.available_at = timezone.now() + timedelta(seconds=retry_delay(entry.attempts))
+    entry.save(update_fields=['attempts', 'last_error', 'available_at'])
+
+
+def drain_outbox(limit=100):
+    """
+    Write the receipts of up to `limit` outbox rows that are due, each in
+    its own transaction. A failure is recorded on the row and retried
+    later with a growing delay, up to RECEIPT_OUTBOX_MAX_ATTEMPTS; rows
+    past that are left for reconcile_receipts. Returns (written, failed).
+    """
+    due = list(
+        ReceiptOutbox.objects.filter(
+            available_at__lte=timezone.now(),
+            attempts__lt=max_attempts()
+        ).order_by('id').values_list('order_id', flat=True)[:limit]
+    )
+
+    written = failed = 0
+    for order_id in due:
+        try:
+            ensure_receipt(order_id)
+            written += 1
+        except Exception as e:
+            logger.exception("Writing the receipt of order %s failed", order_id)
+            record_failure(order_id, e)
+            failed += 1
+    return written, failed
+
+
+class ReceiptWorker(threading.Thread):
+    """
+    Background thread that drains the outbox. It is started by the first
+    checkout of the process, woken after every committed checkout and
+    also polls every RECEIPT_OUTBOX_POLL_SECONDS for retries.
+    """
+
+    def __init__(self):
+        super().__init__(name='receipt-outbox', daemon=True)
+        self.wake = threading.Event()
+
+    def run(self):
+        poll = getattr(settings, 'RECEIPT_OUTBOX_POLL_SECONDS', 5)
+        while True:
+            self.wake.wait(poll)
+            self.wake.clear()
+            close_old_connections()
+            try:
+                while drain_outbox()[0]:
+                    pass
+            except Exception:
+                logger.exception("Receipt outbox worker failed")
+            finally:
+                connection.close()
+
+
+_worker_lock = threading.Lock()
+_worker = None
+
+
+def wake_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = ReceiptWorker()
+            _worker.start()
+    _worker.wake.set()
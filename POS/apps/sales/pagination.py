@@ -0,0 +1,130 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a unique, composite ordering such as (date, id).
+
+    The cursor holds the ordering values of the last row of the page and the
+    next page is read with a WHERE on those values instead of an OFFSET, so
+    a deep page costs the same as the first one when an index covers the
+    ordering. Views set `keyset_ordering`, e.g. ('-date', '-id'); the last
+    field must be unique.
+
+    Pagination is opt-in: lists are returned whole (as before) unless the
+    request passes `page_size` or `cursor`.
+    """
+    ordering = ('-pk',)
+    page_size = api_settings.PAGE_SIZE or 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.ordering = tuple(getattr(view, 'keyset_ordering', self.ordering))
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        encoded = params.get(self.cursor_query_param)
+        if encoded:
+            queryset = queryset.filter(self.after(queryset.model, self.decode_cursor(encoded)))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def after(self, model, values):
+        """
+        Rows strictly after `values` in the ordering, e.g. for ('-date', '-id'):
+        date < d OR (date = d AND id < i)
+        """
+        if len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        condition = Q()
+        equal = Q()
+        for field, raw in zip(self.ordering, values):
+            name = field.lstrip('-')
+            model_field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+            try:
+                value = model_field.to_python(raw)
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def encode_cursor(self, row):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            # Rows are model instances, or dicts from a values() queryset
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, encoded):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        # encode_cursor only ever writes a list of strings
+        if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+            'page_size': self.page_size,
+            'results': data
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'page_size': {'type': 'integer'},
+                'results': schema,
+            },
+        }
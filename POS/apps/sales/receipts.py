@@ -0,0 +1,234 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.html import escape
+
+from .models import Receipt, ReceiptReprintLog
+
+RECEIPT_CACHE_PREFIX = 'sales:receipt'
+
+# ESC/POS control sequences
+ESC_INIT = b'\x1b@'
+ESC_ALIGN_LEFT = b'\x1ba\x00'
+ESC_ALIGN_CENTER = b'\x1ba\x01'
+ESC_BOLD_ON = b'\x1bE\x01'
+ESC_BOLD_OFF = b'\x1bE\x00'
+GS_SIZE_DOUBLE = b'\x1d!\x11'
+GS_SIZE_NORMAL = b'\x1d!\x00'
+GS_CUT = b'\x1dV\x41\x03'  # feed 3 lines, then partial cut
+
+
+def money(value):
+    return f"Rs {Decimal(value):.2f}"
+
+
+def quantity(value):
+    return f"{Decimal(value).normalize():f}"
+
+
+def receipt_lines(receipt):
+    """Summary lines in the order the printed receipt shows them"""
+    lines = [('CURRENT BILL:', money(receipt.current_bill_amount))]
+    if receipt.previous_balance:
+        lines.append(('PREVIOUS BALANCE:', money(receipt.previous_balance)))
+    if receipt.payment_made:
+        lines.append(('PAID TODAY:', money(receipt.payment_made)))
+        if receipt.this_bill_balance > 0:
+            lines.append(('THIS BILL BALANCE:', money(receipt.this_bill_balance)))
+    return lines
+
+
+def render_escpos(receipt, items):
+    """Thermal printer bytes for an 80mm printer"""
+    width = getattr(settings, 'RECEIPT_PRINTER_COLUMNS', 48)
+    out = bytearray()
+
+    def write(text=''):
+        out.extend(text.encode('ascii', errors='replace') + b'\n')
+
+    def columns(left, right):
+        write(f"{left[:width - len(right) - 1]:<{width - len(right)}}{right}")
+
+    out.extend(ESC_INIT + ESC_ALIGN_CENTER + ESC_BOLD_ON + GS_SIZE_DOUBLE)
+    write(receipt.store_name)
+    out.extend(GS_SIZE_NORMAL + ESC_BOLD_OFF)
+    if receipt.store_address:
+        write(receipt.store_address)
+    write(receipt.store_phone)
+    write('-' * width)
+    out.extend(ESC_BOLD_ON)
+    write(receipt.customer_name)
+    out.extend(ESC_BOLD_OFF)
+    write(f"Invoice #: {receipt.receipt_number}")
+    write(timezone.localtime(receipt.receipt_date).strftime('%d %b %Y %I:%M %p'))
+    write('-' * width)
+
+    out.extend(ESC_ALIGN_LEFT)
+    name_width = width - 30
+    write(f"{'Item':<{name_width}}{'Kg':>8}{'Rate':>10}{'Total':>12}")
+    for item in items:
+        write(
+            f"{item.product_name[:name_width - 1]:<{name_width}}{quantity(item.quantity):>8}"
+            f"{item.price_per_unit:>10.2f}{item.total:>12.2f}"
+        )
+    write('-' * width)
+
+    for label, value in receipt_lines(receipt):
+        columns(label, value)
+    out.extend(ESC_BOLD_ON)
+    columns('TOTAL BALANCE:', money(abs(receipt.updated_balance)))
+    out.extend(ESC_BOLD_OFF + ESC_ALIGN_CENTER)
+    write()
+    write('Thank You For Your Business!')
+    return bytes(out)
+
+
+def escpos_trailer(reprint_count=0):
+    """Reprint marker and paper cut, appended to the cached body when printing"""
+    marker = f"REPRINT {reprint_count}\n".encode() if reprint_count else b''
+    return ESC_ALIGN_CENTER + marker + GS_CUT
+
+
+def render_html(receipt, items):
+    """Compact, self-contained HTML sized for an 88mm roll"""
+    rows = ''.join(
+        f"<tr><td>{escape(item.product_name)}</td><td class=c>{quantity(item.quantity)}</td>"
+        f"<td class=r>{item.price_per_unit:.2f}</td><td class=r>{item.total:.2f}</td></tr>"
+        for item in items
+    )
+    totals = ''.join(
+        f"<div class=row><span>{label}</span><span>{value}</span></div>"
+        for label, value in receipt_lines(receipt)
+    )
+    address = f"<div>{escape(receipt.store_address)}</div>" if receipt.store_address else ''
+    return (
+        "<!DOCTYPE html><html><head><meta charset=utf-8>"
+        f"<title>{escape(receipt.receipt_number)}</title><style>"
+        "@page{size:88mm auto;margin:0}"
+        "body{font:12px Arial,Helvetica,sans-serif;width:80mm;margin:0 auto}"
+        "h1{font-size:18px;margin:4px 0}.center{text-align:center}hr{border:0;border-top:2px solid #000}"
+        "table{width:100%;border-collapse:collapse}th{border-bottom:2px solid #000;text-align:left}"
+        ".c{text-align:center}.r{text-align:right}.row{display:flex;justify-content:space-between}"
+        ".total{font-weight:bold;border-top:2px solid #000;margin-top:4px;padding-top:4px}"
+        "</style></head><body>"
+        f"<div class=center><h1>{escape(receipt.store_name)}</h1>{address}"
+        f"<div>{escape(receipt.store_phone)}</div></div><hr>"
+        f"<div class=center><b>{escape(receipt.customer_name)}</b>"
+        f"<div>Invoice #: {escape(receipt.receipt_number)}</div>"
+        f"<div>{timezone.localtime(receipt.receipt_date).strftime('%d %b %Y %I:%M %p')}</div></div><hr>"
+        "<table><thead><tr><th>Item</th><th class=c>Kg</th><th class=r>Rate</th><th class=r>Total</th></tr></thead>"
+        f"<tbody>{rows}</tbody></table>{totals}"
+        f"<div class='row total'><span>TOTAL BALANCE:</span><span>{money(abs(receipt.updated_balance))}</span></div>"
+        "<p class=center>Thank You For Your Business!</p></body></html>"
+    ).encode('utf-8')
+
+
+RECEIPT_FORMATS = {
+    'html': ('text/html; charset=utf-8', render_html),
+    'escpos': ('application/octet-stream', render_escpos),
+}
+
+
+RECEIPT_CACHE_ALIAS = 'receipts'
+
+
+def receipt_cache_key(receipt_id, output):
+    return f"{RECEIPT_CACHE_PREFIX}:{output}:{receipt_id}"
+
+
+def receipt_cache():
+    """
+    The bounded 'receipts' cache, so rendered receipts are culled among
+    themselves and never push out the catalog or balance entries; the
+    default cache when that alias is not configured.
+    """
+    if RECEIPT_CACHE_ALIAS in settings.CACHES:
+        return caches[RECEIPT_CACHE_ALIAS]
+    return cache
+
+
+def rendered_receipt(receipt_id, output):
+    """
+    Rendered receipt bytes in `output` format ('html' or 'escpos'). Receipts
+    are immutable snapshots, so the artifact is rendered once and then
+    served from receipt_cache() with no queries.
+    Raises Receipt.DoesNotExist for an unknown id.
+    """
+    key = receipt_cache_key(receipt_id, output)
+    content = receipt_cache().get(key)
+    if content is None:
+        receipt = Receipt.objects.get(pk=receipt_id)
+        content = RECEIPT_FORMATS[output][1](receipt, list(receipt.items.order_by('id')))
+        receipt_cache().set(key, content)
+    return content
+
+
+def invalidate_rendered_receipt(receipt_id):
+    """Drop cached artifacts, e.g. after a receipt is corrected in the admin"""
+    receipt_cache().delete_many([receipt_cache_key(receipt_id, output) for output in RECEIPT_FORMATS])
+
+
+def update_returning_supported():
+    """UPDATE ... RETURNING: any PostgreSQL, SQLite from 3.35"""
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 35)
+
+
+def bump_reprint_count(receipt_id, reprinted_at):
+    """
+    Add one to a receipt's reprint count and return the new count (None for
+    an unknown receipt). Where UPDATE ... RETURNING is supported this is a
+    single statement, so the increment happens in the database and
+    concurrent reprints cannot lose one. Elsewhere it falls back to an F()
+    update followed by a read.
+    """
+    if update_returning_supported():
+        table = connection.ops.quote_name(Receipt._meta.db_table)
+        count_column = connection.ops.quote_name('reprint_count')
+        stamp_column = connection.ops.quote_name('last_reprinted_at')
+        stamp = Receipt._meta.get_field('last_reprinted_at').get_db_prep_value(reprinted_at, connection)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET {count_column} = {count_column} + 1, {stamp_column} = %s "
+                f"WHERE {connection.ops.quote_name('id')} = %s RETURNING {count_column}",
+                [stamp, receipt_id]
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    updated = Receipt.objects.filter(pk=receipt_id).update(
+        reprint_count=F('reprint_count') + 1,
+        last_reprinted_at=reprinted_at
+    )
+    if not updated:
+        return None
+    return Receipt.objects.filter(pk=receipt_id).values_list('reprint_count', flat=True).get()
+
+
+def record_reprint(receipt_id, user=None):
+    """
+    Count a reprint and, when RECEIPT_REPRINT_LOG is on, append an audit
+    row in the same transaction. Returns (reprint_count, reprinted_at), or
+    None for an unknown receipt.
+    """
+    reprinted_at = timezone.now()
+    if not getattr(settings, 'RECEIPT_REPRINT_LOG', False):
+        reprint_count = bump_reprint_count(receipt_id, reprinted_at)
+        return None if reprint_count is None else (reprint_count, reprinted_at)
+
+    with transaction.atomic():
+        reprint_count = bump_reprint_count(receipt_id, reprinted_at)
+        if reprint_count is None:
+            return None
+        ReceiptReprintLog.objects.create(
+            receipt_id=receipt_id,
+            reprint_number=reprint_count,
+            reprinted_at=reprinted_at,
+            reprinted_by=user if user is not None and user.is_authenticated else None
+        )
+    return reprint_count, reprinted_at
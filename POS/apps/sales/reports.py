@@ -0,0 +1,266 @@
+from datetime import date
+
+from django.db.models import Sum, Count, F
+from django.db.models.functions import TruncMonth
+
+from POS.renderers import dumps
+from .listings import LINE_TOTAL, alines_for, lines_for
+from .models import OrderItem, DailySalesSummary
+
+
+REPORT_ORDER_FIELDS = ('id', 'date', 'total', 'payment_amount', 'payment_status', 'balance_due')
+
+
+# Line fields and database-side expressions of the report order rows
+REPORT_LINE_FIELDS = ('quantity', 'price')
+REPORT_LINE_EXPRESSIONS = {'name': F('item__name'), 'total': LINE_TOTAL}
+
+
+def serialize_order_rows(rows):
+    """
+    Build report rows from Order values() rows (REPORT_ORDER_FIELDS plus
+    customer_name). All their lines are read in one values() query with
+    the line total computed by the database, so no model instances or
+    serializer fields are involved.
+    """
+    rows = list(rows)
+    lines = lines_for(OrderItem, rows, 'order_id', REPORT_LINE_FIELDS, **REPORT_LINE_EXPRESSIONS)
+    return order_report_rows(rows, lines)
+
+
+def order_report_rows(rows, lines):
+    """Report rows from order values() rows and their lines grouped by order id"""
+    results = []
+    for row in rows:
+        items = [
+            {
+                'name': line['name'] or 'Unknown',
+                'quantity': line['quantity'],
+                'price': line['price'],
+                'total': line['total']
+            }
+            for line in lines[row['id']]
+        ]
+        results.append({
+            'id': row['id'],
+            'customer_name': row['customer_name'],
+            'order_date': row['date'].strftime('%Y-%m-%d'),
+            'amount': row['total'],
+            'payment_amount': row['payment_amount'],
+            'payment_status': row['payment_status'],
+            'balance_due': row['balance_due'],
+            'items_count': len(items),
+            'items': items
+        })
+    return results
+
+
+def report_order_values(orders):
+    """The values() rows serialize_order_rows expects, in report order"""
+    return orders.order_by('date', 'id').values(*REPORT_ORDER_FIELDS, customer_name=F('client__name'))
+
+
+def serialize_orders(orders):
+    """Serialize an Order queryset for a report (two queries in total)"""
+    return serialize_order_rows(report_order_values(orders))
+
+
+async def aserialize_orders(orders):
+    """serialize_orders() through the async ORM"""
+    rows = [row async for row in report_order_values(orders)]
+    lines = await alines_for(OrderItem, rows, 'order_id', REPORT_LINE_FIELDS, **REPORT_LINE_EXPRESSIONS)
+    return order_report_rows(rows, lines)
+
+
+def order_totals_aggregates():
+    return {
+        'total_sales': Sum('total'),
+        'total_paid': Sum('payment_amount'),
+        'total_due': Sum('balance_due'),
+        'order_count': Count('id'),
+    }
+
+
+def order_totals(orders):
+    """Overall sales/paid/due totals and order count in a single aggregate"""
+    totals = orders.aggregate(**order_totals_aggregates())
+    return {key: value or 0 for key, value in totals.items()}
+
+
+async def aorder_totals(orders):
+    totals = await orders.aaggregate(**order_totals_aggregates())
+    return {key: value or 0 for key, value in totals.items()}
+
+
+def daily_totals(orders):
+    """
+    Per-day sales and order counts computed by the database.
+    Order.date is already a DateField, so grouping on it directly gives
+    calendar days without the timezone conversion TruncDate would apply.
+    """
+    return orders.order_by().values('date').annotate(
+        total_sales=Sum('total'),
+        order_count=Count('id')
+    ).order_by('date')
+
+
+def build_daily_breakdown(orders, order_rows):
+    """
+    Combine the database-side daily totals with already serialized order
+    rows, so each order is serialized once and shared between the flat
+    order list and the per-day breakdown.
+    """
+    return daily_breakdown_rows(daily_totals(orders), order_rows)
+
+
+async def abuild_daily_breakdown(orders, order_rows):
+    return daily_breakdown_rows([day async for day in daily_totals(orders)], order_rows)
+
+
+def daily_breakdown_rows(days, order_rows):
+    """Daily breakdown from daily_totals() rows and serialized order rows"""
+    rows_by_date = {}
+    for row in order_rows:
+        rows_by_date.setdefault(row['order_date'], []).append(row)
+
+    daily_breakdown = []
+    for day in days:
+        date_str = day['date'].strftime('%Y-%m-%d')
+        daily_breakdown.append({
+            'date': date_str,
+            'total_sales': day['total_sales'] or 0,
+            'order_count': day['order_count'],
+            'orders': rows_by_date.get(date_str, [])
+        })
+    return daily_breakdown
+
+
+def monthly_totals(orders):
+    """Per-month sales, paid, due and order counts grouped by the database"""
+    return orders.order_by().annotate(month=TruncMonth('date')).values('month').annotate(
+        total_sales=Sum('total'),
+        total_paid=Sum('payment_amount'),
+        total_due=Sum('balance_due'),
+        order_count=Count('id')
+    ).order_by('-month')
+
+
+def month_bounds(month_start):
+    """Return the first day of the month and the first day of the next one"""
+    if month_start.month == 12:
+        return month_start, date(month_start.year + 1, 1, 1)
+    return month_start, date(month_start.year, month_start.month + 1, 1)
+
+
+def stream_monthly_report(months, orders, include_orders=False, page=1, page_size=50,
+                          customer_filter=None, customer_balance=None):
+    """
+    Yield the monthly report as JSON bytes, one month at a time.
+    `months` is a month aggregate queryset (from monthly_totals or
+    summary_monthly_totals) read through a server-side iterator, and order
+    detail, when requested, is limited to one page per month, so memory use
+    does not grow with the length of the history.
+    """
+    yield b'{"reports": ['
+
+    offset = (page - 1) * page_size
+    first = True
+    for month in months.iterator():
+        month_data = {
+            'month': month['month'].strftime('%Y-%m'),
+            'total_sales': month['total_sales'] or 0,
+            'total_paid': month['total_paid'] or 0,
+            'total_due': month['total_due'] or 0,
+            'order_count': month['order_count'],
+        }
+
+        if include_orders:
+            start, end = month_bounds(month['month'])
+            month_orders = orders.filter(date__gte=start, date__lt=end)
+            # Fetch one extra row to know whether another page exists
+            page_orders = list(report_order_values(month_orders)[offset:offset + page_size + 1])
+            month_data['orders'] = serialize_order_rows(page_orders[:page_size])
+            month_data['orders_page'] = {
+                'page': page,
+                'page_size': page_size,
+                'has_next': len(page_orders) > page_size,
+            }
+
+        yield (b'' if first else b',') + dumps(month_data)
+        first = False
+
+    yield b'], "customer_filter": %s, "customer_balance": %s}' % (
+        dumps(customer_filter),
+        dumps(customer_balance)
+    )
+
+
+def summary_queryset(start=None, end=None, customer_id=None):
+    """DailySalesSummary rows for the given filters"""
+    summaries = DailySalesSummary.objects.all()
+    if start:
+        summaries = summaries.filter(date__gte=start)
+    if end:
+        summaries = summaries.filter(date__lte=end)
+    if customer_id:
+        summaries = summaries.filter(client_id=customer_id)
+    return summaries
+
+
+def summary_totals_aggregates():
+    return {
+        'total_sales': Sum('total_sales'),
+        'total_paid': Sum('total_paid'),
+        'total_due': Sum('total_due'),
+        'order_count': Sum('order_count'),
+        'item_quantity': Sum('item_quantity'),
+    }
+
+
+def summary_totals(summaries):
+    """Same totals as order_totals, read from the daily rollup"""
+    totals = summaries.aggregate(**summary_totals_aggregates())
+    return {key: value or 0 for key, value in totals.items()}
+
+
+async def asummary_totals(summaries):
+    totals = await summaries.aaggregate(**summary_totals_aggregates())
+    return {key: value or 0 for key, value in totals.items()}
+
+
+def summary_days(summaries):
+    """Per-day totals from the rollup, as values() rows"""
+    return summaries.order_by().values('date').annotate(**summary_totals_aggregates()).order_by('date')
+
+
+def summary_daily_breakdown(summaries):
+    """Per-day totals from the rollup, without order detail"""
+    return summary_breakdown_rows(summary_days(summaries))
+
+
+async def asummary_daily_breakdown(summaries):
+    return summary_breakdown_rows([day async for day in summary_days(summaries)])
+
+
+def summary_breakdown_rows(days):
+    daily_breakdown = []
+    for day in days:
+        daily_breakdown.append({
+            'date': day['date'].strftime('%Y-%m-%d'),
+            'total_sales': day['total_sales'] or 0,
+            'total_paid': day['total_paid'] or 0,
+            'total_due': day['total_due'] or 0,
+            'order_count': day['order_count'] or 0,
+            'item_quantity': day['item_quantity'] or 0
+        })
+    return daily_breakdown
+
+
+def summary_monthly_totals(summaries):
+    """Per-month aggregates from the rollup, shaped like monthly_totals"""
+    return summaries.order_by().annotate(month=TruncMonth('date')).values('month').annotate(
+        total_sales=Sum('total_sales'),
+        total_paid=Sum('total_paid'),
+        total_due=Sum('total_due'),
+        order_count=Sum('order_count')
+    ).order_by('-month')
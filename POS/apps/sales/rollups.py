@@ -0,0 +1,132 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Q, Sum, Count
+
+from .models import Order, OrderItem, DailySalesSummary
+
+SUMMARY_BATCH_SIZE = 500
+
+
+def record_order(order, item_quantity):
+    """
+    Add one order to its DailySalesSummary row.
+    Must run inside the transaction that creates the order.
+    """
+    record_orders([(order, item_quantity)])
+
+
+def record_orders(entries):
+    """
+    Add (order, item_quantity) pairs to the rollup with one increment per
+    date/client/method key. The counters are updated with F() expressions
+    so concurrent checkouts for the same key do not overwrite each other.
+    """
+    increments = {}
+    for order, item_quantity in entries:
+        key = (order.date, order.client_id, order.payment_method)
+        totals = increments.setdefault(key, {
+            'total_sales': Decimal('0'),
+            'total_paid': Decimal('0'),
+            'total_due': Decimal('0'),
+            'order_count': 0,
+            'item_quantity': Decimal('0'),
+        })
+        totals['total_sales'] += order.total
+        totals['total_paid'] += order.payment_amount
+        totals['total_due'] += order.balance_due
+        totals['order_count'] += 1
+        totals['item_quantity'] += item_quantity
+
+    for (order_date, client_id, payment_method), totals in increments.items():
+        summary, _ = DailySalesSummary.objects.get_or_create(
+            date=order_date,
+            client_id=client_id,
+            payment_method=payment_method
+        )
+        DailySalesSummary.objects.filter(pk=summary.pk).update(**{
+            field: F(field) + value for field, value in totals.items()
+        })
+
+
+def order_key(order):
+    """The (date, client_id, payment_method) rollup row an order is counted in"""
+    return (order.date, order.client_id, order.payment_method)
+
+
+def refresh_summaries(keys):
+    """
+    Recompute the rollup rows of the given order_key()s from the orders
+    they cover. Used after an order or its lines are edited or deleted,
+    where the change is not a simple increment; pass the keys from before
+    and after the edit so a moved order leaves its old row too.
+    """
+    match = Q()
+    for order_date, client_id, payment_method in set(keys):
+        match |= Q(date=order_date, client_id=client_id, payment_method=payment_method)
+    if not match:
+        return
+
+    with transaction.atomic():
+        DailySalesSummary.objects.filter(match).delete()
+        orders = Order.objects.filter(match)
+        rows = summarize_orders(orders, OrderItem.objects.filter(order__in=orders))
+        DailySalesSummary.objects.bulk_create(rows, batch_size=SUMMARY_BATCH_SIZE)
+
+
+def summarize_orders(orders, order_items):
+    """
+    Build unsaved DailySalesSummary rows from an Order queryset and the
+    matching OrderItem queryset, grouped by the database.
+    """
+    key_fields = ('date', 'client_id', 'payment_method')
+    summaries = {}
+
+    for row in orders.order_by().values(*key_fields).annotate(
+        total_sales=Sum('total'),
+        total_paid=Sum('payment_amount'),
+        total_due=Sum('balance_due'),
+        order_count=Count('id')
+    ):
+        key = tuple(row[field] for field in key_fields)
+        summaries[key] = DailySalesSummary(
+            date=row['date'],
+            client_id=row['client_id'],
+            payment_method=row['payment_method'],
+            total_sales=row['total_sales'] or 0,
+            total_paid=row['total_paid'] or 0,
+            total_due=row['total_due'] or 0,
+            order_count=row['order_count'],
+            item_quantity=Decimal('0')
+        )
+
+    for row in order_items.order_by().values(
+        'order__date', 'order__client_id', 'order__payment_method'
+    ).annotate(quantity=Sum('quantity')):
+        key = (row['order__date'], row['order__client_id'], row['order__payment_method'])
+        if key in summaries:
+            summaries[key].item_quantity = row['quantity'] or 0
+
+    return list(summaries.values())
+
+
+@transaction.atomic
+def rebuild_daily_summaries(start=None, end=None):
+    """Recompute the rollup from raw orders, optionally for a date range only"""
+    orders = Order.objects.all()
+    order_items = OrderItem.objects.all()
+    summaries = DailySalesSummary.objects.all()
+
+    if start:
+        orders = orders.filter(date__gte=start)
+        order_items = order_items.filter(order__date__gte=start)
+        summaries = summaries.filter(date__gte=start)
+    if end:
+        orders = orders.filter(date__lte=end)
+        order_items = order_items.filter(order__date__lte=end)
+        summaries = summaries.filter(date__lte=end)
+
+    summaries.delete()
+    rows = summarize_orders(orders, order_items)
+    DailySalesSummary.objects.bulk_create(rows, batch_size=SUMMARY_BATCH_SIZE)
+    return len(rows)
@@ -0,0 +1,178 @@
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from apps.pricing.catalog import bump_version
+from apps.pricing.models import Item, ItemPriceHistory
+from apps.sync.versions import next_versions
+from .ledger import open_ledger
+from .models import Client, LedgerEntry, Receipt
+from .outbox import INLINE
+from .serializers import OrderBulkCreateSerializer
+
+# Product names and opening rates (Rs per kg / dozen) of a poultry shop
+POULTRY_ITEMS = [
+    ('Broiler Live', 420), ('Broiler Meat', 620), ('Desi Murgh', 1100),
+    ('Boneless Chest', 950), ('Leg Piece', 700), ('Wings', 480),
+    ('Qeema', 880), ('Kaleji', 450), ('Pota', 300), ('Paye', 180),
+    ('Layer Live', 350), ('Eggs (dozen)', 330),
+]
+CUSTOMER_KINDS = ['Hotel', 'Restaurant', 'Karahi House', 'Tikka Shop', 'Caterers', 'BBQ', 'General Store']
+CUSTOMER_AREAS = ['Anarkali', 'Gulberg', 'Model Town', 'Saddar', 'Township', 'Johar Town', 'Shadman']
+
+MAX_BATCH = 500  # OrderBulkCreateSerializer limit
+TWO_PLACES = Decimal('0.01')
+
+
+def local_time(day, hour):
+    return timezone.make_aware(datetime.combine(day, time(hour)))
+
+
+def seed_items(rng, count, since):
+    """`count` products, cycling through POULTRY_ITEMS, priced from `since`"""
+    items = []
+    for index in range(count):
+        name, rate = POULTRY_ITEMS[index % len(POULTRY_ITEMS)]
+        if index >= len(POULTRY_ITEMS):
+            name = f"{name} {index // len(POULTRY_ITEMS) + 1}"
+        items.append(Item.objects.create(name=name, price=Decimal(rate + rng.randint(-20, 20))))
+    ItemPriceHistory.objects.filter(item__in=items).update(effective_from=since)
+    return items
+
+
+def seed_clients(rng, count, since):
+    clients = []
+    for index in range(count):
+        name = f"{rng.choice(CUSTOMER_AREAS)} {rng.choice(CUSTOMER_KINDS)} {index + 1}"
+        client = Client.objects.create(name=name)
+        open_ledger(client)
+        clients.append(client)
+    LedgerEntry.objects.filter(client__in=clients).update(timestamp=since)
+    return clients
+
+
+def change_prices(rng, items, day):
+    """
+    The morning rate change: every price moves up to 3% (whole rupees)
+    from the previous day, effective at 6 AM. The catalog version is
+    bumped right away, not on commit, so the day's orders are priced
+    from it inside the same transaction.
+    """
+    effective_from = local_time(day, 6)
+    history = []
+    for item in items:
+        price = (item.price * Decimal(str(1 + rng.uniform(-0.03, 0.03)))).quantize(Decimal('1'))
+        item.price = max(price, Decimal('50'))
+        item.updated_at = effective_from
+        history.append(ItemPriceHistory(item=item, price=item.price, effective_from=effective_from))
+
+    for item, version in zip(items, next_versions(Item._meta.label_lower, len(items))):
+        item.sync_version = version
+    Item.objects.bulk_update(items, fields=['price', 'updated_at', 'sync_version'])
+    ItemPriceHistory.objects.bulk_create(history)
+    bump_version()
+
+
+def order_payload(rng, client, items, day, max_lines):
+    """An OrderCreateSerializer payload of 1 to `max_lines` lines"""
+    count = rng.randint(1, max_lines)
+    # Past the size of the catalog a cut is written more than once
+    lines = rng.sample(items, count) if count <= len(items) else rng.choices(items, k=count)
+
+    cart = []
+    total = Decimal('0')
+    for item in lines:
+        quantity = Decimal(rng.randint(25, 2500)) / 100
+        cart.append({'product': str(item.id), 'quantity': str(quantity), 'factor': '1'})
+        total += item.price * quantity
+    total = total.quantize(TWO_PLACES)
+
+    kind = rng.random()
+    if kind < 0.5:
+        payment, method, status = total, rng.choice(['cash', 'cash', 'bank_transfer', 'digital_wallet']), 'paid'
+    elif kind < 0.75:
+        payment, method, status = (total * Decimal(str(rng.uniform(0.2, 0.9)))).quantize(Decimal('1')), 'cash', 'partial'
+    else:
+        payment, method, status = Decimal('0'), 'credit', 'unpaid'
+
+    return {
+        'customer': str(client.id),
+        'items': cart,
+        'payment_amount': str(payment),
+        'payment_method': method,
+        'payment_status': status,
+        'total_amount': str(total),
+        'balance_due': str(total - payment),
+        'date': day.isoformat(),
+    }
+
+
+def seed_day(rng, day, clients, items, orders, max_lines):
+    """
+    One day of trade through OrderBulkCreateSerializer, so orders, lines,
+    receipts, ledger entries and the daily rollup are all written by the
+    same code as the end-of-day entry. Receipts are written inline so they
+    can be dated to the day. Returns (orders, lines) created.
+    """
+    change_prices(rng, items, day)
+
+    payloads = [order_payload(rng, rng.choice(clients), items, day, max_lines) for _ in range(orders)]
+    order_ids = []
+    for start in range(0, len(payloads), MAX_BATCH):
+        serializer = OrderBulkCreateSerializer(data={'orders': payloads[start:start + MAX_BATCH]})
+        serializer.is_valid(raise_exception=True)
+        with override_settings(RECEIPT_MODE=INLINE):
+            results = serializer.save()
+        for result in results:
+            if not result['success']:
+                raise ValueError(f"Seed order rejected: {result['errors']}")
+            order_ids.append(result['order_id'])
+
+    # Receipts and ledger entries are stamped "now"; move them to the day
+    Receipt.objects.filter(order_id__in=order_ids).update(receipt_date=local_time(day, 18))
+    LedgerEntry.objects.filter(order_id__in=order_ids).update(timestamp=local_time(day, 18))
+    return len(payloads), sum(len(payload['items']) for payload in payloads)
+
+
+def seed_dataset(clients=50, items=12, days=730, orders_per_day=20, max_lines=40, seed=1, end=None, progress=None):
+    """
+    Generate a synthetic poultry-shop history: `clients` customers, `items`
+    products with a rate change every morning, and `days` days of orders
+    (up to `end`, default yesterday) with 1 to `max_lines` lines each.
+    The same seed always gives the same data. Each day is written in its
+    own transaction; `progress(day, orders)` is called after each one.
+    """
+    rng = random.Random(seed)
+    end = end or timezone.localdate() - timedelta(days=1)
+    start = end - timedelta(days=days - 1)
+
+    with transaction.atomic():
+        seeded_items = seed_items(rng, items, local_time(start, 0))
+        seeded_clients = seed_clients(rng, clients, local_time(start, 0))
+
+    total_orders = total_lines = 0
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        # Trade is busier on some days than others
+        count = max(1, round(orders_per_day * rng.uniform(0.6, 1.4)))
+        with transaction.atomic():
+            orders, lines = seed_day(rng, day, seeded_clients, seeded_items, count, max_lines)
+        total_orders += orders
+        total_lines += lines
+        if progress:
+            progress(day, total_orders)
+
+    return {
+        'clients': clients,
+        'items': items,
+        'days': days,
+        'orders': total_orders,
+        'lines': total_lines,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'seed': seed,
+    }
@@ -0,0 +1,58 @@
+from django.db import transaction, IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Receipt, ReceiptSequence
+
+RECEIPT_NUMBER_PREFIX = 'RCPT'
+
+
+def receipt_number_prefix(day):
+    return f"{RECEIPT_NUMBER_PREFIX}-{day.strftime('%Y%m%d')}-"
+
+
+def last_issued_number(day):
+    """
+    Highest number already used on `day`, so a new counter row continues
+    after receipts numbered before the counter existed.
+    """
+    prefix = receipt_number_prefix(day)
+    last = Receipt.objects.filter(
+        receipt_number__startswith=prefix
+    ).order_by('-receipt_number').values_list('receipt_number', flat=True).first()
+    if not last:
+        return 0
+    try:
+        return int(last[len(prefix):])
+    except ValueError:
+        return 0
+
+
+def next_receipt_numbers(count, day=None):
+    """
+    Reserve `count` consecutive receipt numbers for `day` (default: today).
+    The day's counter row is bumped with a single UPDATE, which holds the
+    row lock until the surrounding transaction ends, so concurrent workers
+    never get the same number and a rolled back checkout releases its
+    numbers. Cost does not depend on how many receipts exist.
+    """
+    day = day or timezone.localdate()
+
+    with transaction.atomic():
+        updated = ReceiptSequence.objects.filter(day=day).update(last_value=F('last_value') + count)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    ReceiptSequence.objects.create(day=day, last_value=last_issued_number(day) + count)
+            except IntegrityError:
+                # Another worker created today's row first
+                ReceiptSequence.objects.filter(day=day).update(last_value=F('last_value') + count)
+        last_value = ReceiptSequence.objects.filter(day=day).values_list('last_value', flat=True).get()
+
+    prefix = receipt_number_prefix(day)
+    return [f"{prefix}{value:06d}" for value in range(last_value - count + 1, last_value + 1)]
+
+
+def next_receipt_number(day=None):
+    """Reserve a single receipt number"""
+    return next_receipt_numbers(1, day)[0]
@@ -1,9 +1,16 @@
 # serializers.py
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Client, Order, OrderItem, Receipt, ReceiptItem  # Added Receipt and ReceiptItem
+from .models import Client, Order, OrderItem, Receipt, ReceiptItem, ReportExportJob  # Added Receipt and ReceiptItem
 from django.db import transaction
 from decimal import Decimal
-from apps.pricing.models import Item
+from apps.pricing.catalog import get_items
+from .ledger import post_entries, order_entry, open_ledger, apply_balance_change
+from .exports import xlsx_available
+from .listings import decimal_text
+from .outbox import issue_receipt, issue_receipts
+from .rollups import record_order, record_orders
+from .sequences import next_receipt_number
 from datetime import date, datetime  # Added datetime
 import logging
 
@@ -23,10 +30,34 @@ class ClientSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'balance', 'starting_balance']
         read_only_fields = ['id']
     
+    @transaction.atomic
     def create(self, validated_data):
         starting_balance = validated_data.pop('starting_balance', Decimal('0'))
         validated_data['balance'] = starting_balance
-        return super().create(validated_data)
+        client = super().create(validated_data)
+        open_ledger(client)
+        return client
+    
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        # Only the edited columns are saved; the balance loaded with the
+        # instance may be stale, so balance edits go through the ledger as
+        # adjustments against the locked current balance
+        validated_data.pop('starting_balance', None)
+        new_balance = validated_data.pop('balance', None)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+
+        current = Client.objects.select_for_update().filter(pk=instance.pk).values_list('balance', flat=True).get()
+        instance.balance = current
+        if new_balance is not None and new_balance != current:
+            _, instance.balance = apply_balance_change(
+                instance.id,
+                new_balance - current,
+                description='Manual balance adjustment'
+            )
+        return instance
 
 
 class OrderItemCreateSerializer(serializers.Serializer):
@@ -55,20 +86,20 @@ class OrderCreateSerializer(serializers.Serializer):
     
     @transaction.atomic
     def create(self, validated_data):
-        logger.info(f"Starting order creation with data: {validated_data}")
+        logger.info("Starting order creation with data: %s", validated_data)
         
         try:
             # EXTRACT DATE FIRST - THIS IS THE FIX!
             order_date = validated_data.pop('date', None)
-            logger.info(f"Extracted date from payload: {order_date}")
+            logger.info("Extracted date from payload: %s", order_date)
             
             # Convert string to date object if needed
             if order_date and isinstance(order_date, str):
                 try:
                     order_date = datetime.strptime(order_date, '%Y-%m-%d').date()
-                    logger.info(f"Converted string to date: {order_date}")
+                    logger.info("Converted string to date: %s", order_date)
                 except ValueError as e:
-                    logger.error(f"Date format error: {e}. Using today's date.")
+                    logger.error("Date format error: %s. Using today's date.", e)
                     order_date = date.today()
             
             # If no date provided, use today
@@ -84,61 +115,30 @@ class OrderCreateSerializer(serializers.Serializer):
                 order_date = date.today()
             
             customer_id = validated_data['customer']
-            items_data = validated_data['items']
             payment_amount = validated_data['payment_amount']
             payment_status = validated_data['payment_status']
-            total_amount = validated_data['total_amount']
             balance_due = validated_data['balance_due']
             payment_method = validated_data.get('payment_method', 'cash')
             
-            logger.info(f"Creating order for customer {customer_id} with date {order_date}")
+            logger.info("Creating order for customer %s with date %s", customer_id, order_date)
             
             # Get customer
             try:
                 customer = Client.objects.get(id=customer_id)
-                logger.info(f"Found customer: {customer.name}")
+                logger.info("Found customer: %s", customer.name)
             except Client.DoesNotExist:
-                logger.error(f"Customer {customer_id} not found")
+                logger.error("Customer %s not found", customer_id)
                 raise serializers.ValidationError({"customer": "Customer not found"})
             
-            # Calculate total and prepare order items
-            order_total = Decimal('0')
-            order_items_to_create = []
-            
-            for item_data in items_data:
-                try:
-                    product = Item.objects.get(id=item_data['product'])
-                    logger.info(f"Found product: {product.name}")
-                except Item.DoesNotExist:
-                    logger.error(f"Product {item_data['product']} not found")
-                    raise serializers.ValidationError({
-                        "items": f"Product {item_data['product']} not found"
-                    })
-                
-                quantity = item_data['quantity']
-                factor = item_data.get('factor', Decimal('1'))
-                
-                final_price = product.price * factor
-                line_total = final_price * quantity
-                order_total += line_total
-                
-                order_items_to_create.append({
-                    'item': product,
-                    'quantity': quantity,
-                    'price': final_price,
-                })
-            
-            logger.info(f"Calculated order total: {order_total}")
+            # Prices come from the cached catalog; changed or unknown ids
+            # are re-read in one query
+            products = get_items(cart_product_ids([validated_data]))
+            order_total, lines = price_order(validated_data, products)
             
-            # Validate total
-            if abs(float(order_total) - float(total_amount)) > 0.01:
-                logger.error(f"Total mismatch: calculated {order_total}, provided {total_amount}")
-                raise serializers.ValidationError({
-                    "total_amount": f"Calculated total ({order_total}) doesn't match provided total ({total_amount})"
-                })
+            logger.info("Calculated order total: %s", order_total)
             
             # Create order
-            logger.info(f"Creating order with date: {order_date}")
+            logger.info("Creating order with date: %s", order_date)
             
             order = Order.objects.create(
                 client=customer,
@@ -150,80 +150,182 @@ class OrderCreateSerializer(serializers.Serializer):
                 balance_due=balance_due
             )
             
-            logger.info(f"Order created with ID: {order.id}")
+            logger.info("Order created with ID: %s", order.id)
             
-            # Create order items
-            order_items_created = []
-            for item_data in order_items_to_create:
-                order_item = OrderItem.objects.create(
-                    order=order,
-                    item=item_data['item'],
-                    quantity=item_data['quantity'],
-                    price=item_data['price']
-                )
-                order_items_created.append(order_item)
+            # Create order items with a single insert
+            order_items_created = OrderItem.objects.bulk_create([
+                OrderItem(order=order, item=product, quantity=quantity, price=price)
+                for product, quantity, price in lines
+            ])
             
-            logger.info(f"Created {len(order_items_created)} order items")
+            logger.info("Created %s order items", len(order_items_created))
             
-            # Update customer balance
-            net_balance_change = order_total - payment_amount
-            customer.balance += net_balance_change
-            customer.save()
-            logger.info(f"Updated customer balance. New balance: {customer.balance}")
+            # Keep the daily sales rollup in step with this order
+            record_order(order, sum((quantity for _, quantity, _ in lines), Decimal('0')))
             
-            # Auto-create receipt
-            try:
-                previous_balance = customer.balance - net_balance_change
-                receipt_number = f"RCPT-{datetime.now().strftime('%Y%m%d')}-{Receipt.objects.count() + 1:06d}"
-                this_bill_balance = max(Decimal('0'), order_total - payment_amount)
-                updated_balance = customer.balance
-                
-                logger.info(f"Creating receipt {receipt_number}")
-                
-                receipt = Receipt.objects.create(
-                    order=order,
-                    customer=customer,
-                    customer_name=customer.name,
-                    previous_balance=previous_balance,
-                    current_bill_amount=order_total,
-                    payment_made=payment_amount,
-                    this_bill_balance=this_bill_balance,
-                    updated_balance=updated_balance,
-                    payment_method=payment_method,
-                    payment_status=payment_status,
-                    receipt_number=receipt_number,
-                )
-                
-                logger.info(f"Receipt created with ID: {receipt.id}")
-                
-                # Create receipt items
-                receipt_items = []
-                for order_item in order_items_created:
-                    receipt_items.append(ReceiptItem(
-                        receipt=receipt,
-                        product_name=order_item.item.name,
-                        quantity=order_item.quantity,
-                        unit='kg',
-                        price_per_unit=order_item.price,
-                        total=order_item.quantity * order_item.price,
-                        product_id=order_item.item.id
-                    ))
-                
-                ReceiptItem.objects.bulk_create(receipt_items)
-                logger.info(f"Created {len(receipt_items)} receipt items")
-                
-            except Exception as e:
-                logger.error(f"Failed to create receipt for order {order.id}: {str(e)}")
-                # Don't fail the order creation if receipt fails
+            # Update customer balance and record the order in the ledger
+            _, customer.balance = post_entries(customer.id, [order_entry(order)])
+            logger.info("Updated customer balance. New balance: %s", customer.balance)
             
-            logger.info(f"Order {order.id} creation completed successfully")
+            # The receipt is written right here in inline mode, or by the
+            # receipt outbox worker once this checkout commits
+            issue_receipt(order, customer, customer.balance, [
+                (product.id, product.name, quantity, price) for product, quantity, price in lines
+            ])
+            
+            logger.info("Order %s creation completed successfully", order.id)
             return order
             
         except Exception as e:
-            logger.error(f"Order creation failed: {str(e)}", exc_info=True)
+            logger.error("Order creation failed: %s", e, exc_info=True)
             raise
 
 
+class OrderBulkCreateSerializer(serializers.Serializer):
+    """
+    Serializer for entering a batch of orders at once (end-of-day entry).
+    Each entry is an OrderCreateSerializer payload. Entries are validated
+    one by one so a bad entry does not reject the whole batch; the valid
+    ones are written together in one transaction.
+    """
+    orders = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=500
+    )
+
+    def create(self, validated_data):
+        results = [None] * len(validated_data['orders'])
+        entries = []
+
+        # Field level validation for every entry
+        for index, payload in enumerate(validated_data['orders']):
+            entry_serializer = OrderCreateSerializer(data=payload)
+            if entry_serializer.is_valid():
+                entries.append((index, entry_serializer.validated_data))
+            else:
+                results[index] = {'index': index, 'success': False, 'errors': entry_serializer.errors}
+
+        with transaction.atomic():
+            # Resolve every product and customer with one query each
+            customer_ids = {parse_id(entry['customer']) for _, entry in entries}
+            products = get_items(cart_product_ids([entry for _, entry in entries]))
+            customers = Client.objects.in_bulk([pk for pk in customer_ids if pk is not None])
+
+            prepared = []
+            for index, entry in entries:
+                customer = customers.get(parse_id(entry['customer']))
+                if customer is None:
+                    results[index] = {'index': index, 'success': False, 'errors': {'customer': 'Customer not found'}}
+                    continue
+
+                try:
+                    order_total, lines = price_order(entry, products)
+                except serializers.ValidationError as e:
+                    results[index] = {'index': index, 'success': False, 'errors': e.detail}
+                    continue
+
+                order = Order(
+                    client=customer,
+                    total=order_total,
+                    date=entry.get('date') or date.today(),
+                    payment_amount=entry['payment_amount'],
+                    payment_method=entry.get('payment_method', 'cash'),
+                    payment_status=entry['payment_status'],
+                    balance_due=entry['balance_due']
+                )
+                prepared.append((index, order, lines))
+
+            if prepared:
+                Order.objects.bulk_create([order for _, order, _ in prepared])
+                OrderItem.objects.bulk_create([
+                    OrderItem(order=order, item=product, quantity=quantity, price=price)
+                    for _, order, lines in prepared
+                    for product, quantity, price in lines
+                ])
+                record_orders([
+                    (order, sum((quantity for _, quantity, _ in lines), Decimal('0')))
+                    for _, order, lines in prepared
+                ])
+
+                # Each customer's balance is changed once for the whole batch,
+                # with one ledger entry per order
+                ledger_entries = {}
+                for _, order, _ in prepared:
+                    ledger_entries.setdefault(order.client_id, []).append(order_entry(order))
+                for client_id, client_entries in ledger_entries.items():
+                    post_entries(client_id, client_entries)
+                balance_after = {
+                    entry.order.id: entry.balance
+                    for client_entries in ledger_entries.values() for entry in client_entries
+                }
+                
+                # Receipts carry the running balance of each customer
+                # through the batch; written here or by the receipt outbox
+                # worker, as for a single checkout
+                receipt_numbers = issue_receipts([
+                    (order, order.client, balance_after[order.id], [
+                        (product.id, product.name, quantity, price) for product, quantity, price in lines
+                    ])
+                    for _, order, lines in prepared
+                ])
+
+                for receipt_number, (index, order, _) in zip(receipt_numbers, prepared):
+                    results[index] = {
+                        'index': index,
+                        'success': True,
+                        'order_id': order.id,
+                        'receipt_number': receipt_number
+                    }
+
+        logger.info("Bulk order entry: %s created, %s failed", len(prepared), len(results) - len(prepared))
+        return results
+
+
+def parse_id(value):
+    """Convert a primary key sent as text to an int (None when invalid)"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def cart_product_ids(entries):
+    """Product ids of every line of the given OrderCreateSerializer entries"""
+    product_ids = {parse_id(item['product']) for entry in entries for item in entry['items']}
+    return [pk for pk in product_ids if pk is not None]
+
+
+def price_order(entry, products):
+    """
+    Price the lines of a validated OrderCreateSerializer entry against
+    `products` (from get_items) and check the total the terminal sent.
+    Returns (order_total, lines) with (product, quantity, price) lines;
+    raises ValidationError for an unknown product or a total mismatch.
+    Shared by checkout and bulk entry so both price orders the same way.
+    """
+    order_total = Decimal('0')
+    lines = []
+    for item in entry['items']:
+        product = products.get(parse_id(item['product']))
+        if product is None:
+            logger.error("Product %s not found", item['product'])
+            raise serializers.ValidationError({
+                "items": f"Product {item['product']} not found"
+            })
+        
+        final_price = product.price * item.get('factor', Decimal('1'))
+        order_total += final_price * item['quantity']
+        lines.append((product, item['quantity'], final_price))
+    
+    if abs(float(order_total) - float(entry['total_amount'])) > 0.01:
+        logger.error("Total mismatch: calculated %s, provided %s", order_total, entry['total_amount'])
+        raise serializers.ValidationError({
+            "total_amount": f"Calculated total ({order_total}) doesn't match provided total ({entry['total_amount']})"
+        })
+    return order_total, lines
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
     """Serializer for OrderItem"""
     item_name = serializers.CharField(source='item.name', read_only=True)
@@ -234,7 +336,8 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'item', 'item_name', 'quantity', 'price', 'line_total']
     
     def get_line_total(self, obj):
-        return obj.quantity * obj.price
+        # Rendered like the other money fields
+        return decimal_text(obj.quantity * obj.price)
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -256,6 +359,9 @@ class OrderSerializer(serializers.ModelSerializer):
     def get_receipt_number(self, obj):
         if hasattr(obj, 'receipt'):
             return obj.receipt.receipt_number
+        # Reserved at checkout, still being written by the receipt outbox
+        if hasattr(obj, 'receipt_outbox'):
+            return obj.receipt_outbox.receipt_number
         return None
     
     def get_receipt_id(self, obj):
@@ -313,7 +419,7 @@ class ReceiptCreateSerializer(serializers.Serializer):
     @transaction.atomic
     def create(self, validated_data):
         # Generate receipt number
-        receipt_number = f"RCPT-{datetime.now().strftime('%Y%m%d')}-{Receipt.objects.count() + 1:06d}"
+        receipt_number = next_receipt_number()
         
         # Calculate balances
         this_bill_balance = max(Decimal('0'), validated_data['current_bill_amount'] - validated_data['payment_made'])
@@ -354,4 +460,58 @@ class ReceiptCreateSerializer(serializers.Serializer):
 
 class ReceiptReprintSerializer(serializers.Serializer):
     """Serializer for reprinting receipts"""
-    receipt_id = serializers.IntegerField(required=True)
\ No newline at end of file
+    receipt_id = serializers.IntegerField(required=True)
+
+
+class ReportExportJobSerializer(serializers.ModelSerializer):
+    """Export job status, polled until it is done"""
+    customer_name = serializers.CharField(source='customer.name', read_only=True, default=None)
+    progress = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportExportJob
+        fields = [
+            'id', 'start_date', 'end_date', 'customer', 'customer_name', 'file_format',
+            'status', 'rows_total', 'rows_written', 'progress', 'download_url', 'error',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+    def get_progress(self, obj):
+        """Percentage of rows written"""
+        if obj.status == ReportExportJob.DONE:
+            return 100
+        if not obj.rows_total:
+            return 0
+        return min(99, obj.rows_written * 100 // obj.rows_total)
+
+    def get_download_url(self, obj):
+        if obj.status != ReportExportJob.DONE or not obj.file:
+            return None
+        url = reverse('report-export-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class ReportExportCreateSerializer(serializers.Serializer):
+    """Same filters as orders/reports/date-range"""
+    start_date = serializers.DateField(input_formats=['%Y-%m-%d'])
+    end_date = serializers.DateField(input_formats=['%Y-%m-%d'])
+    customer = serializers.PrimaryKeyRelatedField(queryset=Client.objects.all(), required=False, allow_null=True)
+    file_format = serializers.ChoiceField(choices=ReportExportJob.FORMAT_CHOICES, default=ReportExportJob.CSV)
+
+    def validate_file_format(self, value):
+        if value == ReportExportJob.XLSX and not xlsx_available():
+            raise serializers.ValidationError("XLSX export is not available on this server. Use csv.")
+        return value
+
+    def validate(self, data):
+        if data['end_date'] < data['start_date']:
+            raise serializers.ValidationError("end_date cannot be before start_date")
+        return data
+
+    def create(self, validated_data):
+        request = self.context.get('request')
+        user = request.user if request and request.user.is_authenticated else None
+        return ReportExportJob.objects.create(requested_by=user, **validated_data)
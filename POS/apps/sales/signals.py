@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .balances import invalidate_customer_balances
+from .models import Client, Order, Receipt, ReceiptItem
+from .receipts import invalidate_rendered_receipt
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def drop_customer_balances_snapshot(sender, **kwargs):
+    """Client balances, order counts and last order dates feed the snapshot"""
+    transaction.on_commit(invalidate_customer_balances)
+
+
+@receiver(post_save, sender=Receipt)
+@receiver(post_delete, sender=Receipt)
+def drop_rendered_receipt(sender, instance, created=False, **kwargs):
+    """New receipts have nothing cached yet; edits and deletes drop the artifacts"""
+    if not created:
+        receipt_id = instance.id
+        transaction.on_commit(lambda: invalidate_rendered_receipt(receipt_id))
+
+
+@receiver(post_save, sender=ReceiptItem)
+@receiver(post_delete, sender=ReceiptItem)
+def drop_rendered_receipt_for_item(sender, instance, **kwargs):
+    receipt_id = instance.receipt_id
+    transaction.on_commit(lambda: invalidate_rendered_receipt(receipt_id))
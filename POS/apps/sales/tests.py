@@ -1,3 +1,1500 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from importlib import import_module
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Q, Sum
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.pricing.models import Item
+from POS import renderers
+from .models import (
+    Client, Order, OrderItem, Receipt, DailySalesSummary, LedgerEntry, ReceiptReprintLog, ReceiptOutbox,
+    ReportExportJob
+)
+from .ledger import apply_balance_change, balance_before, ledger_entry, post_entries, statement_entries
+from .receipts import receipt_cache_key, record_reprint
+from .reports import (
+    REPORT_LINE_EXPRESSIONS, REPORT_LINE_FIELDS, daily_totals, monthly_totals, report_order_values, summary_queryset
+)
+from .rollups import rebuild_daily_summaries
+from .sequences import next_receipt_number, next_receipt_numbers
+from .listings import order_values, order_rows, receipt_values, receipt_rows
+from .exports import run_export_job, wake_export_worker
+from .outbox import drain_outbox, ensure_receipt, wake_worker
+from .serializers import ClientSerializer, OrderCreateSerializer, OrderSerializer, ReceiptSerializer
+from .views import OrderViewSet
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    RECEIPT_MODE='inline'
+)
+class SalesAPITestCase(APITestCase):
+    """Shared fixtures for the sales API tests"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cashier', password='secret')
+        self.client.force_authenticate(self.user)
+        self.customer = Client.objects.create(name='Hotel Shalimar', balance=Decimal('0'))
+        self.broiler = Item.objects.create(name='Broiler', price=Decimal('520.00'))
+        self.eggs = Item.objects.create(name='Eggs', price=Decimal('30.00'))
+
+    def make_order(self, order_date, lines=2, customer=None):
+        order = Order.objects.create(
+            client=customer or self.customer,
+            total=Decimal('0'),
+            date=order_date,
+            payment_amount=Decimal('0'),
+            payment_status='unpaid',
+            balance_due=Decimal('0'),
+        )
+        total = Decimal('0')
+        for index in range(lines):
+            product = self.broiler if index % 2 == 0 else self.eggs
+            OrderItem.objects.create(order=order, item=product, quantity=Decimal('2'), price=product.price)
+            total += product.price * 2
+        order.total = total
+        order.balance_due = total
+        order.save()
+        return order
+
+    def order_payload(self, lines, payment_amount='0', payment_method='credit', order_date='2025-03-01', customer=None):
+        """Build an order payload the way the POS cart sends it"""
+        total = sum(Decimal(quantity) * product.price for product, quantity in lines).quantize(Decimal('0.01'))
+        payment = Decimal(payment_amount)
+        return {
+            'customer': str((customer or self.customer).id),
+            'items': [
+                {'product': str(product.id), 'quantity': quantity, 'factor': '1'}
+                for product, quantity in lines
+            ],
+            'payment_amount': payment_amount,
+            'payment_method': payment_method,
+            'payment_status': 'paid' if payment >= total else 'partial' if payment else 'unpaid',
+            'total_amount': str(total),
+            'balance_due': str(max(total - payment, Decimal('0'))),
+            'date': order_date,
+        }
+
+    def checkout(self, lines, **kwargs):
+        """Create an order through the POS checkout endpoint"""
+        response = self.client.post('/api/sales/orders/create/', self.order_payload(lines, **kwargs), format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response
+
+
+class DateRangeReportTests(SalesAPITestCase):
+    url = '/api/sales/orders/reports/date-range/'
+
+    def fetch(self, start, end):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {
+                'start_date': start.strftime('%Y-%m-%d'),
+                'end_date': end.strftime('%Y-%m-%d'),
+            })
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def test_report_totals_and_breakdown(self):
+        start = date(2025, 3, 1)
+        self.make_order(start)
+        self.make_order(start, lines=3)
+        self.make_order(start + timedelta(days=2), lines=1)
+
+        data, _ = self.fetch(start, start + timedelta(days=5))
+
+        self.assertEqual(data['order_count'], 3)
+        self.assertEqual(data['total_sales'], 4280.0)
+        self.assertEqual(len(data['orders']), 3)
+        self.assertEqual([day['date'] for day in data['daily_breakdown']], ['2025-03-01', '2025-03-03'])
+        self.assertEqual(data['daily_breakdown'][0]['order_count'], 2)
+        self.assertEqual(data['daily_breakdown'][0]['total_sales'], 3240.0)
+        self.assertEqual(data['orders'][1]['items_count'], 3)
+        self.assertEqual(data['daily_breakdown'][0]['orders'][1], data['orders'][1])
+
+    def test_query_count_is_constant_as_range_grows(self):
+        start = date(2025, 3, 1)
+        self.make_order(start)
+        _, small_range_queries = self.fetch(start, start)
+
+        for offset in range(1, 30):
+            self.make_order(start + timedelta(days=offset), lines=1 + offset % 4)
+        data, large_range_queries = self.fetch(start, start + timedelta(days=29))
+
+        self.assertEqual(data['order_count'], 30)
+        self.assertEqual(small_range_queries, large_range_queries)
+
+
+class MonthlyReportTests(SalesAPITestCase):
+    url = '/api/sales/orders/reports/monthly/'
+
+    def fetch(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_months_are_aggregated_without_order_detail(self):
+        self.make_order(date(2025, 1, 5))
+        self.make_order(date(2025, 1, 20), lines=1)
+        self.make_order(date(2025, 2, 3))
+        rebuild_daily_summaries()
+
+        data = self.fetch()
+
+        self.assertEqual([month['month'] for month in data['reports']], ['2025-02', '2025-01'])
+        self.assertEqual(data['reports'][1]['order_count'], 2)
+        self.assertEqual(data['reports'][1]['total_sales'], 2140.0)
+        self.assertNotIn('orders', data['reports'][0])
+        self.assertIsNone(data['customer_filter'])
+
+    def test_order_detail_is_paginated_per_month(self):
+        for day in range(1, 6):
+            self.make_order(date(2025, 1, day))
+
+        first_page = self.fetch(include_orders='true', page_size=2, customer=self.customer.id)
+        last_page = self.fetch(include_orders='true', page_size=2, page=3)
+
+        january = first_page['reports'][0]
+        self.assertEqual(len(january['orders']), 2)
+        self.assertTrue(january['orders_page']['has_next'])
+        self.assertEqual(first_page['customer_filter'], 'Hotel Shalimar')
+        self.assertEqual(len(last_page['reports'][0]['orders']), 1)
+        self.assertFalse(last_page['reports'][0]['orders_page']['has_next'])
+
+
+class DailySalesSummaryTests(SalesAPITestCase):
+
+    def test_checkout_updates_rollup(self):
+        self.checkout([(self.broiler, '2'), (self.eggs, '10')], payment_amount='500')
+        self.checkout([(self.broiler, '1')], payment_amount='0')
+        self.checkout([(self.eggs, '1')], payment_amount='30', payment_method='cash')
+
+        credit = DailySalesSummary.objects.get(date=date(2025, 3, 1), client=self.customer, payment_method='credit')
+        self.assertEqual(credit.order_count, 2)
+        self.assertEqual(credit.total_sales, Decimal('1860.00'))
+        self.assertEqual(credit.total_paid, Decimal('500.00'))
+        self.assertEqual(credit.total_due, Decimal('1360.00'))
+        self.assertEqual(credit.item_quantity, Decimal('13.00'))
+        self.assertEqual(DailySalesSummary.objects.count(), 2)
+
+    def test_rebuild_matches_incremental_rollup(self):
+        self.checkout([(self.broiler, '2'), (self.eggs, '10')], payment_amount='500')
+        self.checkout([(self.eggs, '3')], order_date='2025-03-02')
+        incremental = list(DailySalesSummary.objects.order_by('date').values(
+            'date', 'client', 'payment_method', 'total_sales', 'total_paid', 'total_due', 'order_count', 'item_quantity'
+        ))
+
+        call_command('rebuild_sales_summary', stdout=StringIO())
+
+        rebuilt = list(DailySalesSummary.objects.order_by('date').values(
+            'date', 'client', 'payment_method', 'total_sales', 'total_paid', 'total_due', 'order_count', 'item_quantity'
+        ))
+        self.assertEqual(incremental, rebuilt)
+
+    def test_reports_without_detail_read_the_rollup(self):
+        self.checkout([(self.broiler, '2')], payment_amount='1040', payment_method='cash')
+        self.checkout([(self.eggs, '4')], order_date='2025-03-03')
+
+        daily = self.client.get('/api/sales/orders/reports/daily/', {'date': '2025-03-01', 'detail': 'false'})
+        date_range = self.client.get('/api/sales/orders/reports/date-range/', {
+            'start_date': '2025-03-01', 'end_date': '2025-03-31', 'detail': 'false'
+        })
+
+        self.assertEqual(daily.data['total_sales'], 1040.0)
+        self.assertNotIn('orders', daily.data)
+        self.assertEqual(date_range.data['order_count'], 2)
+        self.assertEqual(date_range.data['total_due'], 120.0)
+        self.assertEqual([day['date'] for day in date_range.data['daily_breakdown']], ['2025-03-01', '2025-03-03'])
+
+    def summary_report(self):
+        return self.client.get('/api/sales/orders/reports/date-range/', {
+            'start_date': '2025-03-01', 'end_date': '2025-03-31', 'detail': 'false'
+        }).data
+
+    def test_edited_and_deleted_orders_are_recounted(self):
+        edited = self.checkout([(self.broiler, '2')]).data['id']
+        deleted = self.checkout([(self.eggs, '4')]).data['id']
+
+        response = self.client.patch(f'/api/sales/orders/{edited}/', {
+            'total': '1040.00', 'payment_amount': '1040.00', 'payment_method': 'cash',
+            'payment_status': 'paid', 'balance_due': '0.00'
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.delete(f'/api/sales/orders/{deleted}/').status_code, 204)
+
+        report = self.summary_report()
+        self.assertEqual((report['order_count'], report['total_sales']), (1, 1040.0))
+        self.assertEqual((report['total_paid'], report['total_due']), (1040.0, 0.0))
+        self.assertEqual(
+            list(DailySalesSummary.objects.values_list('payment_method', 'order_count', 'item_quantity')),
+            [('cash', 1, Decimal('2.00'))]
+        )
+
+    def test_orders_posted_to_the_order_list_are_counted(self):
+        response = self.client.post('/api/sales/orders/', {
+            'client': self.customer.id, 'total': '750.00', 'payment_amount': '250.00',
+            'payment_method': 'cash', 'payment_status': 'partial', 'balance_due': '500.00'
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+        month = json.loads(b''.join(self.client.get('/api/sales/orders/reports/monthly/').streaming_content))
+
+        report = month['reports'][0]
+        self.assertEqual(report['month'], response.data['date'][:7])
+        self.assertEqual((report['order_count'], report['total_sales'], report['total_due']), (1, 750.0, 500.0))
+
+    def test_admin_edits_are_recounted(self):
+        order = Order.objects.get(pk=self.checkout([(self.broiler, '2')]).data['id'])
+        line = order.items.get()
+        self.client.force_login(User.objects.create_superuser(username='owner', password='secret'))
+
+        response = self.client.post(f'/admin/sales/orderitem/{line.id}/change/', {
+            'order': order.id, 'item': self.broiler.id, 'quantity': '5', 'price': '520.00'
+        })
+        self.assertEqual(response.status_code, 302)
+        response = self.client.post(f'/admin/sales/order/{order.id}/change/', {
+            'client': self.customer.id, 'total': '2600.00', 'date': '2025-03-02',
+            'payment_amount': '0', 'payment_status': 'unpaid', 'balance_due': '2600.00',
+            'items-TOTAL_FORMS': '1', 'items-INITIAL_FORMS': '1', 'items-MIN_NUM_FORMS': '0',
+            'items-MAX_NUM_FORMS': '1000', 'items-0-id': line.id, 'items-0-order': order.id,
+            'items-0-item': self.broiler.id, 'items-0-quantity': '5', 'items-0-price': '520.00',
+        })
+        self.assertEqual(response.status_code, 302)
+
+        self.assertEqual(
+            list(DailySalesSummary.objects.values_list('date', 'total_sales', 'item_quantity')),
+            [(date(2025, 3, 2), Decimal('2600.00'), Decimal('5.00'))]
+        )
+
+        self.client.post(f'/admin/sales/order/{order.id}/delete/', {'post': 'yes'})
+        self.assertEqual(self.summary_report()['order_count'], 0)
+
+
+class CustomerBalancesTests(SalesAPITestCase):
+    url = '/api/customers/balances/'
+
+    def setUp(self):
+        super().setUp()
+        self.other = Client.objects.create(name='Al Madina Foods', balance=Decimal('-250.00'))
+        Client.objects.create(name='Walk-in', balance=Decimal('0'))
+
+    def test_balances_use_a_fixed_number_of_queries(self):
+        self.make_order(date(2025, 3, 1))
+        self.make_order(date(2025, 3, 4))
+        Client.objects.filter(pk=self.customer.pk).update(balance=Decimal('1500.00'))
+        for index in range(10):
+            Client.objects.create(name=f'Retail {index}', balance=Decimal('0'))
+
+        with self.settings(CUSTOMER_BALANCES_CACHE_TIMEOUT=0), self.assertNumQueries(2):
+            response = self.client.get(self.url, {'sort': 'balance', 'order': 'desc'})
+
+        data = response.data
+        self.assertEqual(data['count'], 13)
+        self.assertEqual(data['total_balance'], 1250.0)
+        self.assertEqual(data['positive_balance_count'], 1)
+        self.assertEqual(data['negative_balance_count'], 1)
+        self.assertEqual(data['zero_balance_count'], 11)
+        self.assertEqual(data['customers'][0]['name'], 'Hotel Shalimar')
+        self.assertEqual(data['customers'][0]['order_count'], 2)
+        self.assertEqual(data['customers'][0]['last_order_date'], date(2025, 3, 4))
+        self.assertIsNone(data['customers'][-1]['last_order_date'])
+
+    def test_snapshot_is_cached_until_a_balance_changes(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+        self.assertEqual(first.data, cached.data)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.checkout([(self.broiler, '1')])
+
+        refreshed = self.client.get(self.url)
+        customer = next(c for c in refreshed.data['customers'] if c['id'] == self.customer.id)
+        self.assertEqual(customer['balance'], 520.0)
+        self.assertEqual(customer['order_count'], 1)
+
+
+class BulkOrderCreateTests(SalesAPITestCase):
+    url = '/api/sales/orders/bulk-create/'
+
+    def test_batch_reports_per_order_results(self):
+        other = Client.objects.create(name='Al Madina Foods', balance=Decimal('100.00'))
+        bad_total = self.order_payload([(self.eggs, '1')])
+        bad_total['total_amount'] = '99'
+        payloads = [
+            self.order_payload([(self.broiler, '2'), (self.eggs, '10')], payment_amount='500'),
+            self.order_payload([(self.broiler, '1')], customer=other),
+            {**self.order_payload([(self.eggs, '1')]), 'customer': '999999'},
+            bad_total,
+            self.order_payload([(self.eggs, '5')], payment_amount='150', payment_method='cash'),
+            {'customer': str(self.customer.id)},
+        ]
+
+        response = self.client.post(self.url, payloads, format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual([r['success'] for r in response.data['results']], [True, True, False, False, True, False])
+        self.assertEqual(response.data['results'][2]['errors'], {'customer': 'Customer not found'})
+        self.assertEqual(list(response.data['results'][3]['errors']), ['total_amount'])
+        self.assertIn('items', response.data['results'][5]['errors'])
+
+        self.customer.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.customer.balance, Decimal('840.00'))
+        self.assertEqual(other.balance, Decimal('620.00'))
+        self.assertEqual(OrderItem.objects.count(), 4)
+
+        receipts = Receipt.objects.filter(customer=self.customer).order_by('order_id')
+        self.assertEqual([r.previous_balance for r in receipts], [Decimal('0.00'), Decimal('840.00')])
+        self.assertEqual([r.updated_balance for r in receipts], [Decimal('840.00'), Decimal('840.00')])
+        self.assertEqual(receipts[0].items.count(), 2)
+        self.assertEqual(len({r.receipt_number for r in Receipt.objects.all()}), 3)
+
+        summary = DailySalesSummary.objects.get(client=self.customer, payment_method='credit')
+        self.assertEqual(summary.order_count, 1)
+        self.assertEqual(summary.item_quantity, Decimal('12.00'))
+
+    def test_checkout_and_bulk_entry_price_orders_alike(self):
+        payload = self.order_payload([(self.broiler, '1.5'), (self.eggs, '4')])
+        payload['items'][1]['factor'] = '1.1'
+        payload['total_amount'] = payload['balance_due'] = '912.00'
+        unknown = {**payload, 'items': [{'product': '999999', 'quantity': '1', 'factor': '1'}]}
+
+        single = self.client.post('/api/sales/orders/create/', payload, format='json')
+        bulk = self.client.post(self.url, [payload, unknown], format='json')
+
+        self.assertEqual(single.status_code, 201, single.data)
+        self.assertEqual(bulk.status_code, 207)
+        prices = [
+            list(OrderItem.objects.filter(order_id=order_id).order_by('id').values_list('price', flat=True))
+            for order_id in (single.data['id'], bulk.data['results'][0]['order_id'])
+        ]
+        self.assertEqual(prices[0], prices[1])
+        self.assertEqual(bulk.data['results'][1]['errors'], {'items': 'Product 999999 not found'})
+
+    def test_body_must_be_a_list_or_an_object(self):
+        for body in ('"orders"', '42', 'null'):
+            response = self.client.post(self.url, body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+
+    def test_products_and_customers_are_resolved_once_per_batch(self):
+        def batch(size):
+            return [self.order_payload([(self.broiler, '1'), (self.eggs, '2')]) for _ in range(size)]
+
+        # The first batch of the day also creates the rollup row
+        self.client.post(self.url, batch(1), format='json')
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.url, batch(2), format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(self.url, batch(20), format='json')
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(Order.objects.count(), 23)
+
+    def test_receipts_follow_the_receipt_mode(self):
+        payloads = [self.order_payload([(self.broiler, '1')]), self.order_payload([(self.eggs, '3')])]
+
+        with self.settings(RECEIPT_MODE='async'), self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(self.url, payloads, format='json')
+
+        self.assertFalse(Receipt.objects.exists())
+        self.assertEqual(
+            [result['receipt_number'] for result in response.data['results']],
+            list(ReceiptOutbox.objects.order_by('order_id').values_list('receipt_number', flat=True))
+        )
+        self.assertIn(wake_worker, callbacks)
+        self.assertEqual(drain_outbox(), (2, 0))
+        self.assertEqual(Receipt.objects.get(order_id=response.data['results'][1]['order_id']).updated_balance, Decimal('610.00'))
+
+
+class CheckoutTests(SalesAPITestCase):
+
+    def test_checkout_queries_do_not_grow_with_cart_size(self):
+        products = [self.broiler, self.eggs] + [
+            Item.objects.create(name=f'Cut {index}', price=Decimal('600.00')) for index in range(28)
+        ]
+        # The first checkout of the day also creates the rollup row
+        self.checkout([(self.eggs, '1')])
+
+        def create(lines):
+            serializer = OrderCreateSerializer(data=self.order_payload(lines))
+            serializer.is_valid(raise_exception=True)
+            with CaptureQueriesContext(connection) as queries:
+                order = serializer.save()
+            return order, len(queries)
+
+        _, small = create([(self.broiler, '1')])
+        order, large = create([(product, '2') for product in products])
+
+        self.assertEqual(small, large)
+        self.assertEqual(order.items.count(), 30)
+        receipt = Receipt.objects.get(order=order)
+        self.assertEqual(receipt.items.count(), 30)
+        self.assertEqual(receipt.items.get(product_id=self.eggs.id).product_name, 'Eggs')
+
+    def test_unknown_product_rejects_the_order(self):
+        payload = self.order_payload([(self.broiler, '1')])
+        payload['items'].append({'product': '999999', 'quantity': '1', 'factor': '1'})
+
+        response = self.client.post('/api/sales/orders/create/', payload, format='json')
+
+        self.assertNotEqual(response.status_code, 201)
+        self.assertEqual(Order.objects.count(), 0)
+
+
+class ReceiptNumberTests(SalesAPITestCase):
+    day = date(2025, 3, 1)
+
+    def test_numbers_are_sequential_per_day(self):
+        self.assertEqual(next_receipt_number(self.day), 'RCPT-20250301-000001')
+        self.assertEqual(next_receipt_numbers(3, self.day), [
+            'RCPT-20250301-000002', 'RCPT-20250301-000003', 'RCPT-20250301-000004'
+        ])
+        self.assertEqual(next_receipt_number(date(2025, 3, 2)), 'RCPT-20250302-000001')
+
+    def test_counter_continues_after_existing_receipts(self):
+        order = self.make_order(self.day)
+        Receipt.objects.create(
+            order=order, customer=self.customer, customer_name=self.customer.name,
+            current_bill_amount=order.total, updated_balance=order.total,
+            receipt_number='RCPT-20250301-000041'
+        )
+
+        self.assertEqual(next_receipt_number(self.day), 'RCPT-20250301-000042')
+
+    def test_deleted_receipts_do_not_free_their_number(self):
+        first = self.checkout([(self.broiler, '1')])
+        Receipt.objects.filter(order_id=first.data['id']).delete()
+        second = self.checkout([(self.broiler, '1')])
+
+        self.assertNotEqual(first.data['receipt_number'], second.data['receipt_number'])
+
+    def test_issuing_a_number_does_not_scan_receipts(self):
+        next_receipt_number(self.day)
+        with CaptureQueriesContext(connection) as queries:
+            next_receipt_number(self.day)
+        self.assertFalse([q for q in queries if 'receipts' in q['sql']])
+
+
+class LedgerServiceTests(SalesAPITestCase):
+
+    def test_balance_change_returns_previous_and_updated_balance(self):
+        Client.objects.filter(pk=self.customer.pk).update(balance=Decimal('300.00'))
+
+        with CaptureQueriesContext(connection) as queries:
+            previous, updated = apply_balance_change(self.customer.id, Decimal('-120.50'))
+
+        self.assertEqual((previous, updated), (Decimal('300.00'), Decimal('179.50')))
+        update_sql = next(q['sql'] for q in queries if q['sql'].startswith('UPDATE "client"'))
+        self.assertNotIn('"name"', update_sql)
+
+    def test_unknown_client_is_rejected(self):
+        with self.assertRaises(Client.DoesNotExist):
+            apply_balance_change(999999, Decimal('10'))
+
+
+@override_settings(RECEIPT_MODE='inline')
+class BalanceConcurrencyTests(TransactionTestCase):
+    workers = 8
+    orders_per_worker = 5
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('needs a file test database (set POS_SQLITE_TEST_PATH) or PostgreSQL')
+
+    def test_parallel_checkouts_keep_the_balance_exact(self):
+        customer = Client.objects.create(name='Hotel Shalimar', balance=Decimal('1000.00'))
+        broiler = Item.objects.create(name='Broiler', price=Decimal('520.00'))
+        payload = {
+            'customer': str(customer.id),
+            'items': [{'product': str(broiler.id), 'quantity': '1', 'factor': '1'}],
+            'payment_amount': '20',
+            'payment_method': 'credit',
+            'payment_status': 'partial',
+            'total_amount': '520',
+            'balance_due': '500',
+        }
+        errors = []
+
+        def sell():
+            try:
+                for _ in range(self.orders_per_worker):
+                    serializer = OrderCreateSerializer(data=payload)
+                    serializer.is_valid(raise_exception=True)
+                    serializer.save()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=sell) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        customer.refresh_from_db()
+        checkouts = self.workers * self.orders_per_worker
+        self.assertEqual(customer.balance, Decimal('1000.00') + checkouts * Decimal('500.00'))
+        self.assertEqual(Receipt.objects.filter(customer=customer).count(), checkouts)
+
+    @override_settings(RECEIPT_MODE='async', RECEIPT_OUTBOX_POLL_SECONDS=0.05)
+    def test_outbox_worker_writes_receipts_after_commit(self):
+        customer = Client.objects.create(name='Hotel Shalimar', balance=Decimal('0'))
+        broiler = Item.objects.create(name='Broiler', price=Decimal('520.00'))
+        serializer = OrderCreateSerializer(data={
+            'customer': str(customer.id),
+            'items': [{'product': str(broiler.id), 'quantity': '1', 'factor': '1'}],
+            'payment_amount': '0',
+            'payment_method': 'credit',
+            'payment_status': 'unpaid',
+            'total_amount': '520',
+            'balance_due': '520',
+        })
+        serializer.is_valid(raise_exception=True)
+        order = serializer.save()
+
+        for _ in range(100):
+            if Receipt.objects.filter(order=order).exists():
+                break
+            time.sleep(0.05)
+        receipt = Receipt.objects.get(order=order)
+        self.assertEqual(receipt.updated_balance, Decimal('520.00'))
+        self.assertFalse(ReceiptOutbox.objects.exists())
+
+    def test_parallel_reprints_are_all_counted(self):
+        customer = Client.objects.create(name='Hotel Shalimar', balance=Decimal('0'))
+        order = Order.objects.create(client=customer, total=Decimal('520.00'))
+        receipt = Receipt.objects.create(
+            order=order,
+            customer=customer,
+            customer_name=customer.name,
+            current_bill_amount=Decimal('520.00'),
+            updated_balance=Decimal('520.00')
+        )
+        errors = []
+
+        def reprint():
+            try:
+                for _ in range(self.orders_per_worker):
+                    record_reprint(receipt.id)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=reprint) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        receipt.refresh_from_db()
+        self.assertEqual(receipt.reprint_count, self.workers * self.orders_per_worker)
+
+
+class CustomerLedgerTests(SalesAPITestCase):
+
+    def create_customer(self, starting_balance):
+        response = self.client.post('/api/customers/', {'name': 'Kabir Caterers', 'starting_balance': starting_balance})
+        self.assertEqual(response.status_code, 201)
+        return Client.objects.get(pk=response.data['id'])
+
+    def test_orders_and_adjustments_are_recorded_with_running_balance(self):
+        customer = self.create_customer('200.00')
+        self.checkout([(self.broiler, '2')], payment_amount='40', customer=customer)
+        self.checkout([(self.eggs, '10')], payment_amount='500', customer=customer)
+        self.client.patch(f'/api/customers/{customer.id}/', {'balance': '1000.00'})
+
+        entries = list(customer.ledger_entries.order_by('id'))
+        self.assertEqual(
+            [(e.entry_type, e.debit, e.credit, e.balance) for e in entries],
+            [
+                ('opening', Decimal('200.00'), Decimal('0.00'), Decimal('200.00')),
+                ('order', Decimal('1040.00'), Decimal('40.00'), Decimal('1200.00')),
+                ('order', Decimal('300.00'), Decimal('500.00'), Decimal('1000.00')),
+            ]
+        )
+        self.client.patch(f'/api/customers/{customer.id}/', {'balance': '900.00'})
+        customer.refresh_from_db()
+        last = customer.ledger_entries.order_by('-id').first()
+        self.assertEqual((last.entry_type, last.credit, last.balance), ('adjustment', Decimal('100.00'), Decimal('900.00')))
+        self.assertEqual(customer.balance, Decimal('900.00'))
+
+    def test_client_update_keeps_a_concurrent_checkout(self):
+        customer = self.create_customer('100.00')
+        stale = Client.objects.get(pk=customer.pk)
+        serializer = ClientSerializer(stale, data={'name': 'Kabir Caterers Ltd'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        # A checkout lands between the read and the save
+        apply_balance_change(customer.id, Decimal('250.00'), entry_type=LedgerEntry.ORDER)
+
+        serializer.save()
+
+        customer.refresh_from_db()
+        self.assertEqual((customer.name, customer.balance), ('Kabir Caterers Ltd', Decimal('350.00')))
+        self.assertEqual(customer.ledger_entries.order_by('-id').first().balance, customer.balance)
+
+    def test_balance_edit_is_posted_against_the_current_balance(self):
+        customer = self.create_customer('100.00')
+        stale = Client.objects.get(pk=customer.pk)
+        serializer = ClientSerializer(stale, data={'balance': '500.00'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        apply_balance_change(customer.id, Decimal('250.00'), entry_type=LedgerEntry.ORDER)
+
+        serializer.save()
+
+        customer.refresh_from_db()
+        last = customer.ledger_entries.order_by('-id').first()
+        self.assertEqual(customer.balance, Decimal('500.00'))
+        self.assertEqual((last.entry_type, last.debit, last.balance), ('adjustment', Decimal('150.00'), Decimal('500.00')))
+
+    def test_balance_is_read_only_in_the_admin(self):
+        admin_user = User.objects.create_superuser(username='owner', password='secret')
+        self.client.force_login(admin_user)
+
+        response = self.client.get(f'/admin/sales/client/{self.customer.pk}/change/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('name="balance"', response.content.decode())
+
+    def test_statement_and_balance_as_of_date(self):
+        customer = self.create_customer('0')
+        order = self.checkout([(self.broiler, '1')], customer=customer)
+        today = timezone.localdate()
+        LedgerEntry.objects.filter(client=customer).filter(
+            Q(order_id=order.data['id']) | Q(entry_type='opening')
+        ).update(timestamp=timezone.now() - timedelta(days=3))
+        self.checkout([(self.eggs, '2')], payment_amount='60', customer=customer)
+        self.checkout([(self.eggs, '1')], customer=customer)
+
+        before = self.client.get(f'/api/customers/{customer.id}/balance-as-of/', {
+            'date': (today - timedelta(days=2)).strftime('%Y-%m-%d')
+        })
+        with self.assertNumQueries(4):
+            statement = self.client.get(f'/api/customers/{customer.id}/statement/', {
+                'start_date': (today - timedelta(days=1)).strftime('%Y-%m-%d'),
+                'end_date': today.strftime('%Y-%m-%d'),
+            })
+
+        self.assertEqual(before.data['balance'], 520.0)
+        self.assertEqual(statement.data['opening_balance'], 520.0)
+        self.assertEqual(len(statement.data['entries']), 2)
+        self.assertEqual(statement.data['total_credit'], 60.0)
+        self.assertEqual(statement.data['closing_balance'], 550.0)
+
+    def test_checkpoints_mark_balances_and_report_drift(self):
+        customer = self.create_customer('50.00')
+        self.checkout([(self.eggs, '1')], customer=customer)
+        Client.objects.filter(pk=self.customer.pk).update(balance=Decimal('75.00'))
+
+        out = StringIO()
+        call_command('checkpoint_ledger', stdout=out)
+
+        checkpoint = customer.ledger_entries.order_by('-id').first()
+        self.assertEqual((checkpoint.entry_type, checkpoint.balance), ('checkpoint', Decimal('80.00')))
+        self.assertIn('Wrote 1 ledger checkpoints', out.getvalue())
+        self.assertNotIn(f'Client {customer.id}:', out.getvalue())
+
+    def test_balance_before_starts_from_the_last_checkpoint(self):
+        customer = self.create_customer('50.00')
+        self.checkout([(self.eggs, '1')], customer=customer)
+        call_command('checkpoint_ledger', stdout=StringIO())
+        apply_balance_change(customer.id, Decimal('20'))
+        # Entries before the checkpoint are no longer summed
+        LedgerEntry.objects.filter(client=customer, entry_type='opening').update(debit=Decimal('0'))
+
+        self.assertEqual(balance_before(customer.id, timezone.now() + timedelta(seconds=1)), Decimal('100.00'))
+
+    def test_ledgers_opened_by_the_migration_cover_earlier_dates(self):
+        open_client_ledgers = import_module('apps.sales.migrations.0009_ledgerentry').open_client_ledgers
+        self.make_order(date(2025, 1, 10))
+        self.make_order(date(2025, 2, 5), lines=1)
+        # 500 carried over from before the first order, plus the two orders
+        Client.objects.filter(pk=self.customer.pk).update(balance=Decimal('2140.00') + Decimal('500.00'))
+
+        open_client_ledgers(django_apps, None)
+
+        def balance_on(day):
+            return self.client.get(f'/api/customers/{self.customer.id}/balance-as-of/', {'date': day}).data['balance']
+
+        self.assertEqual(balance_on('2025-01-09'), 0.0)
+        self.assertEqual(balance_on('2025-01-10'), 1600.0)
+        self.assertEqual(balance_on('2025-02-05'), 2640.0)
+        statement = self.client.get(f'/api/customers/{self.customer.id}/statement/', {
+            'start_date': '2025-02-01', 'end_date': '2025-02-28'
+        }).data
+        self.assertEqual((statement['opening_balance'], statement['closing_balance']), (1600.0, 2640.0))
+        self.assertEqual(len(statement['entries']), 1)
+
+    def test_entries_are_stamped_when_posted(self):
+        entry = ledger_entry(LedgerEntry.ADJUSTMENT, debit=Decimal('10'))
+        entry.timestamp = timezone.now() - timedelta(hours=1)
+        posted_from = timezone.now()
+
+        post_entries(self.customer.id, [entry])
+
+        self.assertGreaterEqual(LedgerEntry.objects.get(pk=entry.pk).timestamp, posted_from)
+
+
+class ReceiptRenderingTests(SalesAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        order_id = self.checkout([(self.broiler, '3'), (self.eggs, '12')], payment_amount='500').data['id']
+        self.receipt = Receipt.objects.get(order_id=order_id)
+        self.url = f'/api/sales/receipts/{self.receipt.id}/'
+
+    def test_html_and_escpos_are_rendered_from_the_snapshot(self):
+        html = self.client.get(f'{self.url}render/')
+        escpos = self.client.get(f'{self.url}render/', {'output': 'escpos'})
+
+        self.assertEqual(html['Content-Type'], 'text/html; charset=utf-8')
+        self.assertIn(self.receipt.receipt_number, html.content.decode())
+        self.assertIn('<td>Broiler</td><td class=c>3</td><td class=r>520.00</td><td class=r>1560.00</td>', html.content.decode())
+        self.assertTrue(escpos.content.startswith(b'\x1b@'))
+        self.assertIn(b'PAID TODAY:', escpos.content)
+        self.assertTrue(escpos.content.endswith(b'\x1dVA\x03'))
+
+    def test_rendered_receipt_is_cached(self):
+        first = self.client.get(f'{self.url}render/', {'output': 'escpos'})
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(f'{self.url}render/', {'output': 'escpos'})
+
+        self.assertEqual(second.content, first.content)
+        self.assertFalse([q for q in queries if 'receipt' in q['sql']])
+
+    def test_rendered_receipts_use_their_own_bounded_cache(self):
+        locmem = 'django.core.cache.backends.locmem.LocMemCache'
+        with self.settings(CACHES={
+            'default': {'BACKEND': locmem, 'LOCATION': 'default'},
+            'receipts': {'BACKEND': locmem, 'LOCATION': 'receipts', 'TIMEOUT': 60, 'OPTIONS': {'MAX_ENTRIES': 10}},
+        }):
+            self.client.get(f'{self.url}render/')
+            key = receipt_cache_key(self.receipt.id, 'html')
+            self.assertIsNone(cache.get(key))
+            self.assertIsNotNone(caches['receipts'].get(key))
+
+    def test_reprint_is_a_cache_hit_plus_a_counter_bump(self):
+        self.client.get(f'{self.url}render/', {'output': 'escpos'})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'{self.url}reprint/?output=escpos')
+
+        receipt_queries = [q['sql'] for q in queries if 'receipt' in q['sql']]
+        self.assertEqual(len(receipt_queries), 1)
+        self.assertIn('RETURNING', receipt_queries[0])
+        self.assertEqual(response['X-Reprint-Count'], '1')
+        self.assertIn(b'REPRINT 1', response.content)
+
+        json_response = self.client.post(f'{self.url}reprint/')
+        self.assertEqual(json_response.data['reprint_count'], 2)
+
+    def test_reprint_count_without_update_returning(self):
+        with mock.patch('apps.sales.receipts.update_returning_supported', return_value=False):
+            self.client.post(f'{self.url}reprint/')
+            response = self.client.post(f'{self.url}reprint/')
+
+        self.assertEqual(response.data['reprint_count'], 2)
+
+    def test_reprints_can_be_audited(self):
+        with self.settings(RECEIPT_REPRINT_LOG=True):
+            self.client.post(f'{self.url}reprint/')
+            self.client.post(f'{self.url}reprint/')
+
+        logs = list(ReceiptReprintLog.objects.values_list('reprint_number', 'reprinted_by'))
+        self.assertEqual(logs, [(1, self.user.id), (2, self.user.id)])
+        self.assertEqual(self.client.post('/api/sales/receipts/999999/reprint/').status_code, 404)
+
+    def test_editing_a_receipt_drops_the_cached_copy(self):
+        self.client.get(f'{self.url}render/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.receipt.customer_name = 'Hotel Shalimar (Main)'
+            self.receipt.save()
+
+        self.assertIn('Hotel Shalimar (Main)', self.client.get(f'{self.url}render/').content.decode())
+        self.assertEqual(self.client.get(f'{self.url}render/', {'output': 'pdf'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/sales/receipts/999999/render/').status_code, 404)
+
+
+class LeanListTests(SalesAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.checkout([(self.broiler, '3.25'), (self.eggs, '12')], payment_amount='500')
+        self.checkout([(self.eggs, '30')], order_date='2025-03-02')
+        other = Client.objects.create(name='Cafe Lahore', balance=Decimal('0'))
+        self.checkout([(self.broiler, '1.5')], customer=other)
+        Receipt.objects.filter(order__client=other).update(reprint_count=2, last_reprinted_at=timezone.now())
+
+    def test_rows_match_the_serializers(self):
+        orders = Order.objects.order_by('-date', '-id')
+        receipts = Receipt.objects.order_by('-receipt_date', '-id')
+
+        self.assertEqual(order_rows(order_values(orders)), OrderSerializer(orders, many=True).data)
+        self.assertEqual(receipt_rows(receipt_values(receipts)), ReceiptSerializer(receipts, many=True).data)
+
+    def test_queued_receipts_match_and_need_no_query_per_order(self):
+        with self.settings(RECEIPT_MODE='async'):
+            for index in range(3):
+                self.checkout([(self.eggs, '1')], order_date=f'2025-03-1{index}')
+        orders = OrderViewSet.queryset.order_by('-date', '-id')
+
+        # Orders, their lines, the lines' products
+        with self.assertNumQueries(3):
+            data = OrderSerializer(orders, many=True).data
+
+        self.assertEqual(order_rows(order_values(orders)), data)
+        self.assertEqual(
+            [row['receipt_number'] for row in data[:3]],
+            list(ReceiptOutbox.objects.order_by('-order_id').values_list('receipt_number', flat=True))
+        )
+
+    def test_lists_use_a_fixed_number_of_queries(self):
+        for index in range(5):
+            self.checkout([(self.broiler, '1'), (self.eggs, '2')], order_date=f'2025-03-1{index}')
+
+        with CaptureQueriesContext(connection) as queries:
+            orders = self.client.get('/api/sales/orders/')
+            receipts = self.client.get('/api/sales/receipts/', {'customer_id': self.customer.id})
+            page = self.client.get('/api/sales/orders/', {'page_size': 3})
+
+        self.assertEqual(len(orders.data), 8)
+        self.assertEqual(len(receipts.data), 7)
+        self.assertEqual(len(page.data['results']), 3)
+        self.assertEqual(len(queries), 6)
+        first = next(row for row in orders.data if row['items'][0]['quantity'] == '3.25')
+        self.assertEqual(first['items'][0]['line_total'], '1690.00')
+        self.assertIsNotNone(first['receipt_number'])
+
+    def test_report_rows_are_built_from_values(self):
+        # Totals, orders, lines
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/sales/orders/reports/daily/', {'date': '2025-03-01'})
+
+        self.assertEqual(response.data['order_count'], 2)
+        first = response.data['orders'][0]
+        self.assertEqual(first['items'][0], {'name': 'Broiler', 'quantity': 3.25, 'price': 520.0, 'total': 1690.0})
+        self.assertEqual(first['items_count'], 2)
+
+
+class JSONRendererTests(SalesAPITestCase):
+    data = {
+        'amount': Decimal('1690.50'),
+        'day': date(2025, 3, 1),
+        'when': datetime(2025, 3, 1, 10, 30, tzinfo=dt_timezone.utc),
+        0: ['first error'],
+    }
+
+    def test_decimals_and_dates_are_encoded_natively(self):
+        for orjson in (renderers.orjson, None):
+            with mock.patch.object(renderers, 'orjson', orjson):
+                decoded = json.loads(renderers.FastJSONRenderer().render(self.data))
+            self.assertEqual(decoded['amount'], 1690.5)
+            self.assertEqual(decoded['day'], '2025-03-01')
+            self.assertTrue(decoded['when'].startswith('2025-03-01T10:30:00'))
+            self.assertEqual(decoded['0'], ['first error'])
+
+    def test_report_amounts_stay_json_numbers(self):
+        self.checkout([(self.broiler, '2'), (self.eggs, '5')], payment_amount='500')
+
+        response = self.client.get('/api/sales/orders/reports/daily/', {'date': '2025-03-01'})
+        decoded = json.loads(response.content)
+
+        self.assertEqual(decoded['total_sales'], 1190)
+        self.assertEqual(decoded['orders'][0]['items'][0], {'name': 'Broiler', 'quantity': 2, 'price': 520, 'total': 1040})
+        self.assertEqual(json.loads(self.client.get('/api/pricing/products/').content)[0]['price'], '520.00')
+
+
+class KeysetPaginationTests(SalesAPITestCase):
+
+    def walk(self, url, **params):
+        """Follow next links and return every id seen"""
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            if not response.data['next']:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_lists_are_unpaginated_unless_requested(self):
+        self.make_order(date(2025, 3, 1))
+        response = self.client.get('/api/sales/orders/')
+        self.assertIsInstance(response.data, list)
+
+    def test_orders_are_paged_on_date_and_id(self):
+        orders = [self.make_order(date(2025, 3, 1 + index % 3), lines=1) for index in range(11)]
+        expected = [o.id for o in sorted(orders, key=lambda o: (o.date, o.id), reverse=True)]
+
+        self.assertEqual(self.walk('/api/sales/orders/', page_size=4), expected)
+
+    def test_deep_pages_filter_instead_of_offset(self):
+        for index in range(6):
+            self.make_order(date(2025, 3, 1), lines=1)
+        first = self.client.get('/api/sales/orders/', {'page_size': 2})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first.data['next'])
+
+        page_sql = next(q['sql'] for q in queries if 'FROM "order"' in q['sql'])
+        self.assertNotIn('OFFSET', page_sql)
+
+    def test_clients_and_receipts_pages(self):
+        for name in ['Zubair', 'Asif', 'Bilal', 'Asif']:
+            Client.objects.create(name=name)
+        for _ in range(3):
+            self.checkout([(self.eggs, '1')])
+
+        client_ids = self.walk('/api/customers/', page_size=2)
+        names = [Client.objects.get(pk=pk).name for pk in client_ids]
+        self.assertEqual(names, sorted(names))
+        self.assertEqual(len(client_ids), 5)
+
+        receipt_ids = self.walk(f'/api/sales/receipts/by-customer/{self.customer.id}/', page_size=2)
+        self.assertEqual(receipt_ids, list(
+            Receipt.objects.order_by('-receipt_date', '-id').values_list('id', flat=True)
+        ))
+
+    def test_page_size_is_capped_and_bad_cursors_rejected(self):
+        response = self.client.get('/api/sales/orders/', {'page_size': 100000})
+        self.assertEqual(response.data['page_size'], 500)
+        self.assertEqual(self.client.get('/api/sales/orders/', {'cursor': 'not-a-cursor'}).status_code, 404)
+
+    def test_well_formed_cursors_of_the_wrong_shape_are_rejected(self):
+        for values in (5, 'x', {}, [], ['2025-03-01'], ['2025-03-01', 1, 2], [5, 1], [['2025-03-01'], 1],
+                       [None, 1], ['2025-03-01', None], ['2025-03-01', 'abc'], ['2025-13-45', '1']):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            response = self.client.get('/api/sales/orders/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, values)
+
+
+class QueryPlanTests(SalesAPITestCase):
+    """
+    EXPLAIN the main query behind each endpoint and fail when any table
+    is read with a full scan instead of an index.
+    """
+    start = date(2025, 3, 1)
+    end = date(2025, 3, 31)
+
+    def setUp(self):
+        super().setUp()
+        self.order = self.make_order(self.start)
+
+    def full_scans(self, queryset):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # Tiny test tables make sequential scans look cheapest
+                cursor.execute('SET enable_seqscan = off')
+            plan = queryset.explain()
+            return re.findall(r'Seq Scan on "?(\w+)"?', plan)
+        plan = queryset.explain()
+        # SCAN reads a whole table, or a whole index with USING (COVERING)
+        # INDEX; only a SEARCH seeks into the index
+        return [
+            match.group(0) for match in re.finditer(r'\bSCAN (\w+)[^\n]*', plan)
+            if match.group(1) != 'CONSTANT'
+        ]
+
+    def assertUsesIndexes(self, queryset):
+        self.assertEqual(self.full_scans(queryset), [], queryset.explain())
+
+    def test_full_index_scans_are_caught(self):
+        # Reads the whole (date, id) index: no filter to seek on
+        queryset = Order.objects.order_by('date', 'id').values('date', 'id')
+        self.assertNotEqual(self.full_scans(queryset), [])
+
+    def report_lines(self):
+        """The lines query listings.lines_for runs for the report rows"""
+        return OrderItem.objects.filter(order_id__in=[self.order.id]).order_by('order_id', 'id').values(
+            'order_id', *REPORT_LINE_FIELDS, **REPORT_LINE_EXPRESSIONS
+        )
+
+    def test_date_range_report(self):
+        orders = Order.objects.filter(date__gte=self.start, date__lte=self.end)
+        self.assertUsesIndexes(report_order_values(orders))
+        self.assertUsesIndexes(daily_totals(orders))
+        self.assertUsesIndexes(self.report_lines())
+
+    def test_daily_report(self):
+        self.assertUsesIndexes(report_order_values(Order.objects.filter(date=self.start)))
+        self.assertUsesIndexes(self.report_lines())
+
+    def test_order_list_filters(self):
+        self.assertUsesIndexes(
+            Order.objects.filter(client_id=self.customer.id, date__range=[self.start, self.end]).order_by('-date', '-id')
+        )
+        self.assertUsesIndexes(Order.objects.filter(payment_status='unpaid').order_by('-date'))
+        self.assertUsesIndexes(
+            Order.objects.filter(date__lt=self.end).order_by('-date', '-id')[:51]
+        )
+
+    def test_monthly_report_for_customer(self):
+        self.assertUsesIndexes(monthly_totals(Order.objects.filter(client_id=self.customer.id)))
+
+    def test_rollup_reports(self):
+        self.assertUsesIndexes(summary_queryset(self.start, self.end).values('date'))
+
+    def test_receipts_by_customer(self):
+        self.assertUsesIndexes(
+            Receipt.objects.filter(customer_id=self.customer.id).order_by('-receipt_date', '-id')[:51]
+        )
+
+    def test_customer_statement(self):
+        moment = timezone.now()
+        self.assertUsesIndexes(statement_entries(self.customer.id, moment - timedelta(days=30), moment))
+        self.assertUsesIndexes(
+            LedgerEntry.objects.filter(client_id=self.customer.id, timestamp__lt=moment).order_by('-timestamp', '-id')[:1]
+        )
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    RECEIPT_MODE='inline'
+)
+class SeedDataTests(APITestCase):
+    dataset = ['--clients', '3', '--items', '4', '--days', '3', '--orders-per-day', '2',
+               '--max-lines', '6', '--end-date', '2025-03-31']
+
+    def setUp(self):
+        cache.clear()
+
+    def test_seeded_history_is_consistent(self):
+        call_command('seed_data', *self.dataset, stdout=StringIO())
+
+        self.assertEqual(Client.objects.count(), 3)
+        self.assertEqual(Item.objects.count(), 4)
+        days = set(Order.objects.values_list('date', flat=True))
+        self.assertEqual(days, {date(2025, 3, 29), date(2025, 3, 30), date(2025, 3, 31)})
+        # Opening price plus one rate change per day
+        for item in Item.objects.all():
+            history = list(item.price_history.values_list('price', flat=True))
+            self.assertEqual(len(history), 4)
+            self.assertEqual(history[-1], item.price)
+        # Each order is billed at the rates of its own day
+        for line in OrderItem.objects.select_related('order'):
+            self.assertEqual(
+                line.price,
+                line.item.price_history.filter(
+                    effective_from__date__lte=line.order.date
+                ).last().price
+            )
+        for client in Client.objects.all():
+            ledger = LedgerEntry.objects.filter(client=client)
+            self.assertEqual(client.balance, sum((entry.debit - entry.credit for entry in ledger), Decimal('0')))
+        for receipt in Receipt.objects.select_related('order'):
+            self.assertEqual(timezone.localtime(receipt.receipt_date).date(), receipt.order.date)
+        self.assertEqual(
+            DailySalesSummary.objects.aggregate(orders=Sum('order_count'))['orders'],
+            Order.objects.count()
+        )
+
+    def test_same_seed_gives_same_data(self):
+        call_command('seed_data', *self.dataset, stdout=StringIO())
+        first = list(Order.objects.order_by('id').values_list('total', 'payment_status'))
+        Order.objects.all().delete()
+        Client.objects.all().delete()
+        Item.objects.all().delete()
+
+        call_command('seed_data', *self.dataset, stdout=StringIO())
+
+        self.assertEqual(list(Order.objects.order_by('id').values_list('total', 'payment_status')), first)
+
+    def test_benchmark_baseline_and_compare(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, 'baseline.json')
+            call_command('bench_endpoints', *self.dataset, '--repeat', '1', '--save', baseline, stdout=StringIO())
+
+            with open(baseline) as handle:
+                report = json.load(handle)
+            self.assertEqual(set(report['results']), {
+                'checkout', 'report_daily', 'report_date_range', 'report_monthly',
+                'customer_balances', 'receipts_page', 'receipts_by_customer', 'products'
+            })
+            # The benchmark data is rolled back
+            self.assertFalse(Order.objects.exists())
+
+            out = StringIO()
+            call_command(
+                'bench_endpoints', *self.dataset, '--repeat', '1', '--compare', baseline,
+                '--tolerance', '1000', stdout=out
+            )
+            self.assertIn('No regressions', out.getvalue())
+
+            report['results']['report_daily']['queries'] -= 1
+            with open(baseline, 'w') as handle:
+                json.dump(report, handle)
+            with self.assertRaisesMessage(CommandError, 'report_daily: queries'):
+                call_command(
+                    'bench_endpoints', *self.dataset, '--repeat', '1', '--compare', baseline,
+                    '--tolerance', '1000', stdout=StringIO()
+                )
+
+
+@override_settings(RECEIPT_MODE='async')
+class ReceiptOutboxTests(SalesAPITestCase):
+
+    def test_checkout_queues_the_receipt(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.checkout([(self.broiler, '2')], payment_amount='40')
+
+        order = Order.objects.get(pk=response.data['id'])
+        entry = ReceiptOutbox.objects.get(order=order)
+        self.assertFalse(Receipt.objects.exists())
+        self.assertEqual(response.data['receipt_number'], entry.receipt_number)
+        self.assertIsNone(response.data['receipt_id'])
+        self.assertIn(wake_worker, callbacks)
+
+    def test_checkout_skips_the_receipt_writes(self):
+        payload = self.order_payload([(self.broiler, '1'), (self.eggs, '2')])
+        self.checkout([(self.eggs, '1')])
+
+        def create():
+            serializer = OrderCreateSerializer(data=payload)
+            serializer.is_valid(raise_exception=True)
+            with CaptureQueriesContext(connection) as queries:
+                serializer.save()
+            return len(queries)
+
+        queued = create()
+        with self.settings(RECEIPT_MODE='inline'):
+            inline = create()
+
+        self.assertLess(queued, inline)
+
+    def test_drain_writes_the_same_snapshot_as_inline(self):
+        apply_balance_change(self.customer.id, Decimal('300'))
+        queued = self.checkout([(self.broiler, '2'), (self.eggs, '3')], payment_amount='100')
+        # A later checkout must not leak into the first receipt's balances
+        self.checkout([(self.eggs, '1')])
+        reserved = ReceiptOutbox.objects.get(order_id=queued.data['id']).receipt_number
+
+        self.assertEqual(drain_outbox(), (2, 0))
+
+        receipt = Receipt.objects.get(order_id=queued.data['id'])
+        self.assertEqual(receipt.receipt_number, reserved)
+        self.assertEqual(receipt.previous_balance, Decimal('300.00'))
+        self.assertEqual(receipt.current_bill_amount, Decimal('1130.00'))
+        self.assertEqual(receipt.this_bill_balance, Decimal('1030.00'))
+        self.assertEqual(receipt.updated_balance, Decimal('1330.00'))
+        self.assertEqual(
+            list(receipt.items.order_by('id').values_list('product_name', 'quantity', 'total')),
+            [('Broiler', Decimal('2.00'), Decimal('1040.00')), ('Eggs', Decimal('3.00'), Decimal('90.00'))]
+        )
+        self.assertFalse(ReceiptOutbox.objects.exists())
+
+    def test_failures_are_retried_then_left_for_reconcile(self):
+        response = self.checkout([(self.broiler, '1')])
+        order_id = response.data['id']
+
+        with mock.patch('apps.sales.outbox.build_receipt', side_effect=RuntimeError('printer spooler down')):
+            self.assertEqual(drain_outbox(), (0, 1))
+        entry = ReceiptOutbox.objects.get(order_id=order_id)
+        self.assertEqual(entry.attempts, 1)
+        self.assertIn('printer spooler down', entry.last_error)
+        self.assertGreater(entry.available_at, timezone.now())
+        # Not due again until the retry delay has passed
+        self.assertEqual(drain_outbox(), (0, 0))
+
+        ReceiptOutbox.objects.filter(pk=entry.pk).update(attempts=8, available_at=timezone.now())
+        self.assertEqual(drain_outbox(), (0, 0))
+
+        out = StringIO()
+        call_command('reconcile_receipts', stdout=out)
+        self.assertIn('0 queued, 1 failed, 0 without an outbox row', out.getvalue())
+
+        call_command('reconcile_receipts', '--fix', stdout=StringIO())
+        self.assertEqual(Receipt.objects.get(order_id=order_id).receipt_number, entry.receipt_number)
+        self.assertFalse(ReceiptOutbox.objects.exists())
+
+    def test_receipt_number_collision_is_recorded_on_the_outbox_row(self):
+        first = self.checkout([(self.broiler, '1')])
+        second = self.checkout([(self.eggs, '1')])
+        taken = ensure_receipt(first.data['id']).receipt_number
+        # The second order's reserved number is already on a receipt
+        ReceiptOutbox.objects.filter(order_id=second.data['id']).update(receipt_number=taken)
+
+        with self.assertLogs('apps.sales.outbox', 'ERROR'):
+            self.assertEqual(drain_outbox(), (0, 1))
+
+        entry = ReceiptOutbox.objects.get(order_id=second.data['id'])
+        self.assertEqual(entry.attempts, 1)
+        self.assertIn('IntegrityError', entry.last_error)
+        self.assertFalse(Receipt.objects.filter(order_id=second.data['id']).exists())
+
+    def test_orders_without_an_outbox_row_are_found(self):
+        order = self.make_order(date(2025, 3, 1))
+
+        out = StringIO()
+        call_command('reconcile_receipts', '--fix', stdout=out)
+
+        self.assertIn('0 queued, 0 failed, 1 without an outbox row', out.getvalue())
+        self.assertTrue(Receipt.objects.filter(order=order).exists())
+
+    def test_by_order_reports_a_pending_receipt(self):
+        response = self.checkout([(self.broiler, '1')])
+        reserved = response.data['receipt_number']
+
+        with mock.patch('apps.sales.outbox.wake_worker') as wake:
+            pending = self.client.get(f"/api/sales/receipts/by-order/{response.data['id']}/")
+
+        self.assertEqual(pending.status_code, 202)
+        self.assertEqual((pending.data['status'], pending.data['receipt_number']), ('pending', reserved))
+        self.assertTrue(ReceiptOutbox.objects.exists())
+        self.assertFalse(Receipt.objects.exists())
+        wake.assert_called_once_with()
+        self.assertEqual(self.client.get('/api/sales/receipts/by-order/999999/').status_code, 404)
+
+    def test_issue_writes_a_pending_receipt(self):
+        response = self.checkout([(self.broiler, '1')])
+
+        issued = self.client.post(f"/api/sales/receipts/by-order/{response.data['id']}/issue/")
+
+        self.assertEqual(issued.status_code, 200)
+        self.assertEqual(issued.data['receipt_number'], response.data['receipt_number'])
+        self.assertFalse(ReceiptOutbox.objects.exists())
+        receipt = self.client.get(f"/api/sales/receipts/by-order/{response.data['id']}/")
+        self.assertEqual((receipt.status_code, receipt.data['id']), (200, issued.data['id']))
+        self.assertEqual(self.client.post('/api/sales/receipts/by-order/999999/issue/').status_code, 404)
+
+    def test_drain_command(self):
+        self.checkout([(self.broiler, '1')])
+
+        out = StringIO()
+        call_command('drain_receipt_outbox', stdout=out)
+
+        self.assertIn('Wrote 1 receipts, 0 failed', out.getvalue())
+        self.assertEqual(Receipt.objects.count(), 1)
+
+
+class AsyncViewTests(SalesAPITestCase):
+    """The async endpoints return exactly what their DRF counterparts do"""
+
+    def setUp(self):
+        super().setUp()
+        token = RefreshToken.for_user(self.user).access_token
+        self.auth = {'AUTHORIZATION': f'Bearer {token}'}
+        self.day = date(2025, 3, 1)
+        self.make_order(self.day)
+        self.make_order(self.day, lines=3)
+        self.make_order(self.day + timedelta(days=2), lines=1)
+        self.checkout([(self.broiler, '1')], payment_amount='100', order_date='2025-03-02')
+
+    async def assertSamePayload(self, sync_url, async_url, params=None):
+        response = await self.async_client.get(async_url, params or {}, headers=self.auth)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        expected = await sync_to_async(self.client.get)(sync_url, params or {})
+        self.assertEqual(expected.status_code, 200)
+        self.assertEqual(json.loads(response.content), json.loads(expected.content))
+        return response
+
+    async def test_daily_report(self):
+        for params in ({'date': '2025-03-01'}, {'date': '2025-03-01', 'detail': 'false'},
+                       {'date': '2025-03-02', 'customer': str(self.customer.id)}):
+            await self.assertSamePayload(
+                '/api/sales/orders/reports/daily/', '/api/sales/async/reports/daily/', params
+            )
+
+    async def test_date_range_report(self):
+        for detail in ('true', 'false'):
+            await self.assertSamePayload(
+                '/api/sales/orders/reports/date-range/', '/api/sales/async/reports/date-range/',
+                {'start_date': '2025-03-01', 'end_date': '2025-03-05', 'detail': detail}
+            )
+
+        response = await self.async_client.get('/api/sales/async/reports/date-range/', headers=self.auth)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_customer_balances(self):
+        for params in ({}, {'sort': 'balance', 'order': 'desc'}):
+            await self.assertSamePayload('/api/customers/balances/', '/api/sales/async/customers/balances/', params)
+
+    async def test_receipt_by_order(self):
+        order_id = await Receipt.objects.values_list('order_id', flat=True).afirst()
+        await self.assertSamePayload(
+            f'/api/sales/receipts/by-order/{order_id}/', f'/api/sales/async/receipts/by-order/{order_id}/'
+        )
+
+        response = await self.async_client.get('/api/sales/async/receipts/by-order/999999/', headers=self.auth)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_receipt_by_order_reports_a_pending_receipt(self):
+        with self.settings(RECEIPT_MODE='async'):
+            response = await sync_to_async(self.checkout)([(self.eggs, '2')])
+        order_id = response.data['id']
+
+        with mock.patch('apps.sales.outbox.wake_worker'):
+            receipt = await self.async_client.get(f'/api/sales/async/receipts/by-order/{order_id}/', headers=self.auth)
+
+        self.assertEqual(receipt.status_code, 202)
+        self.assertEqual(json.loads(receipt.content)['receipt_number'], response.data['receipt_number'])
+        self.assertFalse(await Receipt.objects.filter(order_id=order_id).aexists())
+
+    async def test_requires_a_token(self):
+        response = await self.async_client.get('/api/sales/async/customers/balances/')
+        self.assertEqual(response.status_code, 401)
+
+        response = await self.async_client.get(
+            '/api/sales/async/customers/balances/', headers={'AUTHORIZATION': 'Bearer not-a-token'}
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(json.loads(response.content)['code'], 'token_not_valid')
+
+    async def test_profiled_in_async_mode(self):
+        response = await self.async_client.get(
+            '/api/sales/async/reports/daily/', {'date': '2025-03-01'}, headers=self.auth
+        )
+
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+
+class ReportExportTests(SalesAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.other = Client.objects.create(name='Karahi House')
+        self.first = self.make_order(date(2025, 3, 1), lines=2)
+        self.second = self.make_order(date(2025, 3, 2), lines=3, customer=self.other)
+        self.make_order(date(2025, 3, 5), lines=1)
+
+    def queue(self, **filters):
+        payload = {'start_date': '2025-03-01', 'end_date': '2025-03-02', **filters}
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post('/api/sales/exports/', payload, format='json')
+        self.assertEqual(response.status_code, 202, response.data)
+        self.assertIn(wake_export_worker, callbacks)
+        return response.data['id']
+
+    def download(self, job_id):
+        response = self.client.get(f'/api/sales/exports/{job_id}/download/')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_queued_job_is_pending(self):
+        job_id = self.queue()
+
+        response = self.client.get(f'/api/sales/exports/{job_id}/')
+
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(response.data['progress'], 0)
+        self.assertIsNone(response.data['download_url'])
+        self.assertEqual(self.client.get(f'/api/sales/exports/{job_id}/download/').status_code, 409)
+
+    def test_csv_export_has_one_row_per_line(self):
+        job_id = self.queue()
+
+        run_export_job(job_id)
+
+        response = self.client.get(f'/api/sales/exports/{job_id}/')
+        self.assertEqual(response.data['status'], 'done')
+        self.assertEqual(response.data['progress'], 100)
+        self.assertEqual((response.data['rows_total'], response.data['rows_written']), (5, 5))
+        self.assertTrue(response.data['download_url'].endswith(f'/api/sales/exports/{job_id}/download/'))
+
+        rows = self.download(job_id).splitlines()
+        self.assertEqual(rows[0].split(',')[:3], ['Order ID', 'Date', 'Customer'])
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1].split(',')[:4], [str(self.first.id), '2025-03-01', 'Hotel Shalimar', 'Broiler'])
+        self.assertEqual({row.split(',')[0] for row in rows[1:]}, {str(self.first.id), str(self.second.id)})
+
+    def test_customer_filter(self):
+        job_id = self.queue(customer=self.other.id)
+
+        run_export_job(job_id)
+
+        rows = self.download(job_id).splitlines()[1:]
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(row.split(',')[2] == 'Karahi House' for row in rows))
+
+    def test_progress_is_saved_per_chunk(self):
+        job_id = self.queue()
+
+        with self.settings(REPORT_EXPORT_CHUNK_SIZE=2), CaptureQueriesContext(connection) as queries:
+            run_export_job(job_id)
+
+        progress = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE "report_export_jobs" SET "rows_written"')
+        ]
+        self.assertEqual(len(progress), 2)
+        self.assertEqual(ReportExportJob.objects.get(pk=job_id).rows_written, 5)
+
+    def test_job_runs_once(self):
+        job_id = self.queue()
+
+        self.assertIsNotNone(run_export_job(job_id))
+        self.assertIsNone(run_export_job(job_id))
+
+    def test_failed_job_leaves_no_file(self):
+        job_id = self.queue()
+
+        with mock.patch('apps.sales.exports.CSVWriter.write', side_effect=OSError('disk full')), \
+                self.assertLogs('apps.sales.exports', 'ERROR'):
+            job = run_export_job(job_id)
+
+        self.assertEqual(job.status, ReportExportJob.FAILED)
+        self.assertIn('disk full', job.error)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'exports')), [])
+
+    def test_invalid_filters(self):
+        response = self.client.post(
+            '/api/sales/exports/', {'start_date': '2025-03-02', 'end_date': '2025-03-01'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+        with mock.patch('apps.sales.exports.openpyxl', None):
+            response = self.client.post(
+                '/api/sales/exports/',
+                {'start_date': '2025-03-01', 'end_date': '2025-03-02', 'file_format': 'xlsx'},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('file_format', response.data)
+
+    def test_jobs_are_private_to_their_user(self):
+        job_id = self.queue()
+        run_export_job(job_id)
+
+        self.client.force_authenticate(User.objects.create_user(username='other-cashier'))
+        self.assertEqual(self.client.get(f'/api/sales/exports/{job_id}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/sales/exports/{job_id}/download/').status_code, 404)
+
+        self.client.force_authenticate(User.objects.create_user(username='manager', is_staff=True))
+        self.assertEqual(self.client.get(f'/api/sales/exports/{job_id}/').status_code, 200)
@@ -1,12 +1,21 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ClientViewSet, OrderViewSet, ReceiptViewSet, receipt_view
+from . import async_views
+from .views import OrderViewSet, ReceiptViewSet, ReportExportViewSet, receipt_view
 
 router = DefaultRouter()
 router.register(r'orders', OrderViewSet, basename='order')
 router.register(r'receipts', ReceiptViewSet, basename='receipt')  # Add this line
+router.register(r'exports', ReportExportViewSet, basename='report-export')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('receipt/', receipt_view, name='receipt'),  # Legacy endpoint
+
+    # Async (ASGI) versions of the read-only reports and lookups, so long
+    # report queries do not tie up a worker; same payloads as the DRF views
+    path('async/reports/daily/', async_views.daily_report, name='async-daily-report'),
+    path('async/reports/date-range/', async_views.date_range_report, name='async-date-range-report'),
+    path('async/customers/balances/', async_views.customer_balances, name='async-customer-balances'),
+    path('async/receipts/by-order/<int:order_id>/', async_views.receipt_by_order, name='async-receipt-by-order'),
 ]
\ No newline at end of file
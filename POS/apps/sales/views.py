@@ -3,21 +3,61 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, Count
-from django.db.models.functions import TruncDate, TruncMonth
-from datetime import datetime, date
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from datetime import datetime, date, time, timedelta
+from decimal import Decimal
 from django.db import transaction
-from django.shortcuts import get_object_or_404
+import logging
 
-from .models import Client, Order, OrderItem, Receipt, ReceiptItem
+from apps.sync.versions import changes_since
+from .models import Client, Order, Receipt, ReportExportJob
 from .serializers import (
     ClientSerializer,
     OrderSerializer,
     OrderCreateSerializer,
+    OrderBulkCreateSerializer,
     ReceiptSerializer,
     ReceiptCreateSerializer,
-    ReceiptReprintSerializer
+    ReportExportJobSerializer,
+    ReportExportCreateSerializer
 )
+from .balances import customer_balances_snapshot
+from .exports import wake_export_worker
+from .ledger import balance_before, statement_entries
+from .listings import order_values, order_rows, receipt_values, receipt_rows
+from .outbox import ensure_receipt, pending_receipt
+from .receipts import RECEIPT_FORMATS, escpos_trailer, record_reprint, rendered_receipt
+from .rollups import order_key, refresh_summaries
+from .reports import (
+    serialize_orders,
+    order_totals,
+    build_daily_breakdown,
+    monthly_totals,
+    stream_monthly_report,
+    summary_queryset,
+    summary_totals,
+    summary_daily_breakdown,
+    summary_monthly_totals
+)
+
+logger = logging.getLogger(__name__)
+
+MONTHLY_REPORT_PAGE_SIZE = 50
+MONTHLY_REPORT_MAX_PAGE_SIZE = 500
+
+
+def start_of_day(day):
+    """Aware datetime for midnight at the start of `day` in the shop's timezone"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def wants_detail(request):
+    """
+    Reports include order/item detail unless ?detail=false is passed.
+    Takes a DRF request or a plain (async view) HttpRequest.
+    """
+    params = getattr(request, 'query_params', request.GET)
+    return params.get('detail', 'true').lower() not in ('0', 'false', 'no')
 
 
 class ReceiptViewSet(viewsets.ModelViewSet):
@@ -25,6 +65,7 @@ class ReceiptViewSet(viewsets.ModelViewSet):
     queryset = Receipt.objects.all().select_related('order', 'customer').prefetch_related('items')
     serializer_class = ReceiptSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-receipt_date', '-id')
     
     def get_queryset(self):
         """Filter receipts based on query parameters"""
@@ -53,46 +94,127 @@ class ReceiptViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def list(self, request, *args, **kwargs):
+        """Receipt list read with values() instead of ReceiptSerializer"""
+        return self.lean_list(self.filter_queryset(self.get_queryset()))
+    
+    def lean_list(self, receipts):
+        rows = receipt_values(receipts)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(receipt_rows(page))
+        return Response(receipt_rows(rows))
+    
     @action(detail=True, methods=['post'], url_path='reprint')
     def reprint(self, request, pk=None):
-        """Increment reprint count for a receipt"""
+        """
+        Increment reprint count for a receipt
+        Query params:
+        - output: 'html' or 'escpos' to get the rendered receipt back (optional)
+        """
+        output = request.query_params.get('output')
+        if output and output not in RECEIPT_FORMATS:
+            return Response(
+                {'error': f"Invalid output. Use one of: {', '.join(RECEIPT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            receipt_id = int(pk)
+        except ValueError:
+            return Response({'error': 'Receipt not found'}, status=status.HTTP_404_NOT_FOUND)
+        
         try:
-            receipt = self.get_object()
-            receipt.reprint_count += 1
-            receipt.last_reprinted_at = timezone.now()
-            receipt.save()
+            # One UPDATE ... RETURNING; the receipt itself is not loaded or re-saved
+            reprint = record_reprint(receipt_id, request.user)
+            if reprint is None:
+                return Response({'error': 'Receipt not found'}, status=status.HTTP_404_NOT_FOUND)
+            reprint_count, last_reprinted_at = reprint
+            
+            if output:
+                content_type = RECEIPT_FORMATS[output][0]
+                content = rendered_receipt(pk, output)
+                if output == 'escpos':
+                    content += escpos_trailer(reprint_count)
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Reprint-Count'] = str(reprint_count)
+                return response
             
             return Response({
                 'message': 'Receipt reprinted successfully',
-                'reprint_count': receipt.reprint_count,
-                'last_reprinted_at': receipt.last_reprinted_at
+                'reprint_count': reprint_count,
+                'last_reprinted_at': last_reprinted_at
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
-            print(f"Error in reprint: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error in reprint")
             return Response({
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=True, methods=['get'], url_path='render')
+    def render_receipt(self, request, pk=None):
+        """
+        Rendered receipt, cached after the first request
+        Query params:
+        - output: 'html' or 'escpos' (default: 'html')
+        """
+        output = request.query_params.get('output', 'html')
+        if output not in RECEIPT_FORMATS:
+            return Response(
+                {'error': f"Invalid output. Use one of: {', '.join(RECEIPT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            content = rendered_receipt(pk, output)
+        except (Receipt.DoesNotExist, ValueError):
+            return Response({'error': 'Receipt not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        if output == 'escpos':
+            content += escpos_trailer()
+        return HttpResponse(content, content_type=RECEIPT_FORMATS[output][0])
+    
     @action(detail=False, methods=['get'], url_path='by-order/(?P<order_id>\d+)')
     def by_order(self, request, order_id=None):
-        """Get receipt for a specific order"""
+        """
+        Get receipt for a specific order. A receipt the outbox has not
+        written yet answers 202 with its reserved number; POST to
+        by-order/<order_id>/issue/ to have it written right away.
+        """
         try:
             # Try to get receipt by order ID
-            receipt = Receipt.objects.get(order_id=order_id)
+            receipt = Receipt.objects.filter(order_id=order_id).first()
+            if receipt is None:
+                pending = pending_receipt(order_id)
+                if pending is not None:
+                    return Response(pending, status=status.HTTP_202_ACCEPTED)
+                return Response(
+                    {'error': 'Receipt not found for this order'}, 
+                    status=status.HTTP_404_NOT_FOUND
+                )
             serializer = self.get_serializer(receipt)
             return Response(serializer.data)
-        except Receipt.DoesNotExist:
+        except Exception as e:
+            logger.exception("Error in by_order")
             return Response(
-                {'error': 'Receipt not found for this order'}, 
-                status=status.HTTP_404_NOT_FOUND
+                {'error': str(e)}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+    
+    @action(detail=False, methods=['post'], url_path='by-order/(?P<order_id>\d+)/issue')
+    def issue_for_order(self, request, order_id=None):
+        """
+        Write an order's receipt now instead of waiting for the outbox
+        worker (or one it gave up on); an existing receipt is returned as is
+        """
+        try:
+            receipt = ensure_receipt(order_id)
+            if receipt is None:
+                return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(self.get_serializer(receipt).data)
         except Exception as e:
-            print(f"Error in by_order: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error in issue_for_order")
             return Response(
                 {'error': str(e)}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -109,14 +231,7 @@ class ReceiptViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        receipts = self.get_queryset().filter(customer=customer)
-        page = self.paginate_queryset(receipts)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        
-        serializer = self.get_serializer(receipts, many=True)
-        return Response(serializer.data)
+        return self.lean_list(self.get_queryset().filter(customer=customer))
     
     @action(detail=False, methods=['post'], url_path='create-from-order')
     def create_from_order(self, request):
@@ -127,7 +242,7 @@ class ReceiptViewSet(viewsets.ModelViewSet):
                 receipt = serializer.save()
                 return Response(ReceiptSerializer(receipt).data, status=status.HTTP_201_CREATED)
             except Exception as e:
-                print(f"Error creating receipt: {e}")
+                logger.exception("Error creating receipt")
                 return Response(
                     {'error': str(e)}, 
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -140,6 +255,7 @@ class ClientViewSet(viewsets.ModelViewSet):
     queryset = Client.objects.all().order_by('name')
     serializer_class = ClientSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('name', 'id')
     
     @action(detail=False, methods=['get'], url_path='balances')
     def customer_balances(self, request):
@@ -150,62 +266,126 @@ class ClientViewSet(viewsets.ModelViewSet):
         - order: 'asc' or 'desc' (default: 'asc')
         """
         try:
-            # Get all customers
-            customers = Client.objects.all()
-            
-            # Apply sorting
             sort_by = request.query_params.get('sort', 'name')
             order = request.query_params.get('order', 'asc')
             
-            if sort_by == 'balance':
-                if order == 'desc':
-                    customers = customers.order_by('-balance')
-                else:
-                    customers = customers.order_by('balance')
-            else:  # sort by name
-                if order == 'desc':
-                    customers = customers.order_by('-name')
-                else:
-                    customers = customers.order_by('name')
-            
-            # Calculate total balance
-            total_balance = customers.aggregate(total=Sum('balance'))['total'] or 0
-            
-            # Get customer data
-            customer_data = []
-            for customer in customers:
-                customer_data.append({
-                    'id': customer.id,
-                    'name': customer.name,
-                    'balance': float(customer.balance),
-                    'order_count': customer.orders.count(),
-                    'last_order_date': customer.orders.order_by('-date').first().date if customer.orders.exists() else None
-                })
-            
-            return Response({
-                'customers': customer_data,
-                'total_balance': float(total_balance),
-                'count': len(customer_data),
-                'positive_balance_count': len([c for c in customer_data if c['balance'] > 0]),
-                'negative_balance_count': len([c for c in customer_data if c['balance'] < 0]),
-                'zero_balance_count': len([c for c in customer_data if c['balance'] == 0])
-            })
+            # One annotated query plus one aggregate, cached until a client
+            # or order changes
+            return Response(customer_balances_snapshot(sort_by, order))
             
         except Exception as e:
-            print(f"Error in customer_balances: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error in customer_balances")
             return Response(
                 {'error': f'Internal server error: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+    
+    @action(detail=False, methods=['get'], url_path='delta')
+    def delta(self, request):
+        """
+        Customers created, changed (including balance) or deleted after a sync version
+        Query params:
+        - since: version from the previous delta response (omit for a full sync)
+        """
+        since = request.query_params.get('since')
+        try:
+            since = int(since) if since else None
+        except ValueError:
+            return Response(
+                {'error': 'since must be a version number'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        changes = changes_since(Client.objects.all().order_by('name'), since)
+        changes['changed'] = ClientSerializer(changes['changed'], many=True).data
+        return Response(changes)
+    
+    @action(detail=True, methods=['get'], url_path='statement')
+    def statement(self, request, pk=None):
+        """
+        Account statement from the customer ledger
+        Query params:
+        - start_date: YYYY-MM-DD (required)
+        - end_date: YYYY-MM-DD (required)
+        """
+        customer = self.get_object()
+        try:
+            start = datetime.strptime(request.query_params.get('start_date', ''), '%Y-%m-%d').date()
+            end = datetime.strptime(request.query_params.get('end_date', ''), '%Y-%m-%d').date()
+        except ValueError:
+            return Response(
+                {'error': 'start_date and end_date are required. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        range_start = start_of_day(start)
+        range_end = start_of_day(end + timedelta(days=1))
+        opening_balance = balance_before(customer.id, range_start)
+        
+        entries = []
+        closing_balance = opening_balance
+        total_debit = Decimal('0')
+        total_credit = Decimal('0')
+        for entry in statement_entries(customer.id, range_start, range_end):
+            entries.append({
+                'id': entry.id,
+                'timestamp': entry.timestamp,
+                'entry_type': entry.entry_type,
+                'order_id': entry.order_id,
+                'order_date': entry.order.date.strftime('%Y-%m-%d') if entry.order else None,
+                'description': entry.description,
+                'debit': entry.debit,
+                'credit': entry.credit,
+                'balance': entry.balance
+            })
+            total_debit += entry.debit
+            total_credit += entry.credit
+            closing_balance = entry.balance
+        
+        return Response({
+            'customer_id': customer.id,
+            'customer_name': customer.name,
+            'start_date': start.strftime('%Y-%m-%d'),
+            'end_date': end.strftime('%Y-%m-%d'),
+            'opening_balance': opening_balance,
+            'total_debit': total_debit,
+            'total_credit': total_credit,
+            'closing_balance': closing_balance,
+            'entries': entries
+        })
+    
+    @action(detail=True, methods=['get'], url_path='balance-as-of')
+    def balance_as_of(self, request, pk=None):
+        """
+        Customer balance at the end of a day
+        Query params:
+        - date: YYYY-MM-DD (default: today)
+        """
+        customer = self.get_object()
+        date_str = request.query_params.get('date')
+        try:
+            as_of = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else timezone.localdate()
+        except ValueError:
+            return Response(
+                {'error': 'Invalid date format. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        balance = balance_before(customer.id, start_of_day(as_of + timedelta(days=1)))
+        return Response({
+            'customer_id': customer.id,
+            'customer_name': customer.name,
+            'date': as_of.strftime('%Y-%m-%d'),
+            'balance': balance
+        })
 
 
 class OrderViewSet(viewsets.ModelViewSet):
     """ViewSet for Order operations"""
-    queryset = Order.objects.all().select_related('client').prefetch_related('items')
+    queryset = Order.objects.all().select_related('client', 'receipt', 'receipt_outbox').prefetch_related('items__item')
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-date', '-id')
     
     def get_queryset(self):
         """Filter orders based on query parameters"""
@@ -229,6 +409,33 @@ class OrderViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def list(self, request, *args, **kwargs):
+        """Order list read with values() instead of OrderSerializer"""
+        rows = order_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(order_rows(page))
+        return Response(order_rows(rows))
+    
+    def perform_create(self, serializer):
+        """Count an order created here (without checkout) in the daily rollup"""
+        with transaction.atomic():
+            order = serializer.save()
+            refresh_summaries([order_key(order)])
+    
+    def perform_update(self, serializer):
+        """Keep the daily rollup in step with the edited order"""
+        with transaction.atomic():
+            before = order_key(serializer.instance)
+            order = serializer.save()
+            refresh_summaries([before, order_key(order)])
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            key = order_key(instance)
+            instance.delete()
+            refresh_summaries([key])
+    
     @action(detail=False, methods=['post'], url_path='create')
     def create_order(self, request):
         """Create a new order with items"""
@@ -241,13 +448,56 @@ class OrderViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_201_CREATED
                 )
             except Exception as e:
-                print(f"Error creating order: {e}")
+                logger.exception("Error creating order")
                 return Response(
                     {'error': str(e)},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'], url_path='bulk-create')
+    def bulk_create_orders(self, request):
+        """
+        Create a batch of orders in one request.
+        Body: a list of order payloads (same format as orders/create/),
+        or {"orders": [...]}. Reports success or failure per order.
+        """
+        if isinstance(request.data, list):
+            payloads = request.data
+        elif isinstance(request.data, dict):
+            payloads = request.data.get('orders')
+        else:
+            return Response(
+                {'error': 'Expected a list of orders or {"orders": [...]}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = OrderBulkCreateSerializer(data={'orders': payloads})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            results = serializer.save()
+        except Exception as e:
+            logger.exception("Error creating orders in bulk")
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        created = len([result for result in results if result['success']])
+        if created == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        
+        return Response({
+            'created': created,
+            'failed': len(results) - created,
+            'results': results
+        }, status=response_status)
+    
     @action(detail=False, methods=['get'], url_path='reports/daily')
     def daily_report(self, request):
         """
@@ -255,6 +505,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         Query params:
         - date: YYYY-MM-DD (default: today)
         - customer: customer ID (optional)
+        - detail: 'false' to return totals only, read from the daily rollup (default: true)
         """
         # Get date parameter or use today
         date_str = request.query_params.get('date')
@@ -270,7 +521,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             report_date = date.today()
         
         # Filter orders
-        orders = Order.objects.filter(date=report_date).select_related('client').prefetch_related('items__item')
+        orders = Order.objects.filter(date=report_date)
         
         # Filter by customer if provided
         customer_id = request.query_params.get('customer')
@@ -282,50 +533,36 @@ class OrderViewSet(viewsets.ModelViewSet):
             try:
                 customer = Client.objects.get(id=customer_id)
                 customer_filter = customer.name
-                customer_balance = float(customer.balance)
+                customer_balance = customer.balance
             except Client.DoesNotExist:
                 customer_filter = f"Customer ID: {customer_id}"
         
-        # Calculate totals
-        total_sales = orders.aggregate(total=Sum('total'))['total'] or 0
-        total_paid = orders.aggregate(total=Sum('payment_amount'))['total'] or 0
-        total_due = orders.aggregate(total=Sum('balance_due'))['total'] or 0
-        
-        # Get order details
-        order_details = []
-        for order in orders:
-            order_data = {
-                'id': order.id,
-                'customer_name': order.client.name,
-                'order_date': order.date.strftime('%Y-%m-%d'),
-                'amount': float(order.total),
-                'payment_amount': float(order.payment_amount),
-                'payment_status': order.payment_status,
-                'balance_due': float(order.balance_due),
-                'items_count': order.items.count(),
-                'items': []
-            }
-            
-            # Add order items
-            for item in order.items.all():
-                order_data['items'].append({
-                    'name': item.item.name,
-                    'quantity': float(item.quantity),
-                    'price': float(item.price),
-                    'total': float(item.quantity * item.price)
-                })
-            
-            order_details.append(order_data)
+        # Totals only: served from the daily rollup
+        if not wants_detail(request):
+            totals = summary_totals(summary_queryset(report_date, report_date, customer_id))
+            return Response({
+                'date': report_date.strftime('%Y-%m-%d'),
+                'total_sales': totals['total_sales'],
+                'total_paid': totals['total_paid'],
+                'total_due': totals['total_due'],
+                'order_count': totals['order_count'],
+                'item_quantity': totals['item_quantity'],
+                'customer_filter': customer_filter,
+                'customer_balance': customer_balance
+            })
+        
+        # One aggregate for the totals, two queries for the order rows
+        totals = order_totals(orders)
         
         return Response({
             'date': report_date.strftime('%Y-%m-%d'),
-            'total_sales': float(total_sales),
-            'total_paid': float(total_paid),
-            'total_due': float(total_due),
-            'order_count': orders.count(),
+            'total_sales': totals['total_sales'],
+            'total_paid': totals['total_paid'],
+            'total_due': totals['total_due'],
+            'order_count': totals['order_count'],
             'customer_filter': customer_filter,
             'customer_balance': customer_balance,
-            'orders': order_details
+            'orders': serialize_orders(orders)
         })
     
     @action(detail=False, methods=['get'], url_path='reports/monthly')
@@ -336,6 +573,11 @@ class OrderViewSet(viewsets.ModelViewSet):
         - start_date: YYYY-MM-DD (optional)
         - end_date: YYYY-MM-DD (optional)
         - customer: customer ID (optional)
+        - include_orders: 'true' to add a page of order detail to each month (default: false)
+        - page: page of order detail per month (default: 1)
+        - page_size: orders per month page (default: 50, max: 500)
+        
+        The report is streamed month by month as JSON.
         """
         try:
             orders = Order.objects.all()
@@ -350,18 +592,20 @@ class OrderViewSet(viewsets.ModelViewSet):
                 try:
                     customer = Client.objects.get(id=customer_id)
                     customer_filter = customer.name
-                    customer_balance = float(customer.balance)
+                    customer_balance = customer.balance
                 except Client.DoesNotExist:
                     customer_filter = f"Customer ID: {customer_id}"
             
             # Filter by date range if provided
             start_date = request.query_params.get('start_date')
             end_date = request.query_params.get('end_date')
+            orders_start = None
+            orders_end = None
             
             if start_date:
                 try:
-                    start = datetime.strptime(start_date, '%Y-%m-%d').date()
-                    orders = orders.filter(date__gte=start)
+                    orders_start = datetime.strptime(start_date, '%Y-%m-%d').date()
+                    orders = orders.filter(date__gte=orders_start)
                 except ValueError:
                     return Response(
                         {'error': 'Invalid start_date format. Use YYYY-MM-DD'},
@@ -370,86 +614,53 @@ class OrderViewSet(viewsets.ModelViewSet):
             
             if end_date:
                 try:
-                    end = datetime.strptime(end_date, '%Y-%m-%d').date()
-                    orders = orders.filter(date__lte=end)
+                    orders_end = datetime.strptime(end_date, '%Y-%m-%d').date()
+                    orders = orders.filter(date__lte=orders_end)
                 except ValueError:
                     return Response(
                         {'error': 'Invalid end_date format. Use YYYY-MM-DD'},
                         status=status.HTTP_400_BAD_REQUEST
                     )
             
-            # Group by month manually
-            monthly_totals = {}
-            monthly_orders = {}
-            
-            # Aggregate orders by month
-            for order in orders.select_related('client').iterator():
-                try:
-                    month_key = order.date.strftime('%Y-%m')
-                    
-                    if month_key not in monthly_totals:
-                        monthly_totals[month_key] = 0
-                        monthly_orders[month_key] = []
-                    
-                    monthly_totals[month_key] += float(order.total)
-                    
-                    # Get order details
-                    order_data = {
-                        'id': order.id,
-                        'customer_name': order.client.name,
-                        'order_date': order.date.strftime('%Y-%m-%d'),
-                        'amount': float(order.total),
-                        'payment_amount': float(order.payment_amount),
-                        'payment_status': order.payment_status,
-                        'balance_due': float(order.balance_due),
-                        'items_count': order.items.count(),
-                        'items': []
-                    }
-                    
-                    # Get items safely
-                    try:
-                        for order_item in order.items.all().select_related('item'):
-                            order_data['items'].append({
-                                'name': order_item.item.name if order_item.item else 'Unknown',
-                                'quantity': float(order_item.quantity),
-                                'price': float(order_item.price),
-                                'total': float(order_item.quantity * order_item.price)
-                            })
-                    except Exception as e:
-                        print(f"Error getting items for order {order.id}: {e}")
-                    
-                    monthly_orders[month_key].append(order_data)
-                    
-                except Exception as e:
-                    print(f"Error processing order {order.id}: {e}")
-                    continue
-            
-            # Convert to list format
-            result = []
-            for month_key, total_sales in monthly_totals.items():
-                month_orders_list = monthly_orders.get(month_key, [])
-                result.append({
-                    'month': month_key,
-                    'total_sales': total_sales,
-                    'order_count': len(month_orders_list),
-                    'orders': month_orders_list
-                })
-            
-            # Sort by month (descending)
-            result.sort(key=lambda x: x['month'], reverse=True)
-            
-            response_data = {
-                'reports': result,
-                'customer_filter': customer_filter,
-                'customer_balance': customer_balance
-            }
+            include_orders = request.query_params.get('include_orders', 'false').lower() in ('1', 'true', 'yes')
+            try:
+                page = max(1, int(request.query_params.get('page', 1)))
+                page_size = min(
+                    MONTHLY_REPORT_MAX_PAGE_SIZE,
+                    max(1, int(request.query_params.get('page_size', MONTHLY_REPORT_PAGE_SIZE)))
+                )
+            except ValueError:
+                return Response(
+                    {'error': 'page and page_size must be integers'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
-            return Response(response_data)
+            # Month totals come from the daily rollup unless order detail is
+            # requested, in which case they are aggregated from the same
+            # orders that are listed
+            if include_orders:
+                months = monthly_totals(orders)
+            else:
+                months = summary_monthly_totals(summary_queryset(
+                    orders_start, orders_end, customer_id
+                ))
+            
+            # Months are written to the response one at a time
+            return StreamingHttpResponse(
+                stream_monthly_report(
+                    months,
+                    orders,
+                    include_orders=include_orders,
+                    page=page,
+                    page_size=page_size,
+                    customer_filter=customer_filter,
+                    customer_balance=customer_balance
+                ),
+                content_type='application/json'
+            )
             
         except Exception as e:
-            print(f"Error in monthly_report: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error in monthly_report")
             return Response(
                 {'error': f'Internal server error: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -463,6 +674,8 @@ class OrderViewSet(viewsets.ModelViewSet):
         - start_date: YYYY-MM-DD (required)
         - end_date: YYYY-MM-DD (required)
         - customer: customer ID (optional)
+        - detail: 'false' to return totals and the daily breakdown only,
+          read from the daily rollup (default: true)
         """
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
@@ -496,121 +709,42 @@ class OrderViewSet(viewsets.ModelViewSet):
                 try:
                     customer = Client.objects.get(id=customer_id)
                     customer_filter = customer.name
-                    customer_balance = float(customer.balance)
+                    customer_balance = customer.balance
                 except Client.DoesNotExist:
                     customer_filter = f"Customer ID: {customer_id}"
             
-            # Calculate overall totals
-            totals = orders.aggregate(
-                total_sales=Sum('total'),
-                total_paid=Sum('payment_amount'),
-                total_due=Sum('balance_due')
-            )
-            
-            total_sales = totals['total_sales'] or 0
-            total_paid = totals['total_paid'] or 0
-            total_due = totals['total_due'] or 0
-            
-            # Get order count
-            order_count = orders.count()
-            
-            # Get all order details for the range
-            all_order_details = []
-            for order in orders.select_related('client').iterator():
-                try:
-                    order_data = {
-                        'id': order.id,
-                        'customer_name': order.client.name,
-                        'order_date': order.date.strftime('%Y-%m-%d'),
-                        'amount': float(order.total),
-                        'payment_amount': float(order.payment_amount),
-                        'payment_status': order.payment_status,
-                        'balance_due': float(order.balance_due),
-                        'items_count': order.items.count(),
-                        'items': []
-                    }
-                    
-                    # Get items
-                    try:
-                        for order_item in order.items.all().select_related('item'):
-                            order_data['items'].append({
-                                'name': order_item.item.name if order_item.item else 'Unknown',
-                                'quantity': float(order_item.quantity),
-                                'price': float(order_item.price),
-                                'total': float(order_item.quantity * order_item.price)
-                            })
-                    except Exception as e:
-                        print(f"Error getting items for order {order.id}: {e}")
-                    
-                    all_order_details.append(order_data)
-                except Exception as e:
-                    print(f"Error processing order {order.id}: {e}")
-                    continue
-            
-            # Create daily breakdown
-            daily_breakdown = []
-            daily_sales = {}
-            daily_orders = {}
-            
-            # Aggregate orders by date
-            for order in orders:
-                date_str = order.date.strftime('%Y-%m-%d')
-                if date_str not in daily_sales:
-                    daily_sales[date_str] = 0
-                    daily_orders[date_str] = []
-                
-                daily_sales[date_str] += float(order.total)
-                
-                # Get order details for this day
-                day_order_details = []
-                try:
-                    order_data = {
-                        'id': order.id,
-                        'customer_name': order.client.name,
-                        'order_date': order.date.strftime('%Y-%m-%d'),
-                        'amount': float(order.total),
-                        'payment_amount': float(order.payment_amount),
-                        'payment_status': order.payment_status,
-                        'balance_due': float(order.balance_due),
-                        'items_count': order.items.count(),
-                        'items': []
-                    }
-                    
-                    for order_item in order.items.all().select_related('item'):
-                        order_data['items'].append({
-                            'name': order_item.item.name if order_item.item else 'Unknown',
-                            'quantity': float(order_item.quantity),
-                            'price': float(order_item.price),
-                            'total': float(order_item.quantity * order_item.price)
-                        })
-                    
-                    day_order_details.append(order_data)
-                except Exception as e:
-                    print(f"Error creating day order details: {e}")
-                
-                daily_orders[date_str].extend(day_order_details)
-            
-            # Convert to list format
-            for date_str, sales in daily_sales.items():
-                day_order_count = len(daily_orders[date_str]) if date_str in daily_orders else 0
-                
-                daily_breakdown.append({
-                    'date': date_str,
-                    'total_sales': sales,
-                    'order_count': day_order_count,
-                    'orders': daily_orders.get(date_str, [])
+            # Totals only: served from the daily rollup
+            if not wants_detail(request):
+                summaries = summary_queryset(start, end, customer_id)
+                totals = summary_totals(summaries)
+                return Response({
+                    'start_date': start.strftime('%Y-%m-%d'),
+                    'end_date': end.strftime('%Y-%m-%d'),
+                    'total_sales': totals['total_sales'],
+                    'total_paid': totals['total_paid'],
+                    'total_due': totals['total_due'],
+                    'order_count': totals['order_count'],
+                    'item_quantity': totals['item_quantity'],
+                    'daily_breakdown': summary_daily_breakdown(summaries),
+                    'customer_filter': customer_filter,
+                    'customer_balance': customer_balance
                 })
             
-            # Sort by date
-            daily_breakdown.sort(key=lambda x: x['date'])
+            # Overall totals and order count in one aggregate
+            totals = order_totals(orders)
+            
+            # Serialize every order once (orders + prefetched items) and
+            # reuse the rows for the daily breakdown
+            all_order_details = serialize_orders(orders)
+            daily_breakdown = build_daily_breakdown(orders, all_order_details)
             
             result = {
                 'start_date': start.strftime('%Y-%m-%d'),
                 'end_date': end.strftime('%Y-%m-%d'),
-                'total_sales': float(total_sales),
-                'total_paid': float(total_paid),
-                'total_due': float(total_due),
-                'order_count': order_count,
+                'total_sales': totals['total_sales'],
+                'total_paid': totals['total_paid'],
+                'total_due': totals['total_due'],
+                'order_count': totals['order_count'],
                 'orders': all_order_details,
                 'daily_breakdown': daily_breakdown,
                 'customer_filter': customer_filter,
@@ -620,15 +754,70 @@ class OrderViewSet(viewsets.ModelViewSet):
             return Response(result)
             
         except Exception as e:
-            print(f"Error in date_range_report: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error in date_range_report")
             return Response(
                 {'error': f'Internal server error: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
 
+class ReportExportViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Date-range report exports written to a file in the background.
+    POST the report filters, poll the job until its status is 'done',
+    then fetch download_url.
+    """
+    queryset = ReportExportJob.objects.select_related('customer')
+    serializer_class = ReportExportJobSerializer
+    permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-created_at', '-id')
+    
+    def get_queryset(self):
+        """Staff see every export, everyone else only their own"""
+        queryset = super().get_queryset()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(requested_by=self.request.user)
+        return queryset
+    
+    def create(self, request, *args, **kwargs):
+        """
+        Queue an export
+        Body:
+        - start_date: YYYY-MM-DD (required)
+        - end_date: YYYY-MM-DD (required)
+        - customer: customer ID (optional)
+        - file_format: 'csv' or 'xlsx' (default: 'csv')
+        """
+        serializer = ReportExportCreateSerializer(data=request.data, context={'request': request})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        with transaction.atomic():
+            job = serializer.save()
+            transaction.on_commit(wake_export_worker)
+        
+        return Response(
+            self.get_serializer(job).data,
+            status=status.HTTP_202_ACCEPTED
+        )
+    
+    @action(detail=True, methods=['get'], url_path='download')
+    def download(self, request, pk=None):
+        """The finished export file, as an attachment"""
+        job = self.get_object()
+        if job.status != ReportExportJob.DONE or not job.file:
+            return Response(
+                {'error': f'Export is not ready (status: {job.status})'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        try:
+            handle = job.file.open('rb')
+        except FileNotFoundError:
+            return Response({'error': 'Export file no longer exists'}, status=status.HTTP_410_GONE)
+        return FileResponse(handle, as_attachment=True, filename=job.file.name.rsplit('/', 1)[-1])
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def receipt_view(request):
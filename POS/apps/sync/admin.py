@@ -0,0 +1,13 @@
+from django.contrib import admin
+from .models import SyncCounter, SyncTombstone
+
+
+@admin.register(SyncCounter)
+class SyncCounterAdmin(admin.ModelAdmin):
+    list_display = ['name', 'value']
+
+
+@admin.register(SyncTombstone)
+class SyncTombstoneAdmin(admin.ModelAdmin):
+    list_display = ['model', 'object_id', 'version', 'deleted_at']
+    list_filter = ['model']
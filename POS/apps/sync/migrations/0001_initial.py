@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncCounter',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'sync_counters',
+            },
+        ),
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('object_id', models.IntegerField()),
+                ('version', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'sync_tombstones',
+                'indexes': [models.Index(fields=['model', 'version'], name='sync_tombstone_version_idx')],
+            },
+        ),
+    ]
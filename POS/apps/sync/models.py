@@ -0,0 +1,55 @@
+from django.db import models, transaction
+
+
+class SyncCounter(models.Model):
+    """Last change version handed out per synced model"""
+    name = models.CharField(max_length=100, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'sync_counters'
+
+    def __str__(self):
+        return f"{self.name} - {self.value}"
+
+
+class SyncTombstone(models.Model):
+    """Marks a deleted row so terminals can drop it on their next delta sync"""
+    model = models.CharField(max_length=100)
+    object_id = models.IntegerField()
+    version = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'sync_tombstones'
+        indexes = [
+            models.Index(fields=['model', 'version'], name='sync_tombstone_version_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id} deleted at version {self.version}"
+
+
+class SyncedModel(models.Model):
+    """
+    Base for models that terminals keep a local copy of. Every save stamps
+    the row with the next version of its model's counter, in the same
+    transaction, so a terminal can ask for everything after the version it
+    last saw.
+    """
+    updated_at = models.DateTimeField(auto_now=True)
+    sync_version = models.BigIntegerField(default=0, db_index=True)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        from .versions import next_version
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'updated_at', 'sync_version'}
+
+        with transaction.atomic():
+            self.sync_version = next_version(self._meta.label_lower)
+            super().save(*args, **kwargs)
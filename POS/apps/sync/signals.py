@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import SyncedModel
+from .versions import record_deletion
+
+
+@receiver(post_delete)
+def leave_tombstone(sender, instance, **kwargs):
+    """Deletes run inside the collector's transaction, as does the tombstone"""
+    if isinstance(instance, SyncedModel):
+        record_deletion(instance)
@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from apps.pricing.models import Item
+from apps.sales.ledger import apply_balance_change
+from apps.sales.models import Client
+from .models import SyncTombstone
+from .versions import current_version, touch
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DeltaSyncTests(APITestCase):
+    products_url = '/api/pricing/products/delta/'
+    customers_url = '/api/customers/delta/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cashier', password='secret')
+        self.client.force_authenticate(self.user)
+        self.broiler = Item.objects.create(name='Broiler', price=Decimal('520.00'))
+        self.eggs = Item.objects.create(name='Eggs', price=Decimal('30.00'))
+        self.customer = Client.objects.create(name='Hotel Shalimar', balance=Decimal('0'))
+
+    def fetch(self, url, since=None):
+        response = self.client.get(url, {} if since is None else {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_first_sync_is_full(self):
+        data = self.fetch(self.products_url)
+
+        self.assertTrue(data['full'])
+        self.assertEqual([row['name'] for row in data['changed']], ['Broiler', 'Eggs'])
+        self.assertEqual(data['version'], 2)
+
+    def test_delta_returns_only_changed_and_deleted_rows(self):
+        version = self.fetch(self.products_url)['version']
+
+        self.eggs.price = Decimal('32.00')
+        self.eggs.save()
+        mutton = Item.objects.create(name='Mutton', price=Decimal('1800.00'))
+        broiler_id = self.broiler.id
+        self.broiler.delete()
+        data = self.fetch(self.products_url, version)
+
+        self.assertFalse(data['full'])
+        self.assertEqual([row['id'] for row in data['changed']], [self.eggs.id, mutton.id])
+        self.assertEqual(data['deleted'], [broiler_id])
+        self.assertEqual(SyncTombstone.objects.get().object_id, broiler_id)
+
+        # Nothing changed since the last call
+        unchanged = self.fetch(self.products_url, data['version'])
+        self.assertEqual((unchanged['changed'], unchanged['deleted']), ([], []))
+
+    def test_ledger_balance_changes_reach_the_customer_delta(self):
+        version = self.fetch(self.customers_url)['version']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_balance_change(self.customer.id, Decimal('750.00'))
+            # The stamp is added after commit, off the checkout's transaction
+            self.assertEqual(current_version('sales.client'), version)
+        data = self.fetch(self.customers_url, version)
+
+        self.assertEqual(len(data['changed']), 1)
+        self.assertEqual(data['changed'][0]['balance'], '750.00')
+        self.assertGreater(data['version'], version)
+
+    def test_touch_stamps_committed_rows(self):
+        version = self.fetch(self.customers_url)['version']
+
+        touch(Client, [self.customer.id, self.customer.id, 999999])
+        data = self.fetch(self.customers_url, version)
+
+        self.assertEqual([row['id'] for row in data['changed']], [self.customer.id])
+        self.assertGreater(data['version'], version)
+
+    def test_unknown_version_falls_back_to_full_sync(self):
+        self.assertTrue(self.fetch(self.customers_url, 10_000)['full'])
+        response = self.client.get(self.customers_url, {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,86 @@
+from django.db import transaction, IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from .models import SyncCounter, SyncTombstone
+
+
+def next_versions(name, count):
+    """
+    Reserve `count` consecutive change versions for `name` (a model label)
+    and return them. The counter row is bumped with a single UPDATE that
+    keeps its lock until the surrounding transaction ends, so versions
+    become visible in the order they were handed out and a delta read never
+    skips a row that commits later with a lower version.
+    """
+    with transaction.atomic():
+        updated = SyncCounter.objects.filter(name=name).update(value=F('value') + count)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    SyncCounter.objects.create(name=name, value=count)
+            except IntegrityError:
+                # Another worker created the counter first
+                SyncCounter.objects.filter(name=name).update(value=F('value') + count)
+        last_value = SyncCounter.objects.filter(name=name).values_list('value', flat=True).get()
+    return list(range(last_value - count + 1, last_value + 1))
+
+
+def next_version(name):
+    """Reserve a single change version"""
+    return next_versions(name, 1)[0]
+
+
+def touch(model, ids):
+    """
+    Stamp already committed rows of `model` with new versions, for writes
+    that skip the stamp to stay off the counter lock (e.g. the balance
+    UPDATE of a checkout). Call it after those writes commit. Rows locked
+    by another transaction are skipped: that writer stamps them itself or
+    touches them once it commits. The counter is taken before the rows,
+    in the same order as SyncedModel.save, so the two never deadlock.
+    """
+    ids = sorted(set(ids))
+    if not ids:
+        return
+    with transaction.atomic():
+        versions = next_versions(model._meta.label_lower, len(ids))
+        pks = model.objects.select_for_update(skip_locked=True).filter(pk__in=ids).order_by('pk')
+        now = timezone.now()
+        for pk, version in zip(pks.values_list('pk', flat=True), versions):
+            model.objects.filter(pk=pk).update(sync_version=version, updated_at=now)
+
+
+def current_version(name):
+    """Highest committed version for `name`"""
+    return SyncCounter.objects.filter(name=name).values_list('value', flat=True).first() or 0
+
+
+def record_deletion(instance):
+    """Leave a tombstone for a deleted row of a synced model"""
+    name = instance._meta.label_lower
+    SyncTombstone.objects.create(model=name, object_id=instance.pk, version=next_version(name))
+
+
+def changes_since(queryset, since=None):
+    """
+    Rows of `queryset` changed after version `since`, plus the ids deleted
+    since then. Without `since` (or with a version newer than the server
+    knows, e.g. after a restore) the whole queryset is returned as a full
+    sync. Reads are capped at the current version so a row that changes
+    mid-read is picked up by the next call instead of being skipped.
+    """
+    name = queryset.model._meta.label_lower
+    version = current_version(name)
+    full = since is None or since > version
+
+    if full:
+        return {'version': version, 'full': True, 'changed': queryset, 'deleted': []}
+
+    changed = queryset.filter(sync_version__gt=since, sync_version__lte=version).order_by('sync_version')
+    deleted = list(SyncTombstone.objects.filter(
+        model=name,
+        version__gt=since,
+        version__lte=version
+    ).order_by('version').values_list('object_id', flat=True))
+    return {'version': version, 'full': False, 'changed': changed, 'deleted': deleted}